@@ -0,0 +1,51 @@
+import json
+import os
+import time
+from typing import Dict, Optional
+from graph_utils import md5
+
+
+def default_checkpoint_path(path: str) -> str:
+    return os.path.join("./cache", "batches", f"{md5(os.path.abspath(path))}.json")
+
+
+class BatchCheckpoint:
+    """Progress of a batch build, written after every document so an interrupted
+    batch resumes where it stopped.
+
+    Documents are `started`, `done` or `failed`. Done documents are skipped on the
+    next run; the others are rebuilt, skipping the chunks they already extracted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.documents = json.load(file)
+
+    def status(self, key: str) -> Optional[str]:
+        return self.documents.get(key, {}).get("status")
+
+    def is_done(self, key: str) -> bool:
+        return self.status(key) == "done"
+
+    def mark(self, key: str, status: str, **info):
+        self.documents[key] = {"status": status, "updated": time.time(), **info}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write then rename, so an interruption never leaves a truncated checkpoint behind
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self.documents, file, indent=2)
+        os.replace(temporary_path, self.path)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"started": 0, "done": 0, "failed": 0}
+        for document in self.documents.values():
+            counts[document["status"]] += 1
+        return counts
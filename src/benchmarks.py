@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import Config
+from graph import Graph, Edge, AtomicFactNode, KeyElementNode
+from graph_utils import create_document_node, create_chunk_node, create_chunk_edges, md5
+from graph_database_manager import GraphDatabaseManager
+from sqlite_graph_store import SQLiteGraphStore
+from graph_utils import chunked
+from input_manager import INPUT_SOURCES, create_input_source
+from text_chunker import TokenChunker
+from log_manager import log
+
+BENCHMARK_LABEL = "benchmark_key_element"
+BENCHMARK_INDEX_NAME = "benchmark_key_element_embeddings"
+
+
+def random_unit_vectors(count, dimensions, rng):
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def _clear_benchmark_nodes(db_manager):
+    async with db_manager.driver.session() as session:
+        result = await session.run(f"DROP INDEX {BENCHMARK_INDEX_NAME} IF EXISTS")
+        await result.consume()
+        result = await session.run(
+            f"MATCH (n:{BENCHMARK_LABEL}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS"
+        )
+        await result.consume()
+
+
+async def _insert_benchmark_nodes(db_manager, vectors, offset):
+    rows = [
+        {"id": f"benchmark-{offset + i}", "embeddings": vector.tolist()}
+        for i, vector in enumerate(vectors)
+    ]
+    async with db_manager.driver.session() as session:
+        for batch in chunked(rows, 1000):
+            result = await session.run(
+                f"""
+                UNWIND $rows AS row
+                CREATE (n:{BENCHMARK_LABEL} {{id: row.id, embeddings: row.embeddings}})
+                """,
+                rows=batch,
+            )
+            await result.consume()
+
+
+async def _await_indexes(db_manager):
+    async with db_manager.driver.session() as session:
+        result = await session.run("CALL db.awaitIndexes(600)")
+        await result.consume()
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+async def vector_search_benchmark(sizes, queries, k, dimensions, seed=0):
+    config = Config()
+    db_manager = GraphDatabaseManager(
+        uri=config.neo4j_uri, user=config.neo4j_user, password=config.neo4j_password, database=config.neo4j_database
+    )
+    rng = np.random.default_rng(seed)
+    query_vectors = random_unit_vectors(queries, dimensions, rng)
+    log(f"Vector search benchmark: sizes={sizes}, queries={queries}, k={k}, dimensions={dimensions}", console=True)
+    log(f"{'nodes':>10} {'brute p50 ms':>14} {'index p50 ms':>14} {'speedup':>9} {'recall@k':>9}", console=True)
+
+    await _clear_benchmark_nodes(db_manager)
+    try:
+        node_count = 0
+        for size in sorted(sizes):
+            # Grow the benchmark set incrementally so each size reuses the previous nodes
+            await _insert_benchmark_nodes(
+                db_manager, random_unit_vectors(size - node_count, dimensions, rng), node_count
+            )
+            node_count = size
+            await db_manager.ensure_vector_index(
+                dimensions, label=BENCHMARK_LABEL, index_name=BENCHMARK_INDEX_NAME
+            )
+            await _await_indexes(db_manager)
+
+            brute_force_times, vector_index_times, recalls = [], [], []
+            for vector in query_vectors.tolist():
+                exact, seconds = _timed(
+                    db_manager._brute_force_similar_nodes, vector, k, BENCHMARK_LABEL
+                )
+                brute_force_times.append(seconds)
+                approximate, seconds = _timed(
+                    db_manager._vector_similar_nodes, vector, k, BENCHMARK_INDEX_NAME
+                )
+                vector_index_times.append(seconds)
+                exact_ids = {node["id"] for node in exact}
+                recalls.append(
+                    len(exact_ids & {node["id"] for node in approximate}) / max(len(exact_ids), 1)
+                )
+
+            brute_force_ms = np.median(brute_force_times) * 1000
+            vector_index_ms = np.median(vector_index_times) * 1000
+            log(
+                f"{size:>10} {brute_force_ms:>14.2f} {vector_index_ms:>14.2f} "
+                f"{brute_force_ms / vector_index_ms:>8.1f}x {np.mean(recalls):>9.3f}",
+                console=True,
+            )
+    finally:
+        await _clear_benchmark_nodes(db_manager)
+        await db_manager.close()
+
+
+def synthetic_graph_parts(chunks, facts_per_chunk, key_elements, dimensions, seed=0):
+    # Roughly the shape of an extraction: each fact mentions a few key elements from a shared vocabulary
+    rng = np.random.default_rng(seed)
+    document = create_document_node(f"synthetic document {seed}", "benchmark")
+    key_element_embeddings = random_unit_vectors(key_elements, dimensions, rng)
+    prev_chunk = None
+    yield [document], []
+    for chunk_index in range(chunks):
+        chunk = create_chunk_node(f"chunk {chunk_index} " + "lorem ipsum " * 500, chunk_index)
+        nodes, edges = [chunk], create_chunk_edges(document, chunk, prev_chunk)
+        prev_chunk = chunk
+        for fact_index in range(facts_per_chunk):
+            content = f"Fact {fact_index} of chunk {chunk_index} relates several key elements."
+            fact = AtomicFactNode(id=md5(content), content=content)
+            nodes.append(fact)
+            edges.append(Edge(relationship="HAS_ATOMIC_FACT", source=chunk.id, target=fact.id))
+            for element in rng.choice(key_elements, 3, replace=False).tolist():
+                nodes.append(
+                    KeyElementNode(
+                        id=f"key element {element}",
+                        content=f"Key Element {element}",
+                        embeddings=key_element_embeddings[element].tolist(),
+                    )
+                )
+                edges.append(
+                    Edge(relationship="HAS_KEY_ELEMENT", source=fact.id, target=f"key element {element}")
+                )
+        yield nodes, edges
+
+
+async def store_benchmark(chunks, facts_per_chunk, key_elements, dimensions, queries, seed=0):
+    # Import a synthetic build into an embedded store and time the reader's lookups, with no database server
+    log(
+        f"Store benchmark: chunks={chunks}, facts_per_chunk={facts_per_chunk}, key_elements={key_elements}, "
+        f"dimensions={dimensions}, queries={queries}",
+        console=True,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteGraphStore(os.path.join(directory, "graph.sqlite"))
+        try:
+            start = time.perf_counter()
+            rows, chunk_ids = 0, []
+            for nodes, edges in synthetic_graph_parts(chunks, facts_per_chunk, key_elements, dimensions, seed):
+                graph = Graph()
+                graph.add_nodes(nodes)
+                graph.add_edges(edges)
+                report = await store.import_graph(graph)
+                rows += sum(batch.size for batch in report.batches)
+                chunk_ids += [node.id for node in graph.nodes_of_type("chunk")]
+            seconds = time.perf_counter() - start
+            log(f"Imported {rows} rows in {seconds:.2f}s ({rows / seconds:.0f} rows/s)", console=True)
+
+            rng = np.random.default_rng(seed)
+            lookups = {
+                "key_element_context": lambda: store.get_key_element_context(
+                    [f"key element {rng.integers(key_elements)}"]
+                ),
+                "chunk_with_adjacent": lambda: store.get_chunk_with_adjacent(chunk_ids[rng.integers(len(chunk_ids))]),
+                "similar_nodes": lambda: store.get_similar_nodes(random_unit_vectors(1, dimensions, rng)[0].tolist()),
+            }
+            _, seconds = _timed(store.vector_index)
+            log(f"Loaded {len(store.vector_index())} embeddings for similarity search in {seconds:.2f}s", console=True)
+            log(f"{'lookup':>20} {'p50 us':>10} {'p95 us':>10}", console=True)
+            for name, lookup in lookups.items():
+                times = np.array([_timed(lookup)[1] for _ in range(queries)]) * 1e6
+                log(f"{name:>20} {np.percentile(times, 50):>10.0f} {np.percentile(times, 95):>10.0f}", console=True)
+        finally:
+            await store.close()
+
+
+async def input_benchmark(source, input, chunk_size, workers):
+    # Load and chunk a fixed local corpus the way build-batch does, without the LLM, to measure input throughput
+    input_source = create_input_source(source, input)
+    chunker = TokenChunker(chunk_size, chunk_size // 10)
+    totals = {"documents": 0, "bytes": 0, "chunks": 0}
+    log(f"Input benchmark: source={source}, input={input}, chunk_size={chunk_size}, workers={workers}", console=True)
+
+    async def worker(documents, executor):
+        for document in documents:
+            content = await input_source.load(document)
+            chunks = await chunker.asplit(content, executor)
+            totals["documents"] += 1
+            totals["bytes"] += len(content.encode("utf-8"))
+            totals["chunks"] += len(chunks)
+
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            documents = input_source.documents()
+            await asyncio.gather(*(worker(documents, executor) for _ in range(workers)))
+    finally:
+        await input_source.close()
+    seconds = time.perf_counter() - start
+    log(
+        f"{totals['documents']} documents, {totals['bytes'] / 2**20:.1f} MB, {totals['chunks']} chunks in {seconds:.2f}s: "
+        f"{totals['documents'] / seconds:.1f} documents/s, {totals['bytes'] / 2**20 / seconds:.1f} MB/s, "
+        f"{totals['chunks'] / seconds:.1f} chunks/s",
+        console=True,
+    )
+
+
+def main(args):
+    if args.command == "vector-search":
+        asyncio.run(vector_search_benchmark(args.sizes, args.queries, args.k, args.dimensions))
+    elif args.command == "store":
+        asyncio.run(
+            store_benchmark(args.chunks, args.facts_per_chunk, args.key_elements, args.dimensions, args.queries)
+        )
+    elif args.command == "input":
+        asyncio.run(input_benchmark(args.source, args.input, args.chunk_size, args.workers))
+    else:
+        raise ValueError(f"Unknown benchmark: {args.command}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM Knowledge Graph benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True, help="Benchmarks")
+
+    # Benchmark: vector-search
+    vector_search_parser = subparsers.add_parser(
+        "vector-search", help="Compare vector index and brute-force similarity search."
+    )
+    vector_search_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Node counts to benchmark."
+    )
+    vector_search_parser.add_argument("--queries", type=int, default=50, help="Queries per node count.")
+    vector_search_parser.add_argument("--k", type=int, default=50, help="Number of neighbors per query.")
+    vector_search_parser.add_argument(
+        "--dimensions", type=int, default=384, help="Embedding dimensions (all-MiniLM-L6-v2 uses 384)."
+    )
+
+    # Benchmark: store
+    store_parser = subparsers.add_parser(
+        "store", help="Import a synthetic build into the embedded SQLite store and time the reader's lookups."
+    )
+    store_parser.add_argument("--chunks", type=int, default=200, help="Number of chunks.")
+    store_parser.add_argument("--facts-per-chunk", type=int, default=40, help="Atomic facts per chunk.")
+    store_parser.add_argument("--key-elements", type=int, default=20000, help="Distinct key elements.")
+    store_parser.add_argument("--dimensions", type=int, default=384, help="Embedding dimensions.")
+    store_parser.add_argument("--queries", type=int, default=1000, help="Lookups timed per accessor.")
+
+    # Benchmark: input
+    input_parser = subparsers.add_parser(
+        "input", help="Measure loading and chunking throughput of a local corpus."
+    )
+    input_parser.add_argument("input", type=str, help="A file, a directory of .txt documents or a JSONL corpus.")
+    input_parser.add_argument("--source", choices=INPUT_SOURCES, default="auto", help="Input source type.")
+    input_parser.add_argument("--chunk-size", type=int, default=1500, help="Chunk size in tokens.")
+    input_parser.add_argument("--workers", type=int, default=4, help="Chunking processes.")
+
+    args = parser.parse_args()
+    main(args)
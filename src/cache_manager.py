@@ -0,0 +1,416 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
+from graph_utils import normalize, md5
+
+
+def connect(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+def evict_least_recently_used(connection: sqlite3.Connection, table: str, max_entries: int):
+    count = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if count > max_entries:
+        connection.execute(
+            f"""
+            DELETE FROM {table} WHERE rowid IN (
+                SELECT rowid FROM {table} ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (count - max_entries,),
+        )
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (embedding model, normalized text).
+
+    Vectors are stored as float32 blobs in SQLite, with a small in-memory LRU in
+    front. The database is capped at `max_entries` by evicting the least recently
+    used rows.
+    """
+
+    def __init__(self, path: str, max_entries=1_000_000, memory_entries=10_000):
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text)
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        missing = []
+        with self.lock:
+            for text in set(texts):
+                key = (model, normalize(text))
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[text] = self.memory[key]
+                else:
+                    missing.append(text)
+
+            if missing:
+                now = time.time()
+                with self.connection:
+                    for text in missing:
+                        key = (model, normalize(text))
+                        row = self.connection.execute(
+                            "SELECT vector FROM embeddings WHERE model = ? AND text = ?", key
+                        ).fetchone()
+                        if row is None:
+                            continue
+                        vector = array("f", row[0]).tolist()
+                        self.connection.execute(
+                            "UPDATE embeddings SET last_used = ? WHERE model = ? AND text = ?",
+                            (now, *key),
+                        )
+                        self._remember(key, vector)
+                        found[text] = vector
+
+            self.hits += sum(1 for text in texts if text in found)
+            self.misses += sum(1 for text in texts if text not in found)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        now = time.time()
+        with self.lock, self.connection:
+            for text, vector in vectors.items():
+                key = (model, normalize(text))
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                    (*key, array("f", vector).tobytes(), now),
+                )
+                self._remember(key, list(vector))
+            evict_least_recently_used(self.connection, "embeddings", self.max_entries)
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "memory_entries": len(self.memory),
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+class CachedEmbeddings(Embeddings):
+    # Documents and queries share cache entries; the embedding models used here embed both the same way
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def _missing(self, texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        # One representative text per cache key, so equivalent spellings are embedded once
+        missing = {}
+        for text in texts:
+            if text not in found:
+                missing.setdefault(normalize(text), text)
+        return missing
+
+    def _store(self, texts, found, missing, embeddings):
+        computed = dict(zip(missing.values(), embeddings))
+        self.cache.put_many(self.model_name, computed)
+        for text in texts:
+            if text not in found:
+                found[text] = computed[missing[normalize(text)]]
+        return [found[text] for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        found = self.cache.get_many(self.model_name, texts)
+        missing = self._missing(texts, found)
+        if not missing:
+            return [found[text] for text in texts]
+        embeddings = self.embeddings.embed_documents(list(missing.values()))
+        return self._store(texts, found, missing, embeddings)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        found = self.cache.get_many(self.model_name, texts)
+        missing = self._missing(texts, found)
+        if not missing:
+            return [found[text] for text in texts]
+        embeddings = await self.embeddings.aembed_documents(list(missing.values()))
+        return self._store(texts, found, missing, embeddings)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class ResponseCache:
+    """Persistent LLM response cache.
+
+    Entries older than `ttl` seconds are ignored, the database is capped at
+    `max_entries` by evicting the least recently used rows, and `read_only`
+    replays cached responses without recording new ones.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries=100_000, read_only=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT,
+                    response TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.read_only:
+                with self.connection:
+                    self.connection.execute(
+                        "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+                    )
+            return row[0]
+
+    def put(self, key: str, model: str, prompt_version: Optional[str], response: str):
+        if self.read_only:
+            return
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO responses (key, model, prompt_version, response, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, model, prompt_version, response, now, now),
+            )
+            evict_least_recently_used(self.connection, "responses", self.max_entries)
+
+    def delete(self, key: str):
+        if self.read_only:
+            return
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        self.connection.close()
+
+
+class MemoryCache:
+    """In-memory LRU cache for graph lookups, shared by every question a process answers.
+
+    Entries expire `ttl` seconds after they were stored and the least recently
+    used entries are evicted beyond `max_entries`. None is a valid cached value,
+    so `get` returns a (found, value) pair.
+    """
+
+    def __init__(self, max_entries=10_000, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Tuple[bool, object]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (self.ttl and time.monotonic() - entry[1] > self.ttl):
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def __contains__(self, key) -> bool:
+        # Checks for a live entry without counting a lookup
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and not (self.ttl and time.monotonic() - entry[1] > self.ttl)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
+
+    def close(self):
+        self.entries.clear()
+
+
+def to_messages(input) -> list:
+    if hasattr(input, "to_messages"):
+        return input.to_messages()
+    return list(input)
+
+
+class CacheMissError(LookupError):
+    """Raised in read_only mode when a prompt has no cached response."""
+
+
+class CachedChatModel:
+    # Wraps a chat model for the two ways it is used: plain (a)invoke for extraction and
+    # with_structured_output(...) chains for the reader
+    def __init__(self, chat, cache: ResponseCache, model_name: str, prompt_version: Optional[str] = None):
+        self.chat = chat
+        self.cache = cache
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+
+    def cache_key(self, input, schema=None) -> str:
+        payload = {
+            "model": self.model_name,
+            "prompt_version": self.prompt_version,
+            "messages": [(m.type, m.content) for m in to_messages(input)],
+            "schema": schema.model_json_schema() if schema is not None else None,
+        }
+        return md5(json.dumps(payload, sort_keys=True, default=str))
+
+    def invalidate(self, input, schema=None):
+        # Drop a cached response that turned out to be unusable so a retry asks the model again
+        self.cache.delete(self.cache_key(input, schema))
+
+    def _check_miss(self):
+        # A read_only cache replays recorded runs, so a miss must not reach the model
+        if self.cache.read_only:
+            raise CacheMissError(f"No cached {self.model_name} response for this prompt in read_only mode")
+
+    def _put(self, key, response):
+        self.cache.put(key, self.model_name, self.prompt_version, response)
+
+    def invoke(self, input, config=None, **kwargs) -> AIMessage:
+        key = self.cache_key(input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return AIMessage(content=cached)
+        self._check_miss()
+        res = self.chat.invoke(input, config, **kwargs)
+        self._put(key, res.content)
+        return res
+
+    async def ainvoke(self, input, config=None, **kwargs) -> AIMessage:
+        key = self.cache_key(input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return AIMessage(content=cached)
+        self._check_miss()
+        res = await self.chat.ainvoke(input, config, **kwargs)
+        self._put(key, res.content)
+        return res
+
+    async def astream(self, input, config=None, **kwargs):
+        key = self.cache_key(input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield AIMessageChunk(content=cached)
+            return
+        self._check_miss()
+        content = []
+        async for message_chunk in self.chat.astream(input, config, **kwargs):
+            content.append(message_chunk.content)
+            yield message_chunk
+        self._put(key, "".join(content))
+
+    def with_structured_output(self, schema, **kwargs):
+        structured = self.chat.with_structured_output(schema, **kwargs)
+
+        def invoke(input):
+            key = self.cache_key(input, schema)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+            self._check_miss()
+            result = structured.invoke(input)
+            self._put(key, result.model_dump_json())
+            return result
+
+        async def ainvoke(input):
+            key = self.cache_key(input, schema)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+            self._check_miss()
+            result = await structured.ainvoke(input)
+            self._put(key, result.model_dump_json())
+            return result
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"Cached{schema.__name__}")
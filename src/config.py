@@ -9,4 +9,31 @@ class Config:
         self.neo4j_user = os.environ.get("NEO4J_USERNAME", "MISSING FROM .env FILE")
         self.neo4j_password = os.environ.get("NEO4J_PASSWORD", "MISSING FROM .env FILE")
         self.neo4j_database = os.environ.get("NEO4J_DATABASE", "neo4j")
+        self.graph_store = os.environ.get("GRAPH_STORE", "neo4j")
+        self.graph_store_path = os.environ.get("GRAPH_STORE_PATH", "./graph.sqlite")
         self.hf_token = os.environ.get("HF_API_KEY", "MISSING FROM .env FILE")
+        self.similarity_mode = os.environ.get("SIMILARITY_MODE", "vector_index")
+        self.vector_index_path = os.environ.get("VECTOR_INDEX_PATH", "./vector_index")
+        self.vector_index_lists = int(os.environ.get("VECTOR_INDEX_LISTS", "0"))
+        self.embedding_batch_size = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+        self.embedding_concurrency = int(os.environ.get("EMBEDDING_CONCURRENCY", "4"))
+        self.embedding_cache_path = os.environ.get("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite")
+        self.embedding_cache_max_entries = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+        self.embedding_cache_memory_entries = int(os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+        self.llm_cache_mode = os.environ.get("LLM_CACHE_MODE", "read_write")
+        self.llm_cache_path = os.environ.get("LLM_CACHE_PATH", "./cache/llm.sqlite")
+        self.llm_cache_ttl = float(os.environ.get("LLM_CACHE_TTL", "0")) or None
+        self.llm_cache_max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "100000"))
+        self.llm_max_in_flight = int(os.environ.get("LLM_MAX_IN_FLIGHT", "8"))
+        self.llm_requests_per_second = float(os.environ.get("LLM_REQUESTS_PER_SECOND", "0"))
+        self.llm_max_retries = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+        self.wikipedia_api_url = os.environ.get("WIKIPEDIA_API_URL", "https://en.wikipedia.org/w/api.php")
+        self.wikipedia_cache_path = os.environ.get("WIKIPEDIA_CACHE_PATH", "./cache/wikipedia")
+        self.wikipedia_responses_path = os.environ.get("WIKIPEDIA_RESPONSES_PATH") or None
+        self.wikipedia_record_responses = os.environ.get("WIKIPEDIA_RECORD_RESPONSES", "false").lower() == "true"
+        self.wikipedia_max_connections = int(os.environ.get("WIKIPEDIA_MAX_CONNECTIONS", "10"))
+        self.reader_concurrency = int(os.environ.get("READER_CONCURRENCY", "4"))
+        self.reader_timeout = float(os.environ.get("READER_TIMEOUT", "300"))
+        self.reader_parallel = os.environ.get("READER_PARALLEL", "false").lower() == "true"
+        self.read_cache_max_entries = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "10000"))
+        self.read_cache_ttl = float(os.environ.get("READ_CACHE_TTL", "3600")) or None
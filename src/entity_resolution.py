@@ -0,0 +1,187 @@
+import asyncio
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+import numpy as np
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from pydantic import BaseModel
+from vector_index import normalize_rows, kmeans
+from prompt_manager import EntityResolutionPrompt
+from graph_manager import invalidate_cached_response
+from task_scheduler import TaskScheduler
+from log_manager import log, log_error, log_chat
+
+
+class MergeCandidate(BaseModel):
+    id: str
+    content: str
+    similarity: float
+
+
+class EntityCluster(BaseModel):
+    canonical_id: str
+    canonical_content: str
+    duplicates: List[MergeCandidate]
+
+
+def candidate_pairs(vectors: np.ndarray, threshold: float, block_size=1000, n_probe=2, tile_size=2048):
+    # Blocking: vectors are grouped by k-means and each one joins its `n_probe` closest blocks, so
+    # cosine similarity is only computed within blocks instead of between all pairs
+    n = len(vectors)
+    n_blocks = math.ceil(n / block_size) if block_size else 1
+    if n_blocks > 1:
+        centroids = kmeans(vectors, n_blocks)
+        nearest = np.argsort(-(vectors @ centroids.T), axis=1)[:, :n_probe]
+        blocks = [np.flatnonzero((nearest == block).any(axis=1)) for block in range(n_blocks)]
+    else:
+        blocks = [np.arange(n)]
+
+    left, right, similarity = [], [], []
+    for block in blocks:
+        for start in range(0, len(block), tile_size):
+            rows = block[start : start + tile_size]
+            scores = vectors[rows] @ vectors[block].T
+            row_positions, column_positions = np.nonzero(scores >= threshold)
+            sources, targets = rows[row_positions], block[column_positions]
+            keep = sources < targets
+            left.append(sources[keep])
+            right.append(targets[keep])
+            similarity.append(scores[row_positions[keep], column_positions[keep]])
+    if not left:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    left, right, similarity = np.concatenate(left), np.concatenate(right), np.concatenate(similarity)
+    # A pair found in two overlapping blocks is kept once
+    _, first = np.unique((left.astype(np.int64) << 32) | right.astype(np.int64), return_index=True)
+    return left[first], right[first], similarity[first]
+
+
+def center_clusters(left, right, similarity, priority) -> Dict[int, List[Tuple[int, float]]]:
+    # Nodes are visited by priority and each unassigned one takes its unassigned neighbors as duplicates.
+    # Every duplicate is directly similar to its canonical node, so chains of similar names are not merged.
+    neighbors = defaultdict(list)
+    for i, j, score in zip(left.tolist(), right.tolist(), similarity.tolist()):
+        neighbors[i].append((j, score))
+        neighbors[j].append((i, score))
+    assigned = set()
+    clusters = {}
+    for node in priority:
+        if node in assigned or node not in neighbors:
+            continue
+        assigned.add(node)
+        members = [(j, score) for j, score in sorted(neighbors[node], key=lambda x: -x[1]) if j not in assigned]
+        assigned.update(j for j, _ in members)
+        if members:
+            clusters[node] = members
+    return clusters
+
+
+def parse_duplicates(content: str) -> Set[int]:
+    match = re.search(r"<Duplicates>(.*?)</Duplicates>", content, re.DOTALL)
+    if match is None:
+        raise ValueError(f"No <Duplicates> tag in response: {content[:200]}")
+    return {int(number) for number in re.findall(r"\d+", match.group(1))}
+
+
+class EntityResolver:
+    """Merges key elements that name the same entity.
+
+    Candidate pairs come from cosine similarity of the key element embeddings
+    within k-means blocks. Key elements mentioned together by one fact are never
+    merged, since a fact relating two names implies they are different entities.
+    With a chat model each proposed cluster is confirmed by the LLM before merging.
+    """
+
+    def __init__(self, threshold=0.9, block_size=1000, n_probe=2, chat=None, scheduler=None):
+        self.threshold = threshold
+        self.block_size = block_size
+        self.n_probe = n_probe
+        self.chat = chat
+        self.scheduler = scheduler or TaskScheduler()
+
+    def propose(self, key_elements: List[Dict], cooccurring: List[Dict] = ()) -> List[EntityCluster]:
+        if len(key_elements) < 2:
+            return []
+        ids = [k["id"] for k in key_elements]
+        vectors = normalize_rows(np.asarray([k["embeddings"] for k in key_elements], dtype=np.float32))
+        left, right, similarity = candidate_pairs(vectors, self.threshold, self.block_size, self.n_probe)
+
+        positions = {id: i for i, id in enumerate(ids)}
+        excluded = {
+            tuple(sorted((positions[pair["source"]], positions[pair["target"]])))
+            for pair in cooccurring
+            if pair["source"] in positions and pair["target"] in positions
+        }
+        keep = np.array([(i, j) not in excluded for i, j in zip(left.tolist(), right.tolist())], dtype=bool)
+        if len(keep):
+            left, right, similarity = left[keep], right[keep], similarity[keep]
+
+        # The most connected key element of a cluster becomes its canonical node
+        priority = np.argsort(-np.array([k["degree"] for k in key_elements]), kind="stable").tolist()
+        clusters = center_clusters(left, right, similarity, priority)
+        return [
+            EntityCluster(
+                canonical_id=ids[canonical],
+                canonical_content=key_elements[canonical]["content"],
+                duplicates=[
+                    MergeCandidate(id=ids[j], content=key_elements[j]["content"], similarity=score)
+                    for j, score in members
+                ],
+            )
+            for canonical, members in clusters.items()
+        ]
+
+    async def _confirm_cluster(self, cluster: EntityCluster) -> EntityCluster:
+        candidates = "\n".join(f"{i}. {d.content}" for i, d in enumerate(cluster.duplicates, start=1))
+        chat_history = [
+            SystemMessage(content=EntityResolutionPrompt.prompt),
+            HumanMessage(content=f"Canonical key element: {cluster.canonical_content}\n\nCandidates:\n{candidates}"),
+        ]
+        res = await self.chat.ainvoke(chat_history)
+        log_chat(chat_history + [AIMessage(content=res.content)])
+        try:
+            selected = parse_duplicates(res.content)
+        except ValueError:
+            invalidate_cached_response(self.chat, chat_history)
+            raise
+        duplicates = [d for i, d in enumerate(cluster.duplicates, start=1) if i in selected]
+        return cluster.model_copy(update={"duplicates": duplicates})
+
+    async def confirm(self, clusters: List[EntityCluster]) -> List[EntityCluster]:
+        results = await asyncio.gather(
+            *(self.scheduler.run(f"resolve {c.canonical_id}", self._confirm_cluster, c) for c in clusters),
+            return_exceptions=True,
+        )
+        confirmed = []
+        for cluster, result in zip(clusters, results):
+            # A cluster the LLM could not confirm is left unmerged
+            if isinstance(result, Exception):
+                log_error(f"Could not confirm merges into {cluster.canonical_content}: {result}")
+            elif result.duplicates:
+                confirmed.append(result)
+        return confirmed
+
+    async def resolve(self, db_manager, dry_run=False) -> List[EntityCluster]:
+        key_elements = await db_manager.get_key_elements()
+        cooccurring = await db_manager.get_key_element_pairs()
+        clusters = self.propose(key_elements, cooccurring)
+        proposed = sum(len(c.duplicates) for c in clusters)
+        if self.chat is not None and clusters:
+            clusters = await self.confirm(clusters)
+        merges = [
+            {"canonical": c.canonical_id, "duplicate": d.id} for c in clusters for d in c.duplicates
+        ]
+        for cluster in clusters:
+            log(
+                f"{cluster.canonical_content} <- "
+                + ", ".join(f"{d.content} ({d.similarity:.3f})" for d in cluster.duplicates)
+            )
+        log(
+            f"Entity resolution: {len(key_elements)} key elements, {proposed} proposed merges, "
+            f"{len(merges)} {'to merge (dry run)' if dry_run else 'merged'} into {len(clusters)} canonical key elements.",
+            console=True,
+        )
+        if merges and not dry_run:
+            await db_manager.merge_key_elements(merges)
+        return clusters
@@ -0,0 +1,112 @@
+from typing import Iterator, List, Set
+import numpy as np
+from pydantic import BaseModel
+from input_manager import InputSource, SourceDocument, WikipediaFetcher, PageNotFoundError
+from log_manager import log
+
+RANKINGS = ["degree", "pagerank"]
+
+
+class DuplicatePageError(ValueError):
+    pass
+
+
+class ExpansionCandidate(BaseModel):
+    id: str
+    content: str
+    score: float
+
+
+def pagerank(sources, targets, weights, n: int, damping=0.85, iterations=100, tolerance=1e-8) -> np.ndarray:
+    # Weighted PageRank over the undirected co-occurrence graph by power iteration
+    rows = np.concatenate([sources, targets])
+    columns = np.concatenate([targets, sources])
+    weights = np.concatenate([weights, weights]).astype(np.float64)
+    out_weight = np.bincount(rows, weights=weights, minlength=n)
+    dangling = out_weight == 0
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        share = np.divide(scores, out_weight, out=np.zeros(n), where=~dangling)
+        updated = np.bincount(columns, weights=weights * share[rows], minlength=n)
+        updated = (1 - damping) / n + damping * (updated + scores[dangling].sum() / n)
+        converged = np.abs(updated - scores).sum() < tolerance
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+class ExpansionSource(InputSource):
+    # Wikipedia pages for the chosen key elements; a page several key elements resolve to is built once
+    def __init__(self, candidates: List[ExpansionCandidate], fetcher: WikipediaFetcher):
+        self.candidates = candidates
+        self.fetcher = fetcher
+        self.pageids: Set[int] = set()
+
+    def documents(self) -> Iterator[SourceDocument]:
+        for candidate in self.candidates:
+            yield SourceDocument(key=candidate.id, topic=candidate.content, source="wikipedia")
+
+    async def load(self, document: SourceDocument) -> str:
+        page = await self.fetcher.fetch_page(document.topic)
+        if page["pageid"] in self.pageids:
+            raise DuplicatePageError(f"{document.topic} resolves to {page['title']}, which is already being expanded")
+        self.pageids.add(page["pageid"])
+        return page["content"]
+
+
+class ExpansionManager:
+    """Picks the most important key elements that have not been expanded yet and
+    records the outcome of each expansion on the key element node, so repeated
+    expansions keep growing the graph instead of revisiting the same entities.
+    """
+
+    def __init__(self, db_manager, fetcher: WikipediaFetcher):
+        self.db_manager = db_manager
+        self.fetcher = fetcher
+
+    async def rank(self, breadth: int, ranking="degree") -> List[ExpansionCandidate]:
+        if ranking == "degree":
+            records = await self.db_manager.get_key_element_degrees(breadth)
+            return [ExpansionCandidate(**record) for record in records]
+        if ranking != "pagerank":
+            raise ValueError(f"Unknown ranking: {ranking}")
+
+        nodes, edges = await self.db_manager.get_key_element_cooccurrence()
+        if not nodes:
+            return []
+        positions = {node["id"]: i for i, node in enumerate(nodes)}
+        scores = pagerank(
+            np.array([positions[edge["source"]] for edge in edges], dtype=np.int64),
+            np.array([positions[edge["target"]] for edge in edges], dtype=np.int64),
+            np.array([edge["weight"] for edge in edges], dtype=np.float64),
+            len(nodes),
+        )
+        expandable = np.array([node["expandable"] for node in nodes], dtype=bool)
+        order = [i for i in np.argsort(-scores, kind="stable") if expandable[i]][:breadth]
+        return [
+            ExpansionCandidate(id=nodes[i]["id"], content=nodes[i]["content"], score=float(scores[i]))
+            for i in order
+        ]
+
+    async def plan(self, breadth: int, ranking="degree") -> ExpansionSource:
+        candidates = await self.rank(breadth, ranking)
+        log(
+            f"Expanding {len(candidates)} key elements by {ranking}: "
+            + ", ".join(f"{c.content} ({c.score:.3g})" for c in candidates),
+            console=True,
+        )
+        return ExpansionSource(candidates, self.fetcher)
+
+    async def record(self, document: SourceDocument, error: Exception = None):
+        if error is None:
+            status = "expanded"
+        elif isinstance(error, PageNotFoundError):
+            status = "not_found"
+        elif isinstance(error, DuplicatePageError):
+            status = "duplicate"
+        else:
+            # Anything else may be transient, so the key element stays a candidate for the next expansion
+            return
+        await self.db_manager.mark_key_elements_expanded([document.key], status)
+
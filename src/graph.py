@@ -1,5 +1,6 @@
-from typing import Set, List, Literal, Union
-from pydantic import BaseModel, Field
+from collections import defaultdict
+from typing import Set, List, Dict, Literal, Union, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class HashableBaseNode(BaseModel):
@@ -21,6 +22,7 @@ class DocumentNode(HashableBaseNode):
     id: str = Field(description="MD5 hash of the document content")
     content: str = Field(description="The document content")
     source: str = Field(description="Source URL")
+    topic: Optional[str] = Field(default=None, description="Topic the document was built for")
 
 
 class ChunkNode(HashableBaseNode):
@@ -28,6 +30,9 @@ class ChunkNode(HashableBaseNode):
     id: str = Field(description="MD5 hash of the chunk content")
     content: str = Field(description="The chunk content")
     index: int = Field(description="Index of the chunk")
+    prompt_version: Optional[str] = Field(
+        default=None, description="Extraction prompt version used for the chunk's facts"
+    )
 
 
 class AtomicFactNode(HashableBaseNode):
@@ -43,6 +48,15 @@ class KeyElementNode(HashableBaseNode):
     embeddings: list = Field(description="Embeddings of the key element content")
 
 
+# Source and target node labels implied by each relationship type
+RELATIONSHIP_LABELS = {
+    "HAS_CHUNK": ("document", "chunk"),
+    "NEXT": ("chunk", "chunk"),
+    "HAS_ATOMIC_FACT": ("chunk", "atomic_fact"),
+    "HAS_KEY_ELEMENT": ("atomic_fact", "key_element"),
+}
+
+
 class Edge(BaseModel):
     relationship: Literal["HAS_CHUNK", "NEXT", "HAS_ATOMIC_FACT", "HAS_KEY_ELEMENT"]
     source: str = Field(description="Source Node ID")
@@ -61,33 +75,71 @@ class Edge(BaseModel):
         return False
 
 
+Node = Union[DocumentNode, ChunkNode, AtomicFactNode, KeyElementNode]
+
+
 class Graph(BaseModel):
-    nodes: Set[Union[DocumentNode, ChunkNode, AtomicFactNode, KeyElementNode]] = Field(
-        default_factory=set, description="Set of nodes"
-    )
+    nodes: Set[Node] = Field(default_factory=set, description="Set of nodes")
     edges: Set[Edge] = Field(default_factory=set, description="Set of edges")
 
-    def add_node(
-        self, node: Union[DocumentNode, ChunkNode, AtomicFactNode, KeyElementNode]
-    ):
-        if node.id not in {n.id for n in self.nodes}:
+    # Indexes kept in sync by the add_* methods; always add through them rather than mutating the sets
+    _nodes_by_id: Dict[str, Node] = PrivateAttr(default_factory=dict)
+    _nodes_by_type: Dict[str, Dict[str, Node]] = PrivateAttr(
+        default_factory=lambda: defaultdict(dict)
+    )
+    _outgoing: Dict[str, Dict[str, Set[str]]] = PrivateAttr(
+        default_factory=lambda: defaultdict(lambda: defaultdict(set))
+    )
+    _incoming: Dict[str, Dict[str, Set[str]]] = PrivateAttr(
+        default_factory=lambda: defaultdict(lambda: defaultdict(set))
+    )
+
+    def model_post_init(self, __context):
+        nodes, edges = self.nodes, self.edges
+        self.nodes, self.edges = set(), set()
+        self.add_nodes(nodes)
+        self.add_edges(edges)
+
+    def add_node(self, node: Node):
+        if node.id not in self._nodes_by_id:
             self.nodes.add(node)
+            self._nodes_by_id[node.id] = node
+            self._nodes_by_type[node.type][node.id] = node
 
-    def add_nodes(
-        self,
-        nodes: List[Union[DocumentNode, ChunkNode, AtomicFactNode, KeyElementNode]],
-    ):
+    def add_nodes(self, nodes: List[Node]):
         for node in nodes:
             self.add_node(node)
 
     def add_edge(self, edge: Edge):
         if edge not in self.edges:
             self.edges.add(edge)
+            self._outgoing[edge.relationship][edge.source].add(edge.target)
+            self._incoming[edge.relationship][edge.target].add(edge.source)
 
     def add_edges(self, edges: List[Edge]):
         for edge in edges:
             self.add_edge(edge)
 
+    def get_node(self, node_id: str) -> Optional[Node]:
+        return self._nodes_by_id.get(node_id)
+
+    def nodes_of_type(self, node_type: str) -> List[Node]:
+        return list(self._nodes_by_type.get(node_type, {}).values())
+
+    def neighbors(
+        self,
+        node_id: str,
+        relationship: str = None,
+        direction: Literal["out", "in"] = "out",
+    ) -> List[str]:
+        adjacency = self._outgoing if direction == "out" else self._incoming
+        relationships = [relationship] if relationship else list(adjacency)
+        return [
+            neighbor_id
+            for rel in relationships
+            for neighbor_id in adjacency.get(rel, {}).get(node_id, ())
+        ]
+
     def __str__(self):
         """Pretty print the graph data for console or log file."""
         output = ["Graph:"]
@@ -1,21 +1,170 @@
+import asyncio
+import time
 from neo4j import AsyncGraphDatabase, GraphDatabase
-from graph import Graph
-from log_manager import log_error
-from typing import List, Dict
+from graph import Graph, RELATIONSHIP_LABELS
+from graph_store import GraphStore, BatchResult, ImportReport, unmatched_edge
+from graph_utils import chunked
+from log_manager import log, log_error
+from typing import List, Dict, Literal, Set
 
 
-def chunked(iterable, batch_size):
-    for i in range(0, len(iterable), batch_size):
-        yield iterable[i : i + batch_size]
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT document_id IF NOT EXISTS FOR (d:document) REQUIRE d.id IS UNIQUE",
+    "CREATE CONSTRAINT chunk_id IF NOT EXISTS FOR (c:chunk) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT atomic_fact_id IF NOT EXISTS FOR (f:atomic_fact) REQUIRE f.id IS UNIQUE",
+    "CREATE CONSTRAINT key_element_id IF NOT EXISTS FOR (k:key_element) REQUIRE k.id IS UNIQUE",
+    "CREATE INDEX chunk_index IF NOT EXISTS FOR (c:chunk) ON (c.index)",
+]
 
 
-class GraphDatabaseManager:
-    def __init__(self, uri: str, user: str, password: str, database: str):
+VECTOR_INDEX_NAME = "key_element_embeddings"
+
+
+# Reader queries, shared by the synchronous accessors and their async variants
+NODE_BY_ID_QUERY = "MATCH (n) WHERE n.id = $id RETURN n"
+
+ATOMIC_FACTS_QUERY = """
+MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-(fact:atomic_fact)<-[:HAS_ATOMIC_FACT]-(chunk)
+WHERE k.id IN $key_elements
+RETURN DISTINCT chunk.id AS chunk_id, fact.content AS text
+"""
+
+NEIGHBORS_QUERY = """
+MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-()-[:HAS_KEY_ELEMENT]->(neighbor)
+WHERE k.id IN $key_elements AND NOT neighbor.id IN $key_elements
+WITH neighbor, count(*) AS count
+ORDER BY count DESC LIMIT 50
+RETURN COLLECT(neighbor.id) AS possible_candidates
+"""
+
+KEY_ELEMENT_CONTEXT_QUERY = """
+CALL {
+    MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-(fact:atomic_fact)<-[:HAS_ATOMIC_FACT]-(chunk)
+    WHERE k.id IN $key_elements
+    RETURN collect(DISTINCT {chunk_id: chunk.id, text: fact.content}) AS atomic_facts
+}
+CALL {
+    MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-()-[:HAS_KEY_ELEMENT]->(neighbor)
+    WHERE k.id IN $key_elements AND NOT neighbor.id IN $key_elements
+    WITH neighbor, count(*) AS count
+    ORDER BY count DESC LIMIT 50
+    RETURN COLLECT(neighbor.id) AS possible_candidates
+}
+RETURN atomic_facts, possible_candidates
+"""
+
+CHUNK_WITH_ADJACENT_QUERY = """
+MATCH (c:chunk {id: $chunk_id})
+OPTIONAL MATCH (previous:chunk)-[:NEXT]->(c)
+OPTIONAL MATCH (c)-[:NEXT]->(next:chunk)
+RETURN c AS node, previous.id AS previous_id, next.id AS next_id
+LIMIT 1
+"""
+
+ADJACENT_CHUNKS_QUERY = """
+MATCH (c:chunk {id: $chunk_id})
+CALL {
+    WITH c
+    MATCH (previous:chunk)-[:NEXT]->(c)
+    OPTIONAL MATCH (before:chunk)-[:NEXT]->(previous)
+    RETURN previous AS node, before.id AS previous_id, c.id AS next_id
+    UNION
+    WITH c
+    MATCH (c)-[:NEXT]->(next:chunk)
+    OPTIONAL MATCH (next)-[:NEXT]->(after:chunk)
+    RETURN next AS node, c.id AS previous_id, after.id AS next_id
+}
+RETURN node, previous_id, next_id
+"""
+
+SUBSEQUENT_CHUNK_QUERY = """
+MATCH (c:chunk)-[:NEXT]->(next)
+WHERE c.id = $chunk_id
+RETURN next.id AS next
+"""
+
+PREVIOUS_CHUNK_QUERY = """
+MATCH (c:chunk)<-[:NEXT]-(previous)
+WHERE c.id = $chunk_id
+RETURN previous.id AS previous
+"""
+
+CHUNK_QUERY = """
+MATCH (c:chunk)
+WHERE c.id = $chunk_id
+RETURN c.id AS chunk_id, c.content AS text
+"""
+
+# Neo4j normalizes cosine scores to [0, 1]; map them back so both modes return cosine similarity
+VECTOR_SIMILAR_NODES_QUERY = """
+CALL db.index.vector.queryNodes($indexName, $k, $targetEmbeddings)
+YIELD node, score
+RETURN node.id AS id, 2 * score - 1 AS similarity
+"""
+
+BRUTE_FORCE_SIMILAR_NODES_QUERY = """
+WITH $targetEmbeddings AS target_embeddings
+MATCH (n:{label})
+WHERE n.embeddings IS NOT NULL
+WITH n, gds.similarity.cosine(n.embeddings, target_embeddings) AS similarity
+ORDER BY similarity DESC
+LIMIT $k
+RETURN n.id AS id, similarity
+"""
+
+
+def key_element_context(record) -> Dict[str, List]:
+    return {
+        "atomic_facts": [
+            {"chunk_id": fact["chunk_id"], "text": fact["text"]} for fact in record["atomic_facts"]
+        ] if record else [],
+        "neighbors": record["possible_candidates"] if record else [],
+    }
+
+
+def chunk_with_adjacent(record) -> Dict:
+    return {
+        "node": record["node"] if record else None,
+        "previous_id": record["previous_id"] if record else None,
+        "next_id": record["next_id"] if record else None,
+    }
+
+
+async def _run_write(tx, query, rows):
+    result = await tx.run(query, rows=rows)
+    return [record async for record in result]
+
+
+def _unmatched_edges(records) -> List[Dict[str, str]]:
+    return [
+        unmatched_edge(record["source_id"], record["target_id"], record["missing_source"], record["missing_target"])
+        for record in records
+    ]
+
+
+async def _run_query(tx, query, **parameters):
+    result = await tx.run(query, **parameters)
+    await result.consume()
+
+
+class GraphDatabaseManager(GraphStore):
+    def __init__(
+        self,
+        uri: str,
+        user: str,
+        password: str,
+        database: str,
+        similarity_mode: Literal["vector_index", "brute_force", "local"] = "vector_index",
+        vector_index=None,
+    ):
         self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password), database=database)
         self.sdriver = GraphDatabase.driver(uri, auth=(user, password), database=database)
+        self.similarity_mode = similarity_mode
+        self.vector_index = vector_index
 
     async def close(self):
         await self.driver.close()
+        self.sdriver.close()
 
     async def reset(self):
         async with self.driver.session() as session:
@@ -29,157 +178,445 @@ class GraphDatabaseManager:
                     await session.run(f"DROP CONSTRAINT {constraint_name}")
                 except Exception as e:
                     log_error(f"Error dropping constraint {constraint_name}: {e}")
-            await session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (c:chunk) REQUIRE c.id IS UNIQUE"
-            )
-            await session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (c:atomic_fact) REQUIRE c.id IS UNIQUE"
-            )
-            await session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (c:key_element) REQUIRE c.id IS UNIQUE"
-            )
-            await session.run(
-                "CREATE CONSTRAINT IF NOT EXISTS FOR (d:document) REQUIRE d.id IS UNIQUE"
-            )
-
-    async def import_graph(self, graph: Graph, batch_size=1000):
-        await self._import_nodes(graph.nodes, batch_size)
-        await self._import_edges(graph.edges, batch_size)
-
-    async def _import_nodes(self, nodes, batch_size):
-        async with self.driver.session() as session:
-            for batch in chunked(list(nodes), batch_size):
-                for node in batch:
-                    node_label = node.type  # Extract the type for the node label
-                    nodes_data = [
-                        {
-                            "id": node.id,
-                            "content": node.content,
-                            "source": getattr(node, "source", None),
-                            "index": getattr(node, "index", None),
-                            "embeddings": getattr(node, "embeddings", None),
-                        }
-                    ]
-                    query = f"""
-                    UNWIND $nodes AS node
-                    MERGE (n:{node_label} {{id: node.id}})
-                    SET n.content = node.content
-                        FOREACH (ignoreMe IN CASE WHEN node.source IS NOT NULL THEN [1] ELSE [] END | SET n.source = node.source)
-                        FOREACH (ignoreMe IN CASE WHEN node.index IS NOT NULL THEN [1] ELSE [] END | SET n.index = node.index)
-                        FOREACH (ignoreMe IN CASE WHEN node.embeddings IS NOT NULL THEN [1] ELSE [] END | SET n.embeddings = node.embeddings)
-                    """
-                    try:
-                        await session.run(query, nodes=nodes_data)
-                    except Exception as e:
-                        log_error(f"Error importing nodes batch: {e}")
-
-    async def _import_edges(self, edges, batch_size):
-        async with self.driver.session() as session:
-            for batch in chunked(list(edges), batch_size):
-                for edge in batch:
-                    relationship_type = (
-                        edge.relationship
-                    )  # Extract the relationship type
-                    edges_data = [
-                        {
-                            "source_id": edge.source,
-                            "target_id": edge.target,
-                        }
-                    ]
-                    query = f"""
-                    UNWIND $edges AS edge
-                    MATCH (source {{id: edge.source_id}})
-                    MATCH (target {{id: edge.target_id}})
-                    MERGE (source)-[r:{relationship_type}]->(target)
-                    """
-                    try:
-                        await session.run(query, edges=edges_data)
-                    except Exception as e:
-                        log_error(f"Error importing edges batch: {e}")
+        await self.ensure_schema()
 
-    async def get_node_by_id(self, node_id: str):
+    async def ensure_schema(self):
+        # Idempotent, so it is safe to run before every import without a destructive reset
+        async with self.driver.session() as session:
+            for query in SCHEMA_QUERIES:
+                try:
+                    result = await session.run(query)
+                    await result.consume()
+                except Exception as e:
+                    log_error(f"Error creating schema with `{query}`: {e}")
+
+    async def ensure_vector_index(
+        self, dimensions: int, label="key_element", index_name=VECTOR_INDEX_NAME
+    ):
+        # Neo4j keeps the index up to date as embeddings are written, so it only needs creating once
         async with self.driver.session() as session:
             result = await session.run(
-                "MATCH (n) WHERE n.id = $id RETURN n", id=node_id
+                f"""
+                CREATE VECTOR INDEX {index_name} IF NOT EXISTS
+                FOR (n:{label}) ON (n.embeddings)
+                OPTIONS {{indexConfig: {{
+                    `vector.dimensions`: {int(dimensions)},
+                    `vector.similarity_function`: 'cosine'
+                }}}}
+                """
+            )
+            await result.consume()
+
+    async def import_rows(
+        self,
+        node_groups: Dict[str, List[Dict]],
+        edge_groups: Dict[str, List[Dict]],
+        batch_size=1000,
+        concurrency=1,
+    ) -> ImportReport:
+        # Rows are grouped by node label and relationship type, in the node_row/edge_row format
+        report = ImportReport()
+        await self._import_nodes(node_groups, batch_size, concurrency, report)
+        embeddings = next(
+            (
+                row["properties"]["embeddings"]
+                for row in node_groups.get("key_element", [])
+                if row["properties"].get("embeddings")
+            ),
+            None,
+        )
+        if embeddings:
+            try:
+                await self.ensure_vector_index(len(embeddings))
+            except Exception as e:
+                log_error(f"Error creating vector index: {e}")
+        await self._import_edges(edge_groups, batch_size, concurrency, report)
+        log(report.summary())
+        return report
+
+    async def _import_nodes(self, groups, batch_size, concurrency, report: ImportReport):
+        batches = []
+        for node_label, rows in groups.items():
+            query = f"""
+            UNWIND $rows AS row
+            MERGE (n:{node_label} {{id: row.id}})
+            SET n += row.properties
+            """
+            for batch in chunked(rows, batch_size):
+                batches.append(("nodes", node_label, query, batch))
+        await self._run_batches(batches, concurrency, report)
+
+    async def _import_edges(self, groups, batch_size, concurrency, report: ImportReport):
+        batches = []
+        for relationship_type, rows in groups.items():
+            # Labeled MATCHes let Neo4j use the uniqueness constraints instead of scanning all nodes
+            source_label, target_label = RELATIONSHIP_LABELS[relationship_type]
+            # Rows whose source or target is missing create nothing and are returned, to be reported as failed
+            query = f"""
+            UNWIND $rows AS row
+            OPTIONAL MATCH (source:{source_label} {{id: row.source_id}})
+            OPTIONAL MATCH (target:{target_label} {{id: row.target_id}})
+            FOREACH (_ IN CASE WHEN source IS NULL OR target IS NULL THEN [] ELSE [1] END |
+                MERGE (source)-[:{relationship_type}]->(target)
             )
+            WITH row, source, target
+            WHERE source IS NULL OR target IS NULL
+            RETURN row.source_id AS source_id, row.target_id AS target_id,
+                   source IS NULL AS missing_source, target IS NULL AS missing_target
+            """
+            for batch in chunked(rows, batch_size):
+                batches.append(("edges", relationship_type, query, batch))
+        await self._run_batches(batches, concurrency, report)
+
+    async def _run_batches(self, batches, concurrency, report: ImportReport):
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_batch(kind, label, query, rows):
+            async with semaphore:
+                start = time.perf_counter()
+                failed = await self._write_batch(query, rows)
+                result = BatchResult(
+                    kind=kind,
+                    label=label,
+                    size=len(rows),
+                    seconds=time.perf_counter() - start,
+                    failed=failed,
+                )
+                log(
+                    f"Imported {kind} batch {label}: {result.size - len(failed)}/{result.size} rows in {result.seconds:.3f}s"
+                )
+                report.batches.append(result)
+
+        await asyncio.gather(*(run_batch(*batch) for batch in batches))
+
+    async def _write_batch(self, query, rows) -> List[Dict[str, str]]:
+        try:
+            async with self.driver.session() as session:
+                return _unmatched_edges(await session.execute_write(_run_write, query, rows))
+        except Exception as e:
+            log_error(f"Error importing batch of {len(rows)} rows, retrying rows individually: {e}")
+
+        # Isolate the failing rows so a single bad row doesn't drop the whole batch
+        failed = []
+        async with self.driver.session() as session:
+            for row in rows:
+                try:
+                    failed += _unmatched_edges(await session.execute_write(_run_write, query, [row]))
+                except Exception as e:
+                    row_id = row.get("id") or f"{row.get('source_id')}->{row.get('target_id')}"
+                    log_error(f"Error importing row {row_id}: {e}")
+                    failed.append({"id": row_id, "error": str(e)})
+        return failed
+
+    async def get_node_by_id(self, node_id: str):
+        async with self.driver.session() as session:
+            result = await session.run(NODE_BY_ID_QUERY, id=node_id)
             record = await result.single()
             return record["n"] if record else None
         
+    async def get_embedded_key_element_ids(self, ids: List[str]) -> Set[str]:
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (k:key_element)
+                WHERE k.id IN $ids AND k.embeddings IS NOT NULL
+                RETURN k.id AS id
+                """,
+                ids=ids,
+            )
+            return {record["id"] async for record in result}
+
+    async def get_key_element_aliases(self, ids: List[str]) -> Dict[str, str]:
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (k:key_element)
+                WHERE k.alias_ids IS NOT NULL
+                UNWIND k.alias_ids AS alias
+                WITH k, alias
+                WHERE alias IN $ids
+                RETURN alias, k.id AS id
+                """,
+                ids=ids,
+            )
+            return {record["alias"]: record["id"] async for record in result}
+
+    async def get_extracted_chunk_ids(self, ids: List[str], prompt_version: str) -> Set[str]:
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (c:chunk)
+                WHERE c.id IN $ids AND c.prompt_version = $prompt_version
+                RETURN c.id AS id
+                """,
+                ids=ids,
+                prompt_version=prompt_version,
+            )
+            return {record["id"] async for record in result}
+
+    async def mark_chunks_extracted(self, ids: List[str], prompt_version: str):
+        async with self.driver.session() as session:
+            await session.execute_write(
+                _run_query,
+                """
+                UNWIND $ids AS id
+                MATCH (c:chunk {id: id})
+                SET c.prompt_version = $prompt_version
+                """,
+                ids=ids,
+                prompt_version=prompt_version,
+            )
+
+    async def reconcile_document(self, graph: Graph):
+        documents = graph.nodes_of_type("document")
+        chunk_ids = [n.id for n in sorted(graph.nodes_of_type("chunk"), key=lambda n: n.index)]
+        async with self.driver.session() as session:
+            # Drop NEXT links that don't match the new chunk ordering. A reused chunk keeps its facts,
+            # but its neighbors from an older version of the document no longer apply.
+            await session.execute_write(
+                _run_query,
+                """
+                UNWIND range(0, size($chunk_ids) - 1) AS i
+                MATCH (c:chunk {id: $chunk_ids[i]})
+                OPTIONAL MATCH (c)-[next_link:NEXT]->(next:chunk)
+                WHERE i = size($chunk_ids) - 1 OR next.id <> $chunk_ids[i + 1]
+                OPTIONAL MATCH (previous:chunk)-[previous_link:NEXT]->(c)
+                WHERE i = 0 OR previous.id <> $chunk_ids[i - 1]
+                DELETE next_link, previous_link
+                """,
+                chunk_ids=chunk_ids,
+            )
+            # Remove older documents of the same topic, together with the chunks and facts only they reference
+            for document in documents:
+                if document.topic is None:
+                    continue
+                await session.execute_write(
+                    _run_query,
+                    """
+                    MATCH (old:document {topic: $topic})
+                    WHERE old.id <> $document_id
+                    OPTIONAL MATCH (old)-[:HAS_CHUNK]->(c:chunk)
+                    WHERE NOT c.id IN $chunk_ids
+                      AND NOT EXISTS { (other:document)-[:HAS_CHUNK]->(c) WHERE other <> old }
+                    OPTIONAL MATCH (c)-[:HAS_ATOMIC_FACT]->(f:atomic_fact)
+                    WHERE NOT EXISTS { (other_chunk:chunk)-[:HAS_ATOMIC_FACT]->(f) WHERE other_chunk <> c }
+                    DETACH DELETE f, c, old
+                    """,
+                    topic=document.topic,
+                    document_id=document.id,
+                    chunk_ids=chunk_ids,
+                )
+
+    async def delete_orphan_key_elements(self):
+        async with self.driver.session() as session:
+            await session.execute_write(
+                _run_query,
+                """
+                MATCH (k:key_element)
+                WHERE NOT EXISTS { (:atomic_fact)-[:HAS_KEY_ELEMENT]->(k) }
+                DETACH DELETE k
+                """,
+            )
+
+    async def get_key_element_embeddings(self):
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (k:key_element)
+                WHERE k.embeddings IS NOT NULL
+                RETURN k.id AS id, k.embeddings AS embeddings
+                """
+            )
+            records = [record async for record in result]
+            return [record["id"] for record in records], [record["embeddings"] for record in records]
+
+    async def get_key_element_degrees(self, limit: int) -> List[Dict]:
+        # Key elements not yet expanded and not already a document topic, ranked by the facts mentioning them
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                OPTIONAL MATCH (d:document)
+                WITH collect(toLower(d.topic)) AS topics
+                MATCH (k:key_element)
+                WHERE k.expansion_status IS NULL AND NOT toLower(k.content) IN topics
+                WITH k, COUNT { (k)<-[:HAS_KEY_ELEMENT]-(:atomic_fact) } AS degree
+                ORDER BY degree DESC
+                LIMIT $limit
+                RETURN k.id AS id, k.content AS content, degree AS score
+                """,
+                limit=limit,
+            )
+            return [record.data() async for record in result]
+
+    async def get_key_element_cooccurrence(self):
+        # Key elements with an expandable flag, and how many facts each pair of them shares
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                OPTIONAL MATCH (d:document)
+                WITH collect(toLower(d.topic)) AS topics
+                MATCH (k:key_element)
+                RETURN k.id AS id, k.content AS content,
+                       k.expansion_status IS NULL AND NOT toLower(k.content) IN topics AS expandable
+                """
+            )
+            nodes = [record.data() async for record in result]
+        return nodes, await self.get_key_element_pairs()
+
+    async def get_key_element_pairs(self) -> List[Dict]:
+        # Pairs of key elements mentioned by the same facts, with the number of facts they share
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (a:key_element)<-[:HAS_KEY_ELEMENT]-(:atomic_fact)-[:HAS_KEY_ELEMENT]->(b:key_element)
+                WHERE a.id < b.id
+                RETURN a.id AS source, b.id AS target, count(*) AS weight
+                """
+            )
+            return [record.data() async for record in result]
+
+    async def get_key_elements(self) -> List[Dict]:
+        async with self.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (k:key_element)
+                WHERE k.embeddings IS NOT NULL
+                RETURN k.id AS id, k.content AS content, k.embeddings AS embeddings,
+                       COUNT { (k)<-[:HAS_KEY_ELEMENT]-(:atomic_fact) } AS degree
+                """
+            )
+            return [record.data() async for record in result]
+
+    async def merge_key_elements(self, merges: List[Dict], batch_size=500):
+        # Moves the facts of each duplicate onto its canonical key element, which keeps the duplicate's name as an alias
+        async with self.driver.session() as session:
+            for batch in chunked(merges, batch_size):
+                await session.execute_write(
+                    _run_query,
+                    """
+                    UNWIND $merges AS merge
+                    MATCH (canonical:key_element {id: merge.canonical})
+                    MATCH (duplicate:key_element {id: merge.duplicate})
+                    CALL {
+                        WITH canonical, duplicate
+                        MATCH (fact:atomic_fact)-[link:HAS_KEY_ELEMENT]->(duplicate)
+                        MERGE (fact)-[:HAS_KEY_ELEMENT]->(canonical)
+                        DELETE link
+                    }
+                    SET canonical.aliases = coalesce(canonical.aliases, []) + duplicate.content + coalesce(duplicate.aliases, []),
+                        canonical.alias_ids = coalesce(canonical.alias_ids, []) + duplicate.id + coalesce(duplicate.alias_ids, []),
+                        canonical.expansion_status = coalesce(canonical.expansion_status, duplicate.expansion_status)
+                    DETACH DELETE duplicate
+                    """,
+                    merges=batch,
+                )
+
+    async def mark_key_elements_expanded(self, ids: List[str], status: str):
+        async with self.driver.session() as session:
+            await session.execute_write(
+                _run_query,
+                """
+                UNWIND $ids AS id
+                MATCH (k:key_element {id: id})
+                SET k.expansion_status = $status, k.expanded_at = timestamp()
+                """,
+                ids=ids,
+                status=status,
+            )
+
     def s_get_node_by_id(self, node_id: str):
         with self.sdriver.session() as session:
-            result = session.run(
-                "MATCH (n) WHERE n.id = $id RETURN n", id=node_id
-            )
-            record = result.single()
+            record = session.run(NODE_BY_ID_QUERY, id=node_id).single()
             return record["n"] if record else None
 
     def get_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
         with self.sdriver.session() as session:
-            result = session.run(
-                """
-                MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-(fact:atomic_fact)<-[:HAS_ATOMIC_FACT]-(chunk)
-                WHERE k.id IN $key_elements
-                RETURN DISTINCT chunk.id AS chunk_id, fact.content AS text
-                """,
-                {"key_elements": key_elements},
-            )
+            result = session.run(ATOMIC_FACTS_QUERY, {"key_elements": key_elements})
             return [
                 {"chunk_id": record["chunk_id"], "text": record["text"]}
                 for record in result
             ]
 
+    async def aget_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        async with self.driver.session() as session:
+            result = await session.run(ATOMIC_FACTS_QUERY, {"key_elements": key_elements})
+            return [
+                {"chunk_id": record["chunk_id"], "text": record["text"]}
+                async for record in result
+            ]
+
     def get_neighbors_by_key_element(self, key_elements) -> List[str]:
         with self.sdriver.session() as session:
-            result = session.run(
-                """
-                MATCH (k:key_element)<-[:HAS_KEY_ELEMENT]-()-[:HAS_KEY_ELEMENT]->(neighbor)
-                WHERE k.id IN $key_elements AND NOT neighbor.id IN $key_elements
-                WITH neighbor, count(*) AS count
-                ORDER BY count DESC LIMIT 50
-                RETURN COLLECT(neighbor.id) AS possible_candidates
-                """,
-                {"key_elements": key_elements},
-            )
-            record = result.single()
+            record = session.run(NEIGHBORS_QUERY, {"key_elements": key_elements}).single()
+            return record["possible_candidates"] if record else []
+
+    async def aget_neighbors_by_key_element(self, key_elements) -> List[str]:
+        async with self.driver.session() as session:
+            result = await session.run(NEIGHBORS_QUERY, {"key_elements": key_elements})
+            record = await result.single()
             return record["possible_candidates"] if record else []
 
     def get_subsequent_chunk_id(self, chunk_id: str) -> str:
         with self.sdriver.session() as session:
-            result = session.run(
-                """
-                MATCH (c:chunk)-[:NEXT]->(next)
-                WHERE c.id = $chunk_id
-                RETURN next.id AS next
-                """,
-                {"chunk_id": chunk_id},
-            )
-            record = result.single()
+            record = session.run(SUBSEQUENT_CHUNK_QUERY, {"chunk_id": chunk_id}).single()
+            return record["next"] if record else None
+
+    async def aget_subsequent_chunk_id(self, chunk_id: str) -> str:
+        async with self.driver.session() as session:
+            result = await session.run(SUBSEQUENT_CHUNK_QUERY, {"chunk_id": chunk_id})
+            record = await result.single()
             return record["next"] if record else None
 
     def get_previous_chunk_id(self, chunk_id: str) -> str:
         with self.sdriver.session() as session:
-            result = session.run(
-                """
-                MATCH (c:chunk)<-[:NEXT]-(previous)
-                WHERE c.id = $chunk_id
-                RETURN previous.id AS previous
-                """,
-                {"chunk_id": chunk_id},
-            )
-            record = result.single()
+            record = session.run(PREVIOUS_CHUNK_QUERY, {"chunk_id": chunk_id}).single()
             return record["previous"] if record else None
 
+    async def aget_previous_chunk_id(self, chunk_id: str) -> str:
+        async with self.driver.session() as session:
+            result = await session.run(PREVIOUS_CHUNK_QUERY, {"chunk_id": chunk_id})
+            record = await result.single()
+            return record["previous"] if record else None
+
+    def get_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        # Facts about the key elements and their ranked neighbor candidates in one round trip
+        with self.sdriver.session() as session:
+            return key_element_context(session.run(KEY_ELEMENT_CONTEXT_QUERY, {"key_elements": key_elements}).single())
+
+    async def aget_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        async with self.driver.session() as session:
+            result = await session.run(KEY_ELEMENT_CONTEXT_QUERY, {"key_elements": key_elements})
+            return key_element_context(await result.single())
+
+    def get_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        # A chunk node together with the ids of the chunks before and after it
+        with self.sdriver.session() as session:
+            return chunk_with_adjacent(session.run(CHUNK_WITH_ADJACENT_QUERY, {"chunk_id": chunk_id}).single())
+
+    async def aget_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        async with self.driver.session() as session:
+            result = await session.run(CHUNK_WITH_ADJACENT_QUERY, {"chunk_id": chunk_id})
+            return chunk_with_adjacent(await result.single())
+
+    async def get_adjacent_chunks(self, chunk_id: str) -> List[Dict]:
+        # The chunks before and after a chunk, in the shape of get_chunk_with_adjacent
+        async with self.driver.session() as session:
+            result = await session.run(ADJACENT_CHUNKS_QUERY, {"chunk_id": chunk_id})
+            return [chunk_with_adjacent(record) async for record in result]
+
     def get_chunk(self, chunk_id: str) -> Dict[str, str]:
         with self.sdriver.session() as session:
-            result = session.run(
-                """
-                MATCH (c:chunk)
-                WHERE c.id = $chunk_id
-                RETURN c.id AS chunk_id, c.content AS text
-                """,
-                {"chunk_id": chunk_id},
+            record = session.run(CHUNK_QUERY, {"chunk_id": chunk_id}).single()
+            return (
+                {"chunk_id": record["chunk_id"], "text": record["text"]}
+                if record
+                else None
             )
-            record = result.single()
+
+    async def aget_chunk(self, chunk_id: str) -> Dict[str, str]:
+        async with self.driver.session() as session:
+            result = await session.run(CHUNK_QUERY, {"chunk_id": chunk_id})
+            record = await result.single()
             return (
                 {"chunk_id": record["chunk_id"], "text": record["text"]}
                 if record
@@ -187,18 +624,62 @@ class GraphDatabaseManager:
             )
 
     def get_similar_nodes(self, target_embeddings: list, k: int = 50):
+        if self.similarity_mode == "local" and self.vector_index is not None:
+            return self.vector_index.get_similar_nodes(target_embeddings, k)
+        if self.similarity_mode == "vector_index":
+            try:
+                return self._vector_similar_nodes(target_embeddings, k)
+            except Exception as e:
+                log_error(f"Vector index query failed, falling back to brute-force similarity: {e}")
+        return self._brute_force_similar_nodes(target_embeddings, k)
+
+    async def aget_similar_nodes(self, target_embeddings: list, k: int = 50):
+        if self.similarity_mode == "local" and self.vector_index is not None:
+            # The index is memory-mapped, so a scan can fault pages in from disk
+            return await asyncio.to_thread(self.vector_index.get_similar_nodes, target_embeddings, k)
+        if self.similarity_mode == "vector_index":
+            try:
+                return await self._avector_similar_nodes(target_embeddings, k)
+            except Exception as e:
+                log_error(f"Vector index query failed, falling back to brute-force similarity: {e}")
+        return await self._abrute_force_similar_nodes(target_embeddings, k)
+
+    def _vector_similar_nodes(
+        self, target_embeddings: list, k: int, index_name=VECTOR_INDEX_NAME
+    ):
         with self.sdriver.session() as session:
             result = session.run(
-                """
-                WITH $targetEmbeddings AS target_embeddings
-                MATCH (n:key_element)
-                WHERE n.embeddings IS NOT NULL
-                WITH n, gds.similarity.cosine(n.embeddings, target_embeddings) AS similarity
-                ORDER BY similarity DESC
-                LIMIT $k
-                RETURN n.id AS id, similarity
-                """,
+                VECTOR_SIMILAR_NODES_QUERY,
+                {"indexName": index_name, "targetEmbeddings": target_embeddings, "k": k},
+            )
+            return [{"id": record["id"], "similarity": record["similarity"]} for record in result]
+
+    async def _avector_similar_nodes(
+        self, target_embeddings: list, k: int, index_name=VECTOR_INDEX_NAME
+    ):
+        async with self.driver.session() as session:
+            result = await session.run(
+                VECTOR_SIMILAR_NODES_QUERY,
+                {"indexName": index_name, "targetEmbeddings": target_embeddings, "k": k},
+            )
+            return [{"id": record["id"], "similarity": record["similarity"]} async for record in result]
+
+    def _brute_force_similar_nodes(
+        self, target_embeddings: list, k: int, label="key_element"
+    ):
+        with self.sdriver.session() as session:
+            result = session.run(
+                BRUTE_FORCE_SIMILAR_NODES_QUERY.format(label=label),
                 {"targetEmbeddings": target_embeddings, "k": k},
             )
             return [{"id": record["id"], "similarity": record["similarity"]} for record in result]
 
+    async def _abrute_force_similar_nodes(
+        self, target_embeddings: list, k: int, label="key_element"
+    ):
+        async with self.driver.session() as session:
+            result = await session.run(
+                BRUTE_FORCE_SIMILAR_NODES_QUERY.format(label=label),
+                {"targetEmbeddings": target_embeddings, "k": k},
+            )
+            return [{"id": record["id"], "similarity": record["similarity"]} async for record in result]
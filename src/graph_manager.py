@@ -1,85 +1,352 @@
 import asyncio
+import time
+from typing import Set
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_text_splitters import TokenTextSplitter
 from graph import Graph
 from prompt_manager import ExtractionPrompt
+from task_scheduler import TaskScheduler
+from text_chunker import TokenChunker
 from graph_utils import (
     create_chunk_node,
     create_document_node,
     parse_facts_xml,
+    FactStreamParser,
     create_chunk_edges,
+    chunked,
+    achunked,
 )
 from log_manager import log, log_error, log_chat
 
 
-async def extract_facts_from_chunk(chat, chunk):
-    chat_history = [
+def extraction_messages(chunk):
+    return [
         SystemMessage(content=ExtractionPrompt.prompt),
         HumanMessage(
             content=f"Input from document chunk #{chunk.index} (may be truncated):\n\n{chunk.content}..."
         ),
     ]
+
+
+def invalidate_cached_response(chat, chat_history):
+    if hasattr(chat, "invalidate"):
+        chat.invalidate(chat_history)
+
+
+async def extract_facts_from_chunk(chat, chunk):
+    chat_history = extraction_messages(chunk)
     res = await chat.ainvoke(chat_history)
-    chat_history.append(AIMessage(content=res.content))
-    log_chat(chat_history)
-    nodes, edges = parse_facts_xml(res.content, chunk)
+    log_chat(chat_history + [AIMessage(content=res.content)])
+    try:
+        nodes, edges = parse_facts_xml(res.content, chunk)
+    except ValueError:
+        invalidate_cached_response(chat, chat_history)
+        raise
     return nodes, edges
 
 
+async def astream_facts_from_chunk(chat, chunk):
+    # Yields the nodes and edges of each <AtomicFact> as soon as it closes in the token stream
+    chat_history = extraction_messages(chunk)
+    parser = FactStreamParser(chunk)
+    content = []
+    async for message_chunk in chat.astream(chat_history):
+        content.append(message_chunk.content)
+        nodes, edges = parser.feed(message_chunk.content)
+        if nodes:
+            yield nodes, edges
+    log_chat(chat_history + [AIMessage(content="".join(content))])
+    try:
+        nodes, edges = parser.close()
+    except ValueError:
+        invalidate_cached_response(chat, chat_history)
+        raise
+    if nodes:
+        yield nodes, edges
+
+
 class GraphManager:
-    def __init__(self, chat, central_topic, chunk_size=2000):
+    def __init__(self, chat, central_topic, chunk_size=2000, scheduler=None, source="wikipedia"):
         self.chat = chat
         self.central_topic = central_topic
+        self.source = source
         self.chunk_size = chunk_size
+        self.scheduler = scheduler or TaskScheduler()
+        self.chunker = TokenChunker(chunk_size, chunk_size // 10)
 
-    async def build_graph(self, document_content):
-        chunk_overlap = self.chunk_size // 10
+    def _create_document_graph(self, document_content):
         log(
-            f"Initializing graph build with params: central_topic={self.central_topic}, chunk_size={self.chunk_size}, chunk_overlap={chunk_overlap}, extraction_prompt_version={ExtractionPrompt.version}"
+            f"Initializing graph build with params: central_topic={self.central_topic}, chunk_size={self.chunk_size}, chunk_overlap={self.chunker.chunk_overlap}, extraction_prompt_version={ExtractionPrompt.version}"
         )
 
         # Initialize the graph and document node
         graph = Graph()
-        document = create_document_node(document_content, "wikipedia")
+        document = create_document_node(document_content, self.source, self.central_topic)
         graph.add_node(document)
+        return graph, document
 
-        # Split the document into chunks
-        text_splitter = TokenTextSplitter(
-            chunk_size=self.chunk_size, chunk_overlap=chunk_overlap
-        )
-        chunks = text_splitter.split_text(document_content)
+    async def _chunk_texts(self, document_content, chunk_texts=None):
+        # Batch builds pass chunk texts already split with TokenChunker.asplit on their process pool
+        if chunk_texts is not None:
+            for chunk_content in chunk_texts:
+                yield chunk_content
+            return
+        async for chunk_content in self.chunker.astream(document_content):
+            yield chunk_content
 
-        # add chunks to graph and run LLM extraction tasks in parallel
-        tasks = []
+    async def _create_chunks(self, document, document_content, chunk_texts=None):
+        # Chunk nodes are created as the document is cut, so extraction can start on the first one
         prev_chunk = None
-        for chunk_index, chunk_content in enumerate(chunks):
+        chunk_index = 0
+        async for chunk_content in self._chunk_texts(document_content, chunk_texts):
             chunk = create_chunk_node(chunk_content, chunk_index)
-            chunk_edges = create_chunk_edges(document, chunk, prev_chunk)
+            yield chunk, create_chunk_edges(document, chunk, prev_chunk)
             prev_chunk = chunk
-            graph.add_node(chunk)
-            graph.add_edges(chunk_edges)
-            tasks.append(extract_facts_from_chunk(self.chat, chunk))
+            chunk_index += 1
+
+    async def _chunk_batches(
+        self, graph, document, document_content, get_extracted_chunk_ids=None, chunk_texts=None, batch_size=32
+    ):
+        # Yields the graph of each batch of chunks with the chunks that still need extraction,
+        # and merges the batch into `graph`
+        total = skipped = 0
+        async for batch in achunked(self._create_chunks(document, document_content, chunk_texts), batch_size):
+            batch_graph = Graph()
+            for chunk, edges in batch:
+                batch_graph.add_node(chunk)
+                batch_graph.add_edges(edges)
+            graph.add_nodes(batch_graph.nodes)
+            graph.add_edges(batch_graph.edges)
+            chunks = [chunk for chunk, _ in batch]
+            pending = await self._chunks_to_extract(chunks, get_extracted_chunk_ids)
+            total += len(chunks)
+            skipped += len(chunks) - len(pending)
+            yield batch_graph, pending
+        if get_extracted_chunk_ids is not None:
+            log(
+                f"Incremental build: skipping {skipped}/{total} chunks already extracted with prompt version {ExtractionPrompt.version}.",
+                console=True,
+            )
+
+    @staticmethod
+    async def _chunks_to_extract(chunks, get_extracted_chunk_ids):
+        if get_extracted_chunk_ids is None:
+            return chunks
+        # Chunk ids hash their content, so an id extracted with the current prompt needs no new LLM call
+        extracted_ids = await get_extracted_chunk_ids(
+            [chunk.id for chunk in chunks], ExtractionPrompt.version
+        )
+        return [chunk for chunk in chunks if chunk.id not in extracted_ids]
+
+    async def build_graph(self, document_content, get_extracted_chunk_ids=None, chunk_texts=None):
+        graph, document = self._create_document_graph(document_content)
+
+        # run LLM extraction tasks through the scheduler, starting each batch as soon as it is cut
+        chunks, tasks = [], []
+        async for _, pending in self._chunk_batches(
+            graph, document, document_content, get_extracted_chunk_ids, chunk_texts
+        ):
+            chunks.extend(pending)
+            tasks.extend(
+                asyncio.ensure_future(self.scheduler.run(chunk.id, extract_facts_from_chunk, self.chat, chunk))
+                for chunk in pending
+            )
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # Add resulting nodes and edges to graph
-        for result in results:
+        # Add resulting nodes and edges to graph. Only chunks whose extraction succeeded get the prompt
+        # version, which the caller stores once their facts are imported.
+        for chunk, result in zip(chunks, results):
             if isinstance(result, Exception):
                 log_error(f"Error: {result}")
             else:
                 nodes, edges = result
                 graph.add_nodes(nodes)
                 graph.add_edges(edges)
+                chunk.prompt_version = ExtractionPrompt.version
+        log(f"Chunk extraction: {self.scheduler.summary(c.id for c in chunks)}", console=True)
         log(f"Initial graph build complete.")
         return graph
 
+    async def stream_build(
+        self,
+        document_content,
+        get_embedded_ids,
+        embed_documents,
+        import_graph,
+        mark_chunks_extracted,
+        extract_workers=8,
+        queue_size=8,
+        import_batch_size=500,
+        embedding_batch_size=64,
+        embedding_concurrency=4,
+        get_extracted_chunk_ids=None,
+        chunk_texts=None,
+    ):
+        # Chunk -> extract -> embed -> import stages connected by bounded queues. Each chunk's facts
+        # are written as soon as they are embedded, and full queues pause the stages upstream. Queue
+        # items pair a graph with the ids of the chunks whose extraction it completes.
+        start = time.perf_counter()
+        document_graph, document = self._create_document_graph(document_content)
+        pending_chunks = asyncio.Queue(maxsize=extract_workers)
+        extracted = asyncio.Queue(maxsize=queue_size)
+        embedded = asyncio.Queue(maxsize=queue_size)
+        chunks = []
+
+        async def chunk_stage():
+            # Document and chunk nodes go ahead of their facts so fact edges always find their chunk
+            document_only = Graph()
+            document_only.add_node(document)
+            await extracted.put((document_only, []))
+            async for chunk_graph, pending in self._chunk_batches(
+                document_graph, document, document_content, get_extracted_chunk_ids, chunk_texts
+            ):
+                await extracted.put((chunk_graph, []))
+                for chunk in pending:
+                    chunks.append(chunk)
+                    await pending_chunks.put(chunk)
+            for _ in range(extract_workers):
+                await pending_chunks.put(None)
+
+        async def extract_chunk(chunk):
+            # Facts are passed on while the completion is still streaming. If every attempt fails, the facts
+            # already sent stay imported but the chunk is never marked extracted, so the next incremental
+            # build extracts it again; node ids are content hashes and import MERGEs, so resent facts are harmless.
+            async for nodes, edges in astream_facts_from_chunk(self.chat, chunk):
+                fact_graph = Graph()
+                fact_graph.add_nodes(nodes)
+                fact_graph.add_edges(edges)
+                await extracted.put((fact_graph, []))
+            # Queued behind all of the chunk's facts, so the chunk is only marked extracted once they are imported
+            await extracted.put((Graph(), [chunk.id]))
+
+        async def extract_worker():
+            while (chunk := await pending_chunks.get()) is not None:
+                try:
+                    await self.scheduler.run(chunk.id, extract_chunk, chunk)
+                except Exception as e:
+                    log_error(f"Error: {e}")
+
+        async def extract_stage():
+            await asyncio.gather(chunk_stage(), *(extract_worker() for _ in range(extract_workers)))
+            await extracted.put(None)
+
+        async def embed_stage():
+            embedded_ids = set()
+            done = False
+            while not done:
+                item = await extracted.get()
+                if item is None:
+                    break
+                # Streamed facts arrive in small pieces, so embed everything already waiting together
+                chunk_graph = Graph()
+                extracted_ids = []
+                while item is not None:
+                    fact_graph, chunk_ids = item
+                    chunk_graph.add_nodes(fact_graph.nodes)
+                    chunk_graph.add_edges(fact_graph.edges)
+                    extracted_ids.extend(chunk_ids)
+                    if extracted.empty():
+                        break
+                    item = extracted.get_nowait()
+                    done = item is None
+                key_elements = [
+                    n for n in chunk_graph.nodes_of_type("key_element")
+                    if n.id not in embedded_ids
+                ]
+                # A key element whose embedding failed is tried again when a later chunk mentions it
+                embedded_ids |= await self.embed_key_elements(
+                    key_elements,
+                    get_embedded_ids,
+                    embed_documents,
+                    batch_size=embedding_batch_size,
+                    max_concurrency=embedding_concurrency,
+                )
+                await embedded.put((chunk_graph, extracted_ids))
+            await embedded.put(None)
+
+        async def import_stage():
+            batch = Graph()
+            batch_extracted_ids = []
+            imported_nodes = 0
+            done = False
+            while not done:
+                item = await embedded.get()
+                if item is None:
+                    done = True
+                else:
+                    chunk_graph, extracted_ids = item
+                    batch.add_nodes(chunk_graph.nodes)
+                    batch.add_edges(chunk_graph.edges)
+                    batch_extracted_ids.extend(extracted_ids)
+                # Flush full batches, and partial ones whenever the upstream stages are idle
+                if (batch.nodes or batch_extracted_ids) and (
+                    done or embedded.empty() or len(batch.nodes) >= import_batch_size
+                ):
+                    if batch.nodes:
+                        await import_graph(batch)
+                        if not imported_nodes:
+                            log(
+                                f"First data queryable after {time.perf_counter() - start:.1f}s.",
+                                console=True,
+                            )
+                        imported_nodes += len(batch.nodes)
+                    if batch_extracted_ids:
+                        await mark_chunks_extracted(batch_extracted_ids, ExtractionPrompt.version)
+                    batch = Graph()
+                    batch_extracted_ids = []
+            return imported_nodes
+
+        _, _, imported_nodes = await asyncio.gather(extract_stage(), embed_stage(), import_stage())
+        log(f"Chunk extraction: {self.scheduler.summary(c.id for c in chunks)}", console=True)
+        log(
+            f"Streaming graph build complete: {imported_nodes} nodes imported in {time.perf_counter() - start:.1f}s.",
+            console=True,
+        )
+        return document_graph
+
     @staticmethod
-    async def add_entity_embeddings(graph, get_node_by_id, get_embeddings):
-        async def get_missing_embeddings(n):
-            if n.type == "key_element":
-                db_node = await get_node_by_id(n.id)
-                if db_node is None:
-                    res_embeddings = await get_embeddings(n.content)
-                    n.embeddings = res_embeddings
-                    log(f"Updated embeddings for node {n.id}: {res_embeddings}")
-
-        await asyncio.gather(*(get_missing_embeddings(n) for n in graph.nodes))
+    async def add_entity_embeddings(
+        graph, get_embedded_ids, embed_documents, batch_size=64, max_concurrency=4
+    ):
+        await GraphManager.embed_key_elements(
+            graph.nodes_of_type("key_element"),
+            get_embedded_ids,
+            embed_documents,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+        )
+
+    @staticmethod
+    async def embed_key_elements(
+        nodes, get_embedded_ids, embed_documents, batch_size=64, max_concurrency=4
+    ) -> Set[str]:
+        # Returns the ids of the key elements that have an embedding, on the node or already in the database
+        key_elements = [n for n in nodes if not n.embeddings]
+        if not key_elements:
+            return {n.id for n in nodes}
+        # Resolve every key element already embedded in the database with a single lookup
+        embedded_ids = await get_embedded_ids([n.id for n in key_elements])
+        missing = [n for n in key_elements if n.id not in embedded_ids]
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def embed_batch(batch):
+            async with semaphore:
+                try:
+                    embeddings = await embed_documents([n.content for n in batch])
+                except Exception as e:
+                    log_error(f"Error embedding batch of {len(batch)} key elements: {e}")
+                    return 0
+            for node, node_embeddings in zip(batch, embeddings):
+                node.embeddings = node_embeddings
+            return len(batch)
+
+        start = time.perf_counter()
+        counts = await asyncio.gather(
+            *(embed_batch(batch) for batch in chunked(missing, batch_size))
+        )
+        elapsed = time.perf_counter() - start
+        embedded = sum(counts)
+        log(
+            f"Embedded {embedded}/{len(missing)} key elements ({len(embedded_ids)} already embedded) "
+            f"in {elapsed:.2f}s ({embedded / elapsed if elapsed else 0:.1f} embeddings/sec)."
+        )
+        return {n.id for n in nodes if n.embeddings} | embedded_ids
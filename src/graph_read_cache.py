@@ -0,0 +1,187 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from cache_manager import MemoryCache
+from log_manager import log_error
+
+# Lookups memoized for the question being answered. Each question sets its own dict, which the
+# tasks and threads LangGraph runs its nodes on inherit through the context.
+question_memo: ContextVar[Optional[Dict]] = ContextVar("question_memo", default=None)
+
+
+@contextmanager
+def question_scope():
+    token = question_memo.set({})
+    try:
+        yield
+    finally:
+        question_memo.reset(token)
+
+
+def _exists(value) -> bool:
+    # Missing nodes, chunks and links may be written by a later build, so misses are not cached
+    if isinstance(value, dict) and "node" in value:
+        return value["node"] is not None
+    return value is not None
+
+
+class CachedGraphReader:
+    """Caches the reader's lookups in front of a GraphStore.
+
+    Facts, neighbors and similar nodes are memoized for the duration of one
+    question. Chunk nodes are content-addressed, so they and their NEXT links are
+    kept in a process-wide MemoryCache; the TTL bounds how long a link can be stale
+    after a rebuild reorders a document. Lookups that find nothing are not cached.
+    On the async path, reading a chunk with its adjacent ids prefetches the chunks
+    before and after it in the background; the sync path has no event loop to
+    prefetch on. Other methods pass through.
+    """
+
+    def __init__(self, db_manager, chunk_cache: MemoryCache, prefetch=True):
+        self.db_manager = db_manager
+        self.chunk_cache = chunk_cache
+        self.prefetch = prefetch
+        self.prefetches: Dict[str, asyncio.Task] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.db_manager, name)
+
+    def _memoized(self, key, fetch):
+        memo = question_memo.get()
+        if memo is None:
+            return fetch()
+        if key not in memo:
+            memo[key] = fetch()
+        return memo[key]
+
+    async def _amemoized(self, key, fetch):
+        # Concurrent branches of a question asking for the same key share one query
+        memo = question_memo.get()
+        if memo is None:
+            return await fetch()
+        if key not in memo:
+            memo[key] = asyncio.ensure_future(fetch())
+        try:
+            return await memo[key]
+        except Exception:
+            memo.pop(key, None)
+            raise
+
+    def _cached(self, key, fetch):
+        found, value = self.chunk_cache.get(key)
+        if not found:
+            value = fetch()
+            if _exists(value):
+                self.chunk_cache.put(key, value)
+        return value
+
+    async def _acached(self, key, fetch):
+        found, value = self.chunk_cache.get(key)
+        if not found:
+            value = await fetch()
+            if _exists(value):
+                self.chunk_cache.put(key, value)
+        return value
+
+    def get_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        return self._memoized(
+            ("atomic_facts", tuple(key_elements)), lambda: self.db_manager.get_atomic_facts(key_elements)
+        )
+
+    async def aget_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        return await self._amemoized(
+            ("atomic_facts", tuple(key_elements)), lambda: self.db_manager.aget_atomic_facts(key_elements)
+        )
+
+    def get_neighbors_by_key_element(self, key_elements) -> List[str]:
+        return self._memoized(
+            ("neighbors", tuple(key_elements)), lambda: self.db_manager.get_neighbors_by_key_element(key_elements)
+        )
+
+    async def aget_neighbors_by_key_element(self, key_elements) -> List[str]:
+        return await self._amemoized(
+            ("neighbors", tuple(key_elements)), lambda: self.db_manager.aget_neighbors_by_key_element(key_elements)
+        )
+
+    def get_similar_nodes(self, target_embeddings: list, k: int = 50):
+        return self._memoized(
+            ("similar_nodes", tuple(target_embeddings), k),
+            lambda: self.db_manager.get_similar_nodes(target_embeddings, k),
+        )
+
+    async def aget_similar_nodes(self, target_embeddings: list, k: int = 50):
+        return await self._amemoized(
+            ("similar_nodes", tuple(target_embeddings), k),
+            lambda: self.db_manager.aget_similar_nodes(target_embeddings, k),
+        )
+
+    def get_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        return self._memoized(
+            ("key_element_context", tuple(key_elements)),
+            lambda: self.db_manager.get_key_element_context(key_elements),
+        )
+
+    async def aget_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        return await self._amemoized(
+            ("key_element_context", tuple(key_elements)),
+            lambda: self.db_manager.aget_key_element_context(key_elements),
+        )
+
+    def s_get_node_by_id(self, node_id: str):
+        return self._cached(("node", node_id), lambda: self.db_manager.s_get_node_by_id(node_id))
+
+    async def get_node_by_id(self, node_id: str):
+        return await self._acached(("node", node_id), lambda: self.db_manager.get_node_by_id(node_id))
+
+    def get_subsequent_chunk_id(self, chunk_id: str) -> str:
+        return self._cached(("next", chunk_id), lambda: self.db_manager.get_subsequent_chunk_id(chunk_id))
+
+    async def aget_subsequent_chunk_id(self, chunk_id: str) -> str:
+        return await self._acached(("next", chunk_id), lambda: self.db_manager.aget_subsequent_chunk_id(chunk_id))
+
+    def get_previous_chunk_id(self, chunk_id: str) -> str:
+        return self._cached(("previous", chunk_id), lambda: self.db_manager.get_previous_chunk_id(chunk_id))
+
+    async def aget_previous_chunk_id(self, chunk_id: str) -> str:
+        return await self._acached(("previous", chunk_id), lambda: self.db_manager.aget_previous_chunk_id(chunk_id))
+
+    def get_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        return self._cached(("chunk", chunk_id), lambda: self.db_manager.get_chunk_with_adjacent(chunk_id))
+
+    async def aget_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        task = self.prefetches.get(chunk_id)
+        if task is not None:
+            await asyncio.shield(task)
+        chunk = await self._acached(("chunk", chunk_id), lambda: self.db_manager.aget_chunk_with_adjacent(chunk_id))
+        if self.prefetch and chunk["node"] is not None:
+            self._prefetch_adjacent(chunk_id, chunk)
+        return chunk
+
+    def _prefetch_adjacent(self, chunk_id: str, chunk: Dict):
+        missing = [
+            adjacent_id for adjacent_id in (chunk["previous_id"], chunk["next_id"])
+            if adjacent_id is not None and adjacent_id not in self.prefetches
+            and ("chunk", adjacent_id) not in self.chunk_cache
+        ]
+        if not missing:
+            return
+        task = asyncio.ensure_future(self._fetch_adjacent(chunk_id))
+        for adjacent_id in missing:
+            self.prefetches[adjacent_id] = task
+
+        def done(_):
+            for adjacent_id in missing:
+                self.prefetches.pop(adjacent_id, None)
+
+        task.add_done_callback(done)
+
+    async def _fetch_adjacent(self, chunk_id: str):
+        try:
+            adjacent = await self.db_manager.get_adjacent_chunks(chunk_id)
+        except Exception as e:
+            # A failed prefetch only costs the lookup it would have saved
+            log_error(f"Prefetch of chunks around {chunk_id} failed: {e}")
+            return
+        for chunk in adjacent:
+            self.chunk_cache.put(("chunk", chunk["node"]["id"]), chunk)
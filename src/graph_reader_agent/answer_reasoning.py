@@ -12,20 +12,28 @@ class AnswerReasonOutput(BaseModel):
 class AnswerReasoning:
     def __init__(self, chat_model):
         self.chat_model = chat_model
-
-    def __call__(self, state: OverallState) -> OverallState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", ANSWER_REASONING_PROMPT),
             ("human", """
 Question: {question}
 Notebook: {notebook}"""),
         ])
-        chain = prompt | self.chat_model.with_structured_output(AnswerReasonOutput)
-        result = chain.invoke({
+        self.chain = prompt | self.chat_model.with_structured_output(AnswerReasonOutput)
+
+    def __call__(self, state: OverallState) -> OverallState:
+        return self._response(self.chain.invoke(self._inputs(state)))
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        return self._response(await self.chain.ainvoke(self._inputs(state)))
+
+    @staticmethod
+    def _inputs(state: OverallState) -> Dict:
+        return {
             "question": state.get("question"),
             "notebook": state.get("notebook"),
-        })
+        }
 
+    def _response(self, result: AnswerReasonOutput) -> OverallState:
         log(f"Final Answer: {result.final_answer}")
 
         return {
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from graph_reader_agent.state import OverallState
@@ -15,8 +15,6 @@ class AtomicFactCheck:
     def __init__(self, chat_model, db_context):
         self.chat_model = chat_model
         self.db_context = db_context
-
-    def __call__(self, state: OverallState) -> OverallState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", ATOMIC_FACT_CHECK_PROMPT),
             ("human", """
@@ -26,18 +24,32 @@ Previous actions: {previous_actions}
 Notebook: {notebook}
 Atomic facts: {atomic_facts}"""),
         ])
-        chain = prompt | self.chat_model.with_structured_output(AtomicFactOutput)
+        self.chain = prompt | self.chat_model.with_structured_output(AtomicFactOutput)
 
+    def __call__(self, state: OverallState) -> OverallState:
         log(f"Check Atomic Facts Queue: {state.get('check_atomic_facts_queue')}")
-        atomic_facts = self.db_context.get_atomic_facts(state.get("check_atomic_facts_queue"))
-        result = chain.invoke({
+        # Facts and neighbor candidates come back together, so reading a neighbor needs no second round trip
+        context = self.db_context.get_key_element_context(state.get("check_atomic_facts_queue"))
+        result = self.chain.invoke(self._inputs(state, context["atomic_facts"]))
+        return self._response(state, result, context["neighbors"])
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        log(f"Check Atomic Facts Queue: {state.get('check_atomic_facts_queue')}")
+        context = await self.db_context.aget_key_element_context(state.get("check_atomic_facts_queue"))
+        result = await self.chain.ainvoke(self._inputs(state, context["atomic_facts"]))
+        return self._response(state, result, context["neighbors"])
+
+    @staticmethod
+    def _inputs(state: OverallState, atomic_facts: List[Dict[str, str]]) -> Dict:
+        return {
             "question": state.get("question"),
             "rational_plan": state.get("rational_plan"),
             "notebook": state.get("notebook"),
             "previous_actions": state.get("previous_actions"),
             "atomic_facts": atomic_facts,
-        })
+        }
 
+    def _response(self, state: OverallState, result: AtomicFactOutput, neighbors: List[str]) -> OverallState:
         chosen_action = parse_function(result.chosen_action)
         log(f"Chosen Action: {chosen_action}")
 
@@ -47,9 +59,7 @@ Atomic facts: {atomic_facts}"""),
             "check_atomic_facts_queue": [],
             "previous_actions": [f"atomic_fact_check({state.get('check_atomic_facts_queue')})"],
         }
-        
         if chosen_action.get("function_name") == "stop_and_read_neighbor":
-            neighbors = self.db_context.get_neighbors_by_key_element(state.get("check_atomic_facts_queue"))
             response["neighbor_check_queue"] = neighbors
         elif chosen_action.get("function_name") == "read_chunk":
             response["check_chunks_queue"] = chosen_action.get("arguments")[0]
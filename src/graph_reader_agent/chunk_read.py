@@ -16,8 +16,6 @@ class ChunkRead:
         self.chat_model = chat_model
         self.embeddings_model = embeddings_model
         self.db_context = db_context
-
-    def __call__(self, state: OverallState) -> OverallState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", CHUNK_READ_PROMPT),
             ("human", """
@@ -27,19 +25,46 @@ Previous actions: {previous_actions}
 Notebook: {notebook}
 Chunk: {chunk}"""),
         ])
-        chain = prompt | self.chat_model.with_structured_output(ChunkOutput)
+        self.chain = prompt | self.chat_model.with_structured_output(ChunkOutput)
+
+    def __call__(self, state: OverallState) -> OverallState:
+        check_chunks_queue = state.get("check_chunks_queue")
+        chunk_id = check_chunks_queue.pop()
+        # The chunk comes with the ids of its neighbors, so reading on needs no second round trip
+        chunk = self.db_context.get_chunk_with_adjacent(chunk_id)
+        result = self.chain.invoke(self._inputs(state, chunk["node"]))
 
+        response, chosen_action = self._response(result, chunk_id, chunk, check_chunks_queue)
+        if chosen_action == "search_more" and not check_chunks_queue:
+            # Get neighbors/use vector similarity
+            embeddings = self.embeddings_model.embed_query(result.rational_next_action)
+            response["neighbor_check_queue"] = self.db_context.get_similar_nodes(embeddings)
+        return response
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
         check_chunks_queue = state.get("check_chunks_queue")
         chunk_id = check_chunks_queue.pop()
-        chunk_text = self.db_context.s_get_node_by_id(chunk_id)
-        result = chain.invoke({
+        chunk = await self.db_context.aget_chunk_with_adjacent(chunk_id)
+        result = await self.chain.ainvoke(self._inputs(state, chunk["node"]))
+
+        response, chosen_action = self._response(result, chunk_id, chunk, check_chunks_queue)
+        if chosen_action == "search_more" and not check_chunks_queue:
+            # Get neighbors/use vector similarity
+            embeddings = await self.embeddings_model.aembed_query(result.rational_next_action)
+            response["neighbor_check_queue"] = await self.db_context.aget_similar_nodes(embeddings)
+        return response
+
+    @staticmethod
+    def _inputs(state: OverallState, chunk_text) -> Dict:
+        return {
             "question": state.get("question"),
             "rational_plan": state.get("rational_plan"),
             "notebook": state.get("notebook"),
             "previous_actions": state.get("previous_actions"),
             "chunk": chunk_text,
-        })
-        
+        }
+
+    def _response(self, result: ChunkOutput, chunk_id: str, chunk: Dict, check_chunks_queue):
         chosen_action = parse_function(result.chosen_action)
         log(
             f"Rational for next action after reading chunks: {result.rational_next_action}"
@@ -50,23 +75,15 @@ Chunk: {chunk}"""),
             "notebook": result.updated_notebook,
             "chosen_action": chosen_action.get("function_name"),
             "previous_actions": [f"read_chunk([{chunk_id}])"],
+            "check_chunks_queue": check_chunks_queue,
         }
         if chosen_action.get("function_name") == "read_subsequent_chunk":
-            subsequent_id = self.db_context.get_subsequent_chunk_id(chunk_id)
-            check_chunks_queue.append(subsequent_id)
+            check_chunks_queue.append(chunk["next_id"])
         elif chosen_action.get("function_name") == "read_previous_chunk":
-            previous_id = self.db_context.get_previous_chunk_id(chunk_id)
-            check_chunks_queue.append(previous_id)
-        elif chosen_action.get("function_name") == "search_more":
-            # Go over to next chunk
-            # Else explore neighbors
-            if not check_chunks_queue:
-                response["chosen_action"] = "search_neighbor"
-                # Get neighbors/use vector similarity
-                log(f"Neighbor rational: {result.rational_next_action}")
-                embeddings = self.embeddings_model.embed_query(result.rational_next_action)
-                neighbors = self.db_context.get_similar_nodes(embeddings)
-                response["neighbor_check_queue"] = neighbors
-
-        response["check_chunks_queue"] = check_chunks_queue
-        return response
\ No newline at end of file
+            check_chunks_queue.append(chunk["previous_id"])
+        # Go over to next chunk
+        # Else explore neighbors
+        elif chosen_action.get("function_name") == "search_more" and not check_chunks_queue:
+            response["chosen_action"] = "search_neighbor"
+            log(f"Neighbor rational: {result.rational_next_action}")
+        return response, chosen_action.get("function_name")
\ No newline at end of file
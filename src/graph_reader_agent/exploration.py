@@ -0,0 +1,62 @@
+from typing import List
+from langgraph.types import Send
+from graph_reader_agent.state import OverallState
+from log_manager import log, log_error
+
+
+class Exploration:
+    # Runs the atomic fact / chunk / neighbor loop for one initial node in its own branch with its own notebook
+    def __init__(self, exploration_graph):
+        self.exploration_graph = exploration_graph
+
+    @staticmethod
+    def branches(state: OverallState) -> List[Send]:
+        return [
+            Send("exploration", {
+                "question": state.get("question"),
+                "rational_plan": state.get("rational_plan"),
+                "notebook": "",
+                "previous_actions": state.get("previous_actions"),
+                "check_atomic_facts_queue": [key_element],
+            })
+            for key_element in state.get("check_atomic_facts_queue")
+        ]
+
+    def __call__(self, state: OverallState) -> OverallState:
+        try:
+            result = self.exploration_graph.invoke(state)
+        except Exception as e:
+            result, error = state, e
+        else:
+            error = None
+        return self._response(state, result, error)
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        try:
+            result = await self.exploration_graph.ainvoke(state)
+        except Exception as e:
+            result, error = state, e
+        else:
+            error = None
+        return self._response(state, result, error)
+
+    @staticmethod
+    def _response(state: OverallState, result: OverallState, error: Exception = None) -> OverallState:
+        # A failed branch contributes nothing, the notebooks of the other branches still reach the answer
+        key_element = state.get("check_atomic_facts_queue")[0]
+        if error is not None:
+            log_error(f"Exploration from {key_element} failed: {error}")
+        branch_actions = result.get("previous_actions")[len(state.get("previous_actions")):]
+        log(f"Exploration from {key_element}: {branch_actions}")
+        notebook = result.get("notebook")
+        return {
+            "notebooks": [f"Exploration from {key_element}:\n{notebook}"] if notebook else [],
+            "previous_actions": [f"exploration({key_element}): {branch_actions}"],
+        }
+
+    @staticmethod
+    def merge_notebooks(state: OverallState) -> OverallState:
+        return {
+            "notebook": "\n\n".join(state.get("notebooks") or []),
+            "previous_actions": ["merge_notebooks"],
+        }
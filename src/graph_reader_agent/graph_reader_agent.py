@@ -4,14 +4,17 @@ from graph_reader_agent.neighbor_select import NeighborSelect
 from graph_reader_agent.rational_plan import RationalPlan
 from graph_reader_agent.answer_reasoning import AnswerReasoning
 from graph_reader_agent.initial_node_selection import InitialNodeSelection
+from graph_reader_agent.exploration import Exploration
 from graph_reader_agent.state import OverallState, InputState, OutputState
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
+from graph_read_cache import question_scope
 from log_manager import log
 from pprint import pformat
 
 
 class GraphReaderAgent:
-    def __init__(self, db_context, model_context):
+    def __init__(self, db_context, model_context, parallel=False):
         self.db_context = db_context
         self.chat_model = model_context.chat
 
@@ -24,16 +27,25 @@ class GraphReaderAgent:
         self.answer_reasoning = AnswerReasoning(model_context.chat)
 
         # Create the state graph
+        self.parallel = parallel
         self.langgraph = StateGraph(OverallState, input=InputState, output=OutputState)
-        self._setup_graph()
+        if parallel:
+            self._setup_parallel_graph()
+        else:
+            self._setup_graph()
+
+    @staticmethod
+    def _node(component, name):
+        # invoke runs the component's sync path and ainvoke its async path, which never blocks the event loop
+        return RunnableLambda(component.__call__, afunc=component.ainvoke, name=name)
 
     def _setup_graph(self):
-        self.langgraph.add_node("initial_node_selection", action=self.initial_node_selection)
-        self.langgraph.add_node("rational_plan_node", action=self.rational_plan)
-        self.langgraph.add_node("atomic_fact_check", self.atomic_fact_check)
-        self.langgraph.add_node("chunk_read", self.chunk_read)
-        self.langgraph.add_node("neighbor_select", self.neighbor_select)
-        self.langgraph.add_node("answer_reasoning", self.answer_reasoning)
+        self.langgraph.add_node("initial_node_selection", self._node(self.initial_node_selection, "initial_node_selection"))
+        self.langgraph.add_node("rational_plan_node", self._node(self.rational_plan, "rational_plan_node"))
+        self.langgraph.add_node("atomic_fact_check", self._node(self.atomic_fact_check, "atomic_fact_check"))
+        self.langgraph.add_node("chunk_read", self._node(self.chunk_read, "chunk_read"))
+        self.langgraph.add_node("neighbor_select", self._node(self.neighbor_select, "neighbor_select"))
+        self.langgraph.add_node("answer_reasoning", self._node(self.answer_reasoning, "answer_reasoning"))
 
         self.langgraph.add_edge(START, "rational_plan_node")
         self.langgraph.add_edge("rational_plan_node", "initial_node_selection")
@@ -46,17 +58,70 @@ class GraphReaderAgent:
         self.langgraph.add_edge("answer_reasoning", END)
         self.langgraph = self.langgraph.compile()
 
-    def invoke(self, question):
+    def _setup_parallel_graph(self):
+        # Every initial node is explored in its own branch, so the wall-clock time is that of the longest branch.
+        # A branch ends where the sequential graph would reason about the answer, and the notebooks of all
+        # branches are merged before the answer is reasoned about once.
+        exploration_graph = StateGraph(OverallState)
+        exploration_graph.add_node("atomic_fact_check", self._node(self.atomic_fact_check, "atomic_fact_check"))
+        exploration_graph.add_node("chunk_read", self._node(self.chunk_read, "chunk_read"))
+        exploration_graph.add_node("neighbor_select", self._node(self.neighbor_select, "neighbor_select"))
+        exploration_graph.add_edge(START, "atomic_fact_check")
+        branch_end = {
+            "atomic_fact_check": "atomic_fact_check",
+            "chunk_read": "chunk_read",
+            "neighbor_select": "neighbor_select",
+            "answer_reasoning": END,
+        }
+        exploration_graph.add_conditional_edges("atomic_fact_check", self.atomic_fact_condition, branch_end)
+        exploration_graph.add_conditional_edges("chunk_read", self.chunk_condition, branch_end)
+        exploration_graph.add_conditional_edges("neighbor_select", self.neighbor_condition, branch_end)
+        self.exploration = Exploration(exploration_graph.compile())
+
+        self.langgraph.add_node("rational_plan_node", self._node(self.rational_plan, "rational_plan_node"))
+        self.langgraph.add_node("initial_node_selection", self._node(self.initial_node_selection, "initial_node_selection"))
+        self.langgraph.add_node("exploration", self._node(self.exploration, "exploration"))
+        self.langgraph.add_node("merge_notebooks", self.exploration.merge_notebooks)
+        self.langgraph.add_node("answer_reasoning", self._node(self.answer_reasoning, "answer_reasoning"))
+
+        self.langgraph.add_edge(START, "rational_plan_node")
+        self.langgraph.add_edge("rational_plan_node", "initial_node_selection")
+        self.langgraph.add_conditional_edges(
+            "initial_node_selection", self.exploration_condition, ["exploration", "merge_notebooks"]
+        )
+        self.langgraph.add_edge("exploration", "merge_notebooks")
+        self.langgraph.add_edge("merge_notebooks", "answer_reasoning")
+        self.langgraph.add_edge("answer_reasoning", END)
+        self.langgraph = self.langgraph.compile()
+
+    def invoke(self, question, console=True):
+        inputs = {"question": question}
+        with question_scope():
+            for output in self.langgraph.stream(inputs, stream_mode="debug"):
+                self._log_output(output, console)
+        log(f"{'*' * 150}", console=console)
+        return output['payload']['result']
+
+    async def ainvoke(self, question, console=True):
+        # Many questions can be answered concurrently on one event loop and one database connection pool
         inputs = {"question": question}
-        for output in self.langgraph.stream(inputs, stream_mode="debug"):
-            log(f"Type: {output['type']} --- Step: {output['step']} {"-" * 150}", console=True)
-            if output['type'] == "task":
-                log(pformat(output['payload']['input'], width=200), console=True)
-            elif output['type'] == "task_result":
-                log(pformat(output['payload']['result'], width=200), console=True)
-        log(f"{'*' * 150}", console=True)
+        with question_scope():
+            async for output in self.langgraph.astream(inputs, stream_mode="debug"):
+                self._log_output(output, console)
+        log(f"{'*' * 150}", console=console)
         return output['payload']['result']
 
+    @staticmethod
+    def _log_output(output, console=True):
+        log(f"Type: {output['type']} --- Step: {output['step']} {'-' * 150}", console=console)
+        if output['type'] == "task":
+            log(pformat(output['payload']['input'], width=200), console=console)
+        elif output['type'] == "task_result":
+            log(pformat(output['payload']['result'], width=200), console=console)
+
+    def exploration_condition(self, state):
+        return self.exploration.branches(state) or "merge_notebooks"
+
     @staticmethod
     def atomic_fact_condition(state):
         if state.get("chosen_action") == "stop_and_read_neighbor":
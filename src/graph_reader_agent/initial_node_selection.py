@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from graph_reader_agent.state import OverallState
@@ -26,8 +26,6 @@ class InitialNodeSelection:
         self.chat_model = chat_model
         self.embeddings_model = embeddings_model
         self.db_context = db_context
-
-    def __call__(self, state: OverallState) -> OverallState:
         initial_node_prompt = ChatPromptTemplate.from_messages(
             [
                 (
@@ -45,20 +43,33 @@ Nodes: {nodes}"""
             ]
         )
 
-        initial_nodes_chain = (
+        self.initial_nodes_chain = (
             initial_node_prompt | self.chat_model.with_structured_output(InitialNodes)
         )
+
+    def __call__(self, state: OverallState) -> OverallState:
         # get embeddings of the question and plan
         embeddings = self.embeddings_model.embed_query(state.get("question"))
         potential_nodes = self.db_context.get_similar_nodes(embeddings)
-        
-        inputs = {
+        initial_nodes = self.initial_nodes_chain.invoke(self._inputs(state, potential_nodes))
+        return self._response(initial_nodes)
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        embeddings = await self.embeddings_model.aembed_query(state.get("question"))
+        potential_nodes = await self.db_context.aget_similar_nodes(embeddings)
+        initial_nodes = await self.initial_nodes_chain.ainvoke(self._inputs(state, potential_nodes))
+        return self._response(initial_nodes)
+
+    @staticmethod
+    def _inputs(state: OverallState, potential_nodes) -> Dict:
+        return {
             "question": state.get("question"),
             "rational_plan": state.get("rational_plan"),
             "nodes": potential_nodes,
         }
-        
-        initial_nodes = initial_nodes_chain.invoke(inputs)
+
+    @staticmethod
+    def _response(initial_nodes: InitialNodes) -> OverallState:
         # paper uses 5 initial nodes
         check_atomic_facts_queue = [
             el.key_element
@@ -14,8 +14,6 @@ class NeighborSelect:
     def __init__(self, chat_model, db_context):
         self.chat_model = chat_model
         self.db_context = db_context
-
-    def __call__(self, state: OverallState) -> OverallState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", NEIGHBOR_SELECT_PROMPT),
             ("human", """
@@ -25,17 +23,25 @@ Previous actions: {previous_actions}
 Notebook: {notebook}
 Neighbor nodes: {nodes}"""),
         ])
-        chain = prompt | self.chat_model.with_structured_output(NeighborOutput)
+        self.chain = prompt | self.chat_model.with_structured_output(NeighborOutput)
+
+    def __call__(self, state: OverallState) -> OverallState:
+        return self._response(self.chain.invoke(self._inputs(state)))
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        return self._response(await self.chain.ainvoke(self._inputs(state)))
 
-        neighbors = state.get("neighbor_check_queue")
-        result = chain.invoke({
+    @staticmethod
+    def _inputs(state: OverallState) -> Dict:
+        return {
             "question": state.get("question"),
             "rational_plan": state.get("rational_plan"),
             "notebook": state.get("notebook"),
             "previous_actions": state.get("previous_actions"),
-            "nodes": neighbors,
-        })
+            "nodes": state.get("neighbor_check_queue"),
+        }
 
+    def _response(self, result: NeighborOutput) -> OverallState:
         log(
             f"Rational for next action after selecting neighbor: {result.rational_next_action}"
         )
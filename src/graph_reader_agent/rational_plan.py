@@ -10,14 +10,19 @@ class RationalPlanOutput(BaseModel):
 class RationalPlan:
     def __init__(self, chat_model):
         self.chat_model = chat_model
-
-    def __call__(self, state: OverallState) -> OverallState:
         prompt = ChatPromptTemplate.from_messages([
             ("system", RATIONAL_PLAN_PROMPT),
             ("human", "{question}"),
         ])
-        chain = prompt | self.chat_model.with_structured_output(RationalPlanOutput)
-        result = chain.invoke({"question": state.get("question")})
+        self.chain = prompt | self.chat_model.with_structured_output(RationalPlanOutput)
+
+    def __call__(self, state: OverallState) -> OverallState:
+        return self._response(self.chain.invoke({"question": state.get("question")}))
+
+    async def ainvoke(self, state: OverallState) -> OverallState:
+        return self._response(await self.chain.ainvoke({"question": state.get("question")}))
+
+    def _response(self, result: RationalPlanOutput) -> OverallState:
         log(f"Rational Plan: {result.rational_plan}")
         return {
             "rational_plan": result.rational_plan,
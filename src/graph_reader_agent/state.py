@@ -16,6 +16,8 @@ class OverallState(TypedDict):
     question: str
     rational_plan: str
     notebook: str
+    # Notebooks of the parallel exploration branches, merged into notebook before answer reasoning
+    notebooks: Annotated[List[str], add]
     previous_actions: Annotated[List[str], add]
     check_atomic_facts_queue: List[str]
     check_chunks_queue: List[str]
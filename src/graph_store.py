@@ -0,0 +1,219 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Literal, Set, Tuple
+from pydantic import BaseModel, Field
+from graph import Graph, Edge
+
+
+def node_row(node) -> Dict:
+    # Unset and empty properties are skipped so existing values in the store are not overwritten. A chunk's
+    # prompt_version is left to mark_chunks_extracted, which writes it once all of the chunk's facts are in.
+    properties = {
+        key: value
+        for key, value in node.model_dump(exclude={"id", "type", "prompt_version"}).items()
+        if value is not None and value != []
+    }
+    return {"id": node.id, "properties": properties}
+
+
+def edge_row(edge: Edge) -> Dict:
+    return {"source_id": edge.source, "target_id": edge.target}
+
+
+def unmatched_edge(source_id: str, target_id: str, missing_source: bool, missing_target: bool) -> Dict[str, str]:
+    # An edge is only created between existing nodes, so one with a missing end is reported as a failed row
+    missing = [name for name, is_missing in (("source", missing_source), ("target", missing_target)) if is_missing]
+    nodes = "nodes" if len(missing) > 1 else "node"
+    return {"id": f"{source_id}->{target_id}", "error": f"{' and '.join(missing)} {nodes} not found"}
+
+
+class BatchResult(BaseModel):
+    kind: Literal["nodes", "edges"]
+    label: str = Field(description="Node label or relationship type of the batch")
+    size: int
+    seconds: float
+    failed: List[Dict[str, str]] = Field(
+        default_factory=list, description="Failed rows with their id and error"
+    )
+
+
+class ImportReport(BaseModel):
+    batches: List[BatchResult] = Field(default_factory=list)
+
+    @property
+    def failed(self) -> List[Dict[str, str]]:
+        return [row for batch in self.batches for row in batch.failed]
+
+    def summary(self) -> str:
+        rows = sum(batch.size for batch in self.batches)
+        seconds = sum(batch.seconds for batch in self.batches)
+        return (
+            f"Import complete: {rows - len(self.failed)}/{rows} rows in {len(self.batches)} batches "
+            f"({seconds:.2f}s total batch time), {len(self.failed)} failed rows."
+        )
+
+
+class GraphStore(ABC):
+    """Where the knowledge graph is stored, for the builder, expansion, entity resolution and the reader.
+
+    GraphDatabaseManager keeps the graph in Neo4j and SQLiteGraphStore in an
+    embedded SQLite file. The async reader methods default to their synchronous
+    lookups, which suits a store that answers in-process.
+    """
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def reset(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def ensure_schema(self):
+        raise NotImplementedError
+
+    async def import_graph(self, graph: Graph, batch_size=1000, concurrency=1) -> ImportReport:
+        # A key element merged away by entity resolution is imported as the key element it was merged into,
+        # so later builds don't bring the duplicate back
+        aliases = await self.get_key_element_aliases([node.id for node in graph.nodes_of_type("key_element")])
+        node_groups = defaultdict(list)
+        for node in graph.nodes:
+            if node.type != "key_element" or node.id not in aliases:
+                node_groups[node.type].append(node_row(node))
+        edge_groups = defaultdict(list)
+        for edge in graph.edges:
+            row = edge_row(edge)
+            if edge.relationship == "HAS_KEY_ELEMENT":
+                row["target_id"] = aliases.get(edge.target, edge.target)
+            edge_groups[edge.relationship].append(row)
+        return await self.import_rows(node_groups, edge_groups, batch_size, concurrency)
+
+    async def import_rows(
+        self,
+        node_groups: Dict[str, List[Dict]],
+        edge_groups: Dict[str, List[Dict]],
+        batch_size=1000,
+        concurrency=1,
+    ) -> ImportReport:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_embedded_key_element_ids(self, ids: List[str]) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_extracted_chunk_ids(self, ids: List[str], prompt_version: str) -> Set[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_element_aliases(self, ids: List[str]) -> Dict[str, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def mark_chunks_extracted(self, ids: List[str], prompt_version: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def reconcile_document(self, graph: Graph):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_orphan_key_elements(self):
+        # Not part of reconcile_document: while documents build concurrently, another document's key elements
+        # can be written before the facts that link them, and a sweep then would delete them
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_element_embeddings(self) -> Tuple[List[str], List]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_element_degrees(self, limit: int) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_element_cooccurrence(self) -> Tuple[List[Dict], List[Dict]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_element_pairs(self) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_key_elements(self) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def merge_key_elements(self, merges: List[Dict], batch_size=500):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def mark_key_elements_expanded(self, ids: List[str], status: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def s_get_node_by_id(self, node_id: str):
+        raise NotImplementedError
+
+    async def get_node_by_id(self, node_id: str):
+        return self.s_get_node_by_id(node_id)
+
+    @abstractmethod
+    def get_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    async def aget_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        return self.get_atomic_facts(key_elements)
+
+    @abstractmethod
+    def get_neighbors_by_key_element(self, key_elements) -> List[str]:
+        raise NotImplementedError
+
+    async def aget_neighbors_by_key_element(self, key_elements) -> List[str]:
+        return self.get_neighbors_by_key_element(key_elements)
+
+    @abstractmethod
+    def get_subsequent_chunk_id(self, chunk_id: str) -> str:
+        raise NotImplementedError
+
+    async def aget_subsequent_chunk_id(self, chunk_id: str) -> str:
+        return self.get_subsequent_chunk_id(chunk_id)
+
+    @abstractmethod
+    def get_previous_chunk_id(self, chunk_id: str) -> str:
+        raise NotImplementedError
+
+    async def aget_previous_chunk_id(self, chunk_id: str) -> str:
+        return self.get_previous_chunk_id(chunk_id)
+
+    @abstractmethod
+    def get_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        raise NotImplementedError
+
+    async def aget_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        return self.get_key_element_context(key_elements)
+
+    @abstractmethod
+    def get_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        raise NotImplementedError
+
+    async def aget_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        return self.get_chunk_with_adjacent(chunk_id)
+
+    @abstractmethod
+    async def get_adjacent_chunks(self, chunk_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_chunk(self, chunk_id: str) -> Dict[str, str]:
+        raise NotImplementedError
+
+    async def aget_chunk(self, chunk_id: str) -> Dict[str, str]:
+        return self.get_chunk(chunk_id)
+
+    @abstractmethod
+    def get_similar_nodes(self, target_embeddings: list, k: int = 50) -> List[Dict]:
+        raise NotImplementedError
+
+    async def aget_similar_nodes(self, target_embeddings: list, k: int = 50) -> List[Dict]:
+        return self.get_similar_nodes(target_embeddings, k)
@@ -5,6 +5,22 @@ from log_manager import log_error
 import hashlib
 
 
+def chunked(iterable, batch_size):
+    for i in range(0, len(iterable), batch_size):
+        yield iterable[i : i + batch_size]
+
+
+async def achunked(aiterable, batch_size):
+    batch = []
+    async for item in aiterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def md5(content: str) -> str:
     return hashlib.md5(content.encode("utf-8")).hexdigest()
 
@@ -13,19 +29,21 @@ def normalize(content: str) -> str:
     return " ".join(content.lower().strip().split())
 
 
-def create_document_node(content: str, source: str) -> DocumentNode:
+def create_document_node(content: str, source: str, topic: str = None) -> DocumentNode:
     return DocumentNode(
         id=md5(content),
         content=content,
         source=source,
+        topic=topic,
     )
 
 
-def create_chunk_node(content: str, index: int) -> ChunkNode:
+def create_chunk_node(content: str, index: int, prompt_version: str = None) -> ChunkNode:
     return ChunkNode(
         id=md5(content),
         content=content,
         index=index,
+        prompt_version=prompt_version,
     )
 
 
@@ -38,72 +56,115 @@ def create_chunk_edges(
     return edges
 
 
-def parse_facts_xml(raw_string: str, chunk: ChunkNode):
-    # Focus on only the XML segment
-    start_tag = "<Facts>"
-    end_tag = "</Facts>"
-    start_index = raw_string.find(start_tag)
-    end_index = raw_string.find(end_tag)
-    if start_index == -1:
-        log_error("Error: leading <Facts> or </Facts> tag not found.")
-        return ""
-    if end_index == -1:
-        log_error("Error: ending </Facts> tag not found. Attempting recovery.")
-        raw_string += "</Facts>"
-        end_index = len(raw_string)
-    else:
-        end_index += len(end_tag)
-    xml_string = raw_string[start_index:end_index]
-
+def fact_element_to_graph(atomic_fact_elem, chunk: ChunkNode):
     nodes = []
     edges = []
+    fact_content = atomic_fact_elem.get("fact")
+    if not fact_content:
+        return nodes, edges
 
-    try:
-        # Parse the facts XML
-        parser = etree.XMLParser(recover=True)
-        root = etree.fromstring(xml_string, parser=parser)
-        for atomic_fact_elem in root.findall("AtomicFact"):
-            fact_content = atomic_fact_elem.get("fact")
-            if not fact_content:
-                continue
-
-            # Add atomic fact node
-            atomic_fact_node = AtomicFactNode(
-                id=md5(fact_content), content=fact_content
-            )
-            nodes.append(atomic_fact_node)
-            edges.append(
-                Edge(
-                    relationship="HAS_ATOMIC_FACT",
-                    source=chunk.id,
-                    target=atomic_fact_node.id,
-                )
+    # Values come straight from the parser, so nodes are constructed without re-validation
+    atomic_fact_node = AtomicFactNode.model_construct(
+        id=md5(fact_content), content=fact_content
+    )
+    nodes.append(atomic_fact_node)
+    edges.append(
+        Edge.model_construct(
+            relationship="HAS_ATOMIC_FACT",
+            source=chunk.id,
+            target=atomic_fact_node.id,
+        )
+    )
+
+    for key_element_elem in atomic_fact_elem.iterchildren("KeyElement"):
+        element_content = key_element_elem.get("element")
+        if not element_content:
+            continue
+
+        # Add key element node
+        key_element_node = KeyElementNode.model_construct(
+            id=normalize(element_content),
+            content=element_content,
+            embeddings=[],
+        )
+        nodes.append(key_element_node)
+
+        # Add an edge from atomic fact to key element
+        edges.append(
+            Edge.model_construct(
+                relationship="HAS_KEY_ELEMENT",
+                source=atomic_fact_node.id,
+                target=key_element_node.id,
             )
+        )
+    return nodes, edges
+
+
+class FactStreamParser:
+    """Incrementally parses the <Facts> XML of an extraction response.
 
-            for key_element_elem in atomic_fact_elem.findall("KeyElement"):
-                element_content = key_element_elem.get("element")
-                if not element_content:
-                    continue
-
-                # Add key element node
-                key_element_node = KeyElementNode(
-                    id=normalize(element_content),
-                    content=element_content,
-                    embeddings=[],
-                )
-                nodes.append(key_element_node)
-
-                # Add an edge from atomic fact to key element
-                edges.append(
-                    Edge(
-                        relationship="HAS_KEY_ELEMENT",
-                        source=atomic_fact_node.id,
-                        target=key_element_node.id,
-                    )
-                )
+    Text can be fed as it streams from the model; each call returns the nodes and
+    edges of every <AtomicFact> closed so far. Text before <Facts> and after
+    </Facts> is ignored, and unclosed tags are recovered on close().
+    """
 
+    start_tag = "<Facts>"
+
+    def __init__(self, chunk: ChunkNode):
+        self.chunk = chunk
+        self.prefix = ""
+        self.parser = None
+        self.finished = False
+
+    def feed(self, text: str):
+        if self.finished or not text:
+            return [], []
+        if self.parser is None:
+            self.prefix += text
+            start_index = self.prefix.find(self.start_tag)
+            if start_index == -1:
+                return [], []
+            text = self.prefix[start_index:]
+            self.prefix = ""
+            self.parser = etree.XMLPullParser(events=("end",), recover=True)
+        self.parser.feed(text)
+        return self._read_events()
+
+    def close(self):
+        if self.parser is None:
+            log_error("Error: leading <Facts> or </Facts> tag not found.")
+            raise ValueError("Leading <Facts> tag not found.")
+        if self.finished:
+            return [], []
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError as e:
+            log_error(f"XML Syntax Error: {e}. Skipping malformed chunk.")
+            raise ValueError(f"Invalid XML: {e}")
+        return self._read_events()
+
+    def _read_events(self):
+        nodes = []
+        edges = []
+        for _, element in self.parser.read_events():
+            if element.tag == "AtomicFact":
+                fact_nodes, fact_edges = fact_element_to_graph(element, self.chunk)
+                nodes.extend(fact_nodes)
+                edges.extend(fact_edges)
+                # Parsed facts are no longer needed, keep the tree from growing with the response
+                element.clear()
+            elif element.tag == "Facts":
+                self.finished = True
         return nodes, edges
-    except etree.XMLSyntaxError as e:
-        log_error(f"XML Syntax Error: {e}. Skipping malformed chunk.")
-        raise ValueError(f"Invalid XML: {e}")
 
+
+def parse_facts_xml(raw_string: str, chunk: ChunkNode):
+    parser = FactStreamParser(chunk)
+    nodes, edges = parser.feed(raw_string)
+    if not parser.finished:
+        if parser.parser is not None:
+            log_error("Error: ending </Facts> tag not found. Attempting recovery.")
+        more_nodes, more_edges = parser.close()
+        nodes.extend(more_nodes)
+        edges.extend(more_edges)
+    return nodes, edges
@@ -1,76 +1,377 @@
-import requests
-import wikipedia
+import asyncio
+import fnmatch
+import json
+import mmap
+import os
+import random
+from typing import Dict, Iterable, Iterator, List, Optional
+import httpx
+from pydantic import BaseModel
+from task_scheduler import TRANSIENT_STATUS_CODES, retry_after
+from graph_utils import md5
+from log_manager import log
 
 WIKIPEDIA_API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = "llm-knowledge-graph/1.0 (https://github.com/jaboesch/llm-knowledge-graph)"
 
-# Using the wikipedia API directly because the library doesn't properly handle dismabiguation pages
-def fetch_page_content(query: str):
-    try:
-        # Perform a search to get the most relevant page
-        search_params = {
-            "action": "query",
-            "list": "search",
-            "srsearch": query,
-            "format": "json",
-            "srlimit": 1,
-            "srnamespace": 0,  # Search only in the main content namespace
-        }
-        search_response = requests.get(WIKIPEDIA_API_URL, params=search_params)
-        search_data = search_response.json()
-
-        # Check if search results are empty
-        if not search_data["query"]["search"]:
-            return {"error": f"No results found for query: {query}"}
-
-        # Get the pageid of the top result
-        top_result = search_data["query"]["search"][0]
-        pageid = top_result["pageid"]
-
-        # Use the pageid to fetch the content of the page
-        page_params = {
-            "action": "query",
-            "pageids": pageid,
-            "prop": "extracts",
-            "explaintext": True,
-            "format": "json",
-        }
-        page_response = requests.get(WIKIPEDIA_API_URL, params=page_params)
-        page_data = page_response.json()
-
-        # Extract page content
-        pages = page_data["query"]["pages"]
-        page = pages[str(pageid)]  # Access the page using its ID
-
-        # Return the title and full content
-        return page["extract"]
-
-    except Exception as e:
-        return {"error": f"An error occurred: {e}"}
-
-
-def fetch_top_k_summaries(query, k=5):
-    try:
-        search_results = wikipedia.search(query)
-
-        if not search_results:
-            return []
-
-        summaries = []
-        for title in search_results[:k]:
+
+class PageNotFoundError(ValueError):
+    pass
+
+
+def request_key(request: httpx.Request) -> str:
+    return md5("&".join(f"{key}={value}" for key, value in sorted(request.url.params.multi_items())))
+
+
+class SavedResponseTransport(httpx.AsyncBaseTransport):
+    """Serves API responses saved as JSON files in `path`, one per distinct query.
+
+    With `record=True` unknown queries are sent to the real API and their responses
+    saved, so a fixture directory can be captured once and replayed offline.
+    """
+
+    def __init__(self, path: str, record=False):
+        self.path = path
+        self.record = record
+        self.transport = httpx.AsyncHTTPTransport(retries=0) if record else None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        file_path = os.path.join(self.path, f"{request_key(request)}.json")
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as file:
+                content = file.read()
+            return httpx.Response(200, content=content, headers={"content-type": "application/json"})
+        if not self.record:
+            return httpx.Response(404, json={"error": {"info": f"No saved response for {request.url}"}})
+
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        if response.status_code == 200:
+            os.makedirs(self.path, exist_ok=True)
+            with open(file_path, "wb") as file:
+                file.write(content)
+        return httpx.Response(response.status_code, content=content, headers=response.headers)
+
+    async def aclose(self):
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+class PageCache:
+    # Page contents on disk keyed by page id and revision id, so an edited article is fetched again
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file_path(self, pageid: int, revid: int) -> str:
+        return os.path.join(self.path, f"{pageid}-{revid}.json")
+
+    def get(self, pageid: int, revid: int) -> Optional[Dict]:
+        file_path = self._file_path(pageid, revid)
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, encoding="utf-8") as file:
+            return json.load(file)
+
+    def put(self, page: Dict):
+        os.makedirs(self.path, exist_ok=True)
+        file_path = self._file_path(page["pageid"], page["revid"])
+        with open(f"{file_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(page, file)
+        os.replace(f"{file_path}.tmp", file_path)
+
+
+class WikipediaFetcher:
+    """Async Wikipedia API client.
+
+    Requests share one keep-alive connection pool, at most `max_concurrency` run at
+    once and transient failures are retried with exponential backoff. Point
+    `api_url` at a stub server, or pass `responses_path` to replay saved responses.
+    """
+
+    def __init__(
+        self,
+        api_url=WIKIPEDIA_API_URL,
+        cache_path="./cache/wikipedia",
+        responses_path=None,
+        record_responses=False,
+        max_connections=10,
+        max_concurrency=8,
+        timeout=30.0,
+        max_retries=3,
+        base_delay=1.0,
+        max_delay=30.0,
+        transport=None,
+    ):
+        self.api_url = api_url
+        self.page_cache = PageCache(cache_path) if cache_path else None
+        if transport is None and responses_path:
+            transport = SavedResponseTransport(responses_path, record=record_responses)
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"User-Agent": USER_AGENT},
+            transport=transport,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _get(self, params: Dict) -> Dict:
+        params = {**params, "format": "json", "formatversion": 2}
+        for attempt in range(self.max_retries + 1):
             try:
-                summary = wikipedia.summary(title, sentences=2)
-                summaries.append({"title": title, "summary": summary})
-            except wikipedia.exceptions.PageError:
-                summaries.append({"title": title, "summary": "Page not found."})
-            except Exception as e:
-                summaries.append({"title": title, "summary": f"An error occurred: {e}"})
+                async with self.semaphore:
+                    response = await self.client.get(self.api_url, params=params)
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    response.raise_for_status()
+                    data = response.json()
+                    if "error" in data:
+                        raise ValueError(f"Wikipedia API error: {data['error'].get('info', data['error'])}")
+                    return data
+                error = httpx.HTTPStatusError(
+                    f"Wikipedia API returned {response.status_code}", request=response.request, response=response
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            delay = retry_after(error) or min(self.max_delay, self.base_delay * 2**attempt) * random.uniform(0.5, 1.5)
+            log(f"Retrying Wikipedia request in {delay:.1f}s (attempt {attempt + 1}): {error}")
+            await asyncio.sleep(delay)
+
+    async def search(self, query: str, limit=1, **params) -> List[Dict]:
+        # One generator query returns the ranked results together with the requested page props
+        data = await self._get(
+            {
+                "action": "query",
+                "generator": "search",
+                "gsrsearch": query,
+                "gsrlimit": limit,
+                "gsrnamespace": 0,  # Search only in the main content namespace
+                **params,
+            }
+        )
+        return sorted(data.get("query", {}).get("pages", []), key=lambda page: page.get("index", 0))
+
+    async def fetch_page(self, query: str) -> Dict:
+        # Using the API directly because the wikipedia library doesn't properly handle disambiguation pages
+        results = await self.search(query, prop="info")
+        if not results:
+            raise PageNotFoundError(f"No results found for query: {query}")
+        pageid, revid = results[0]["pageid"], results[0]["lastrevid"]
+        if self.page_cache is not None:
+            cached = self.page_cache.get(pageid, revid)
+            if cached is not None:
+                log(f"Wikipedia page cache hit for {cached['title']} (revision {revid}).")
+                return cached
 
-        return summaries
-    except Exception as e:
-        return f"An error occurred during search: {e}"
+        data = await self._get(
+            {"action": "query", "pageids": pageid, "prop": "extracts|info", "explaintext": 1}
+        )
+        page = data["query"]["pages"][0]
+        page = {"pageid": page["pageid"], "revid": page["lastrevid"], "title": page["title"], "content": page["extract"]}
+        if self.page_cache is not None:
+            self.page_cache.put(page)
+        return page
+
+    async def fetch_page_content(self, query: str) -> str:
+        return (await self.fetch_page(query))["content"]
+
+    async def fetch_top_k_summaries(self, query: str, k=5) -> List[Dict]:
+        # The intros of all k results come back in a single request
+        results = await self.search(
+            query, limit=k, prop="extracts", exintro=1, explaintext=1, exsentences=2, exlimit=k
+        )
+        return [
+            {"title": page["title"], "summary": page.get("extract") or "Page not found."}
+            for page in results
+        ]
 
 
 class InputManager:
-    def __init__(self, topic: str):
+    def __init__(self, topic: str, fetcher: WikipediaFetcher = None):
+        self.topic = topic
+        self.fetcher = fetcher
+        self.input = None
+
+    async def load(self) -> str:
         # TODO: Implement logic to use top-k summaries and allow LLM to pick relevant articles
-        self.input = fetch_page_content(topic)
+        if self.fetcher is not None:
+            self.input = await self.fetcher.fetch_page_content(self.topic)
+            return self.input
+        async with WikipediaFetcher() as fetcher:
+            self.input = await fetcher.fetch_page_content(self.topic)
+        return self.input
+
+
+class SourceDocument(BaseModel):
+    key: str
+    topic: str
+    source: str
+    path: Optional[str] = None
+    offset: int = 0
+    length: Optional[int] = None
+
+
+def map_file(path: str) -> Optional[mmap.mmap]:
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_mapped_text(path: str) -> str:
+    mapped = map_file(path)
+    if mapped is None:
+        return ""
+    with mapped:
+        return mapped[:].decode("utf-8")
+
+
+def topic_from_path(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+
+
+class InputSource:
+    """A set of documents to build from.
+
+    `documents()` lists them lazily without reading their text, and `load()` reads
+    one document when it is built, so a corpus is never held in memory at once.
+    """
+
+    def documents(self) -> Iterator[SourceDocument]:
+        raise NotImplementedError
+
+    async def load(self, document: SourceDocument) -> str:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class WikipediaSource(InputSource):
+    def __init__(self, topics: Iterable[str], fetcher: WikipediaFetcher = None):
+        self.topics = topics
+        self.fetcher = fetcher
+
+    @classmethod
+    def from_file(cls, path: str, fetcher: WikipediaFetcher = None) -> "WikipediaSource":
+        # One topic per line; blank lines and lines starting with # are skipped
+        with open(path, encoding="utf-8") as file:
+            topics = [line.strip() for line in file]
+        return cls([topic for topic in topics if topic and not topic.startswith("#")], fetcher)
+
+    def documents(self) -> Iterator[SourceDocument]:
+        for topic in dict.fromkeys(self.topics):
+            yield SourceDocument(key=topic, topic=topic, source="wikipedia")
+
+    async def load(self, document: SourceDocument) -> str:
+        return await InputManager(document.topic, self.fetcher).load()
+
+
+class FileSource(InputSource):
+    def __init__(self, path: str, topic: str = None):
+        self.path = path
+        self.topic = topic
+
+    def documents(self) -> Iterator[SourceDocument]:
+        yield SourceDocument(
+            key=self.path, topic=self.topic or topic_from_path(self.path), source="file", path=self.path
+        )
+
+    async def load(self, document: SourceDocument) -> str:
+        return await asyncio.to_thread(read_mapped_text, document.path)
+
+
+class DirectorySource(FileSource):
+    def __init__(self, path: str, pattern="*.txt"):
+        super().__init__(path)
+        self.pattern = pattern
+
+    def documents(self) -> Iterator[SourceDocument]:
+        for name in sorted(fnmatch.filter(os.listdir(self.path), self.pattern)):
+            path = os.path.join(self.path, name)
+            yield SourceDocument(key=path, topic=topic_from_path(path), source="file", path=path)
+
+
+class JsonlSource(InputSource):
+    """A JSONL corpus with one document per line.
+
+    The file is memory-mapped and each document remembers its byte range, so a
+    document's text is only decoded when it is built.
+    """
+
+    def __init__(self, path: str, text_field="text", id_field="id", topic_field="title"):
+        self.path = path
+        self.text_field = text_field
+        self.id_field = id_field
+        self.topic_field = topic_field
+        self.mapped = None
+
+    def documents(self) -> Iterator[SourceDocument]:
+        if self.mapped is None:
+            self.mapped = map_file(self.path)
+        if self.mapped is None:
+            return
+        offset = 0
+        line_number = 0
+        while offset < len(self.mapped):
+            end = self.mapped.find(b"\n", offset)
+            if end == -1:
+                end = len(self.mapped)
+            line = self.mapped[offset:end]
+            if line.strip():
+                record = json.loads(line)
+                key = str(record.get(self.id_field, line_number))
+                yield SourceDocument(
+                    key=f"{self.path}#{key}",
+                    topic=str(record.get(self.topic_field) or key),
+                    source="jsonl",
+                    path=self.path,
+                    offset=offset,
+                    length=end - offset,
+                )
+            offset = end + 1
+            line_number += 1
+
+    def _read(self, document: SourceDocument) -> str:
+        return json.loads(self.mapped[document.offset : document.offset + document.length])[self.text_field]
+
+    async def load(self, document: SourceDocument) -> str:
+        return await asyncio.to_thread(self._read, document)
+
+    async def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+
+
+INPUT_SOURCES = ["auto", "wikipedia", "topics", "file", "directory", "jsonl"]
+
+
+def create_input_source(kind: str, input: str, fetcher: WikipediaFetcher = None) -> InputSource:
+    # `auto` picks a directory or JSONL source from the path and otherwise reads a topics file
+    if kind == "auto":
+        kind = "directory" if os.path.isdir(input) else "jsonl" if input.endswith(".jsonl") else "topics"
+    if kind == "wikipedia":
+        return WikipediaSource([input], fetcher)
+    if kind == "topics":
+        return WikipediaSource.from_file(input, fetcher)
+    if kind == "file":
+        return FileSource(input)
+    if kind == "directory":
+        return DirectorySource(input)
+    if kind == "jsonl":
+        return JsonlSource(input)
+    raise ValueError(f"Unknown input source: {kind}")
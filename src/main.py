@@ -1,62 +1,368 @@
 import argparse
 import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from config import Config
-from input_manager import InputManager
+from input_manager import WikipediaFetcher, INPUT_SOURCES, create_input_source
 from model_manager import ModelManager
 from graph_manager import GraphManager
 from graph_database_manager import GraphDatabaseManager
+from sqlite_graph_store import SQLiteGraphStore
 from graph_reader_agent.graph_reader_agent import GraphReaderAgent
-from log_manager import log
+from vector_index import VectorIndex
+from cache_manager import EmbeddingCache, ResponseCache, MemoryCache
+from graph_read_cache import CachedGraphReader
+from task_scheduler import TaskScheduler
+from prompt_manager import ExtractionPrompt, EntityResolutionPrompt, GRAPH_READER_PROMPT_VERSION
+from expansion_manager import ExpansionManager, RANKINGS
+from entity_resolution import EntityResolver
+from batch_manager import BatchCheckpoint, default_checkpoint_path
+from reader_service import ReaderService
+from log_manager import log, log_error
 
 
-async def build_graph(topic):
-    config = Config()
-    model_manager = ModelManager(config.hf_token)
-    input_manager = InputManager(topic)
-    graph_manager = GraphManager(
-        model_manager.chat, topic, chunk_size=1500
+def create_embedding_cache(config):
+    return EmbeddingCache(
+        config.embedding_cache_path,
+        max_entries=config.embedding_cache_max_entries,
+        memory_entries=config.embedding_cache_memory_entries,
+    )
+
+
+def create_response_cache(config):
+    if config.llm_cache_mode == "off":
+        return None
+    return ResponseCache(
+        config.llm_cache_path,
+        ttl=config.llm_cache_ttl,
+        max_entries=config.llm_cache_max_entries,
+        read_only=config.llm_cache_mode == "read_only",
     )
-    db_manager = GraphDatabaseManager(
-        uri=config.neo4j_uri, user=config.neo4j_user, password=config.neo4j_password, database=config.neo4j_database
+
+
+def create_fetcher(config):
+    return WikipediaFetcher(
+        api_url=config.wikipedia_api_url,
+        cache_path=config.wikipedia_cache_path,
+        responses_path=config.wikipedia_responses_path,
+        record_responses=config.wikipedia_record_responses,
+        max_connections=config.wikipedia_max_connections,
     )
-    graph = await graph_manager.build_graph(input_manager.input)
-    await graph_manager.add_entity_embeddings(graph, db_manager.get_node_by_id, model_manager.embeddings.aembed_query)
-    await db_manager.import_graph(graph)
+
+
+def create_db_manager(config, vector_index=None):
+    if config.graph_store == "sqlite":
+        return SQLiteGraphStore(config.graph_store_path, vector_index_lists=config.vector_index_lists)
+    return GraphDatabaseManager(
+        uri=config.neo4j_uri, user=config.neo4j_user, password=config.neo4j_password, database=config.neo4j_database,
+        similarity_mode=config.similarity_mode, vector_index=vector_index,
+    )
+
+
+def create_scheduler(config):
+    return TaskScheduler(
+        max_in_flight=config.llm_max_in_flight,
+        requests_per_second=config.llm_requests_per_second,
+        max_retries=config.llm_max_retries,
+    )
+
+
+def close_caches(*caches):
+    for cache in caches:
+        if cache is not None:
+            log(f"{type(cache).__name__}: {cache.stats()}")
+            cache.close()
+
+
+def uses_local_vector_index(config):
+    # Only the Neo4j store reads the on-disk index; the embedded store searches its own embeddings
+    return config.similarity_mode == "local" and config.graph_store != "sqlite"
+
+
+async def refresh_vector_index(config, db_manager):
+    if not uses_local_vector_index(config):
+        return
+    ids, embeddings = await db_manager.get_key_element_embeddings()
+    vector_index = VectorIndex.build(ids, embeddings, n_lists=config.vector_index_lists)
+    vector_index.save(config.vector_index_path)
+    log(f"Saved local vector index with {len(vector_index)} key elements to {config.vector_index_path}")
+
+
+def load_vector_index(config):
+    if not uses_local_vector_index(config):
+        return None
+    vector_index = VectorIndex.load(config.vector_index_path)
+    if vector_index is None:
+        log_error(
+            f"No local vector index at {config.vector_index_path}, similar key elements are ranked in Neo4j until a build "
+            "saves one."
+        )
+    return vector_index
+
+
+async def build_document(
+    config, graph_manager, model_manager, db_manager, content, stream=False, incremental=False, chunk_texts=None
+):
+    get_extracted_chunk_ids = db_manager.get_extracted_chunk_ids if incremental else None
+    if stream:
+        graph = await graph_manager.stream_build(
+            content,
+            db_manager.get_embedded_key_element_ids,
+            model_manager.embeddings.aembed_documents,
+            db_manager.import_graph,
+            db_manager.mark_chunks_extracted,
+            extract_workers=config.llm_max_in_flight,
+            embedding_batch_size=config.embedding_batch_size,
+            embedding_concurrency=config.embedding_concurrency,
+            get_extracted_chunk_ids=get_extracted_chunk_ids,
+            chunk_texts=chunk_texts,
+        )
+    else:
+        graph = await graph_manager.build_graph(content, get_extracted_chunk_ids, chunk_texts)
+        await graph_manager.add_entity_embeddings(
+            graph,
+            db_manager.get_embedded_key_element_ids,
+            model_manager.embeddings.aembed_documents,
+            batch_size=config.embedding_batch_size,
+            max_concurrency=config.embedding_concurrency,
+        )
+        await db_manager.import_graph(graph)
+        # Written last, so a chunk whose facts are not all imported is extracted again by the next incremental build
+        await db_manager.mark_chunks_extracted(
+            [chunk.id for chunk in graph.nodes_of_type("chunk") if chunk.prompt_version], ExtractionPrompt.version
+        )
+    await db_manager.reconcile_document(graph)
+    return graph
+
+
+async def build_documents(
+    config, input_source, db_manager, stream=False, incremental=False, checkpoint=None, max_documents=1,
+    split_on_pool=False, on_built=None,
+):
+    # All documents share one model manager, scheduler, database driver and cache set,
+    # so each document only pays for its own extraction
+    embedding_cache = create_embedding_cache(config)
+    response_cache = create_response_cache(config)
+    model_manager = ModelManager(
+        config.hf_token, embedding_cache=embedding_cache, response_cache=response_cache,
+        prompt_version=ExtractionPrompt.version,
+    )
+    scheduler = create_scheduler(config)
+    await db_manager.ensure_schema()
+    start = time.perf_counter()
+    counts = {"built": 0, "failed": 0, "skipped": 0}
+
+    def pending_documents():
+        for document in input_source.documents():
+            if checkpoint is not None and checkpoint.is_done(document.key):
+                counts["skipped"] += 1
+                continue
+            yield document
+
+    async def build_one(document, executor):
+        document_start = time.perf_counter()
+        # A document interrupted or failed in an earlier run skips the chunks it already extracted
+        resume = checkpoint is not None and checkpoint.status(document.key) is not None
+        if checkpoint is not None:
+            checkpoint.mark(document.key, "started")
+        try:
+            content = await input_source.load(document)
+            graph_manager = GraphManager(
+                model_manager.chat, document.topic, chunk_size=1500, scheduler=scheduler, source=document.source
+            )
+            # On a pool the whole document is split up front; otherwise chunks are cut lazily as extraction starts
+            chunk_texts = await graph_manager.chunker.asplit(content, executor) if executor else None
+            graph = await build_document(
+                config, graph_manager, model_manager, db_manager, content,
+                stream=stream, incremental=incremental or resume, chunk_texts=chunk_texts,
+            )
+        except Exception as e:
+            log_error(f"Build of {document.key} failed: {e}")
+            counts["failed"] += 1
+            if checkpoint is not None:
+                checkpoint.mark(document.key, "failed", error=str(e))
+            if on_built is not None:
+                await on_built(document, e)
+            return
+        seconds = time.perf_counter() - document_start
+        chunks = len(graph.nodes_of_type("chunk"))
+        counts["built"] += 1
+        if checkpoint is not None:
+            checkpoint.mark(document.key, "done", chunks=chunks, seconds=round(seconds, 1))
+        if on_built is not None:
+            await on_built(document)
+        log(f"Built {document.key} ({chunks} chunks) in {seconds:.1f}s.", console=True)
+
+    async def worker(documents, executor):
+        # Workers pull from one lazy document iterator, so a large corpus is never listed in memory
+        for document in documents:
+            await build_one(document, executor)
+
+    try:
+        with ProcessPoolExecutor() if split_on_pool else nullcontext() as executor:
+            documents = pending_documents()
+            await asyncio.gather(*(worker(documents, executor) for _ in range(max_documents)))
+        if counts["built"]:
+            # Key elements left without facts by reconciled documents, swept once no import is in flight
+            await db_manager.delete_orphan_key_elements()
+            await refresh_vector_index(config, db_manager)
+    finally:
+        await input_source.close()
+        close_caches(embedding_cache, response_cache)
+    elapsed = time.perf_counter() - start
+    log(
+        f"Build complete in {elapsed:.1f}s ({counts['built'] / elapsed * 60:.1f} documents/min): {counts}. "
+        f"Chunk extraction: {scheduler.summary()}",
+        console=True,
+    )
+
+
+async def build_graph(input, source="wikipedia", stream=False, incremental=False):
+    config = Config()
+    db_manager = create_db_manager(config)
+    async with create_fetcher(config) as fetcher:
+        await build_documents(
+            config, create_input_source(source, input, fetcher), db_manager, stream=stream, incremental=incremental
+        )
+    await db_manager.close()
+
+
+async def build_batch(input, source="auto", stream=False, incremental=False, checkpoint_path=None, max_documents=4):
+    config = Config()
+    checkpoint = BatchCheckpoint(checkpoint_path or default_checkpoint_path(input))
+    log(f"Batch build: resuming from {checkpoint.path} {checkpoint.counts()}.", console=True)
+    db_manager = create_db_manager(config)
+    async with create_fetcher(config) as fetcher:
+        await build_documents(
+            config, create_input_source(source, input, fetcher), db_manager, stream=stream, incremental=incremental,
+            checkpoint=checkpoint, max_documents=max_documents, split_on_pool=True,
+        )
     await db_manager.close()
 
     
-async def read_graph(question):
+def create_graph_reader(config, parallel=False):
+    # The agent is compiled once and its driver pool, model clients and caches are shared by every question
+    embedding_cache = create_embedding_cache(config)
+    response_cache = create_response_cache(config)
+    model_manager = ModelManager(
+        config.hf_token, chat_model="gpt-4o", embedding_cache=embedding_cache, response_cache=response_cache,
+        prompt_version=GRAPH_READER_PROMPT_VERSION,
+    )
+    db_manager = create_db_manager(config, vector_index=load_vector_index(config))
+    chunk_cache = MemoryCache(config.read_cache_max_entries, ttl=config.read_cache_ttl)
+    graph_reader_agent = GraphReaderAgent(
+        CachedGraphReader(db_manager, chunk_cache), model_manager, parallel=parallel or config.reader_parallel
+    )
+
+    async def close():
+        close_caches(embedding_cache, response_cache, chunk_cache)
+        await db_manager.close()
+
+    return graph_reader_agent, close
+
+
+async def read_graph(questions, parallel=False):
+    config = Config()
+    graph_reader_agent, close = create_graph_reader(config, parallel)
+    try:
+        answers = await asyncio.gather(*(graph_reader_agent.ainvoke(question) for question in questions))
+        for answer in answers:
+            log(answer, console=True)
+    finally:
+        await close()
+
+
+async def serve_reader(batch=None, output=None, concurrency=None, timeout=None, parallel=False):
     config = Config()
-    model_manager = ModelManager(config.hf_token, chat_model="gpt-4o")
-    db_manager = GraphDatabaseManager(
-        uri=config.neo4j_uri, user=config.neo4j_user, password=config.neo4j_password, database=config.neo4j_database
+    graph_reader_agent, close = create_graph_reader(config, parallel)
+    reader_service = ReaderService(
+        graph_reader_agent,
+        concurrency=concurrency or config.reader_concurrency,
+        timeout=config.reader_timeout if timeout is None else timeout,
     )
-    graph_reader_agent = GraphReaderAgent(db_manager, model_manager)
-    log(graph_reader_agent.invoke(question), console=True)
-    
+    try:
+        if batch is not None:
+            await reader_service.run_batch(batch, output or f"{os.path.splitext(batch)[0]}.answers.jsonl")
+        else:
+            await reader_service.serve()
+    finally:
+        await close()
 
-async def expand_graph(breadth):
-    # TODO: Implement graph expansion logic to query the `breadth` most important graph nodes (possibly via neighbor/edge count), 
-    # research those nodes (via wikipedia for now), and add the knowledge using `build_graph()`.
-    raise NotImplementedError("Graph expansion is not yet implemented.")
+
+async def expand_graph(breadth, ranking="degree", stream=False, max_documents=4):
+    # Research the `breadth` most important key elements on Wikipedia and merge what is learned into the graph.
+    # Builds are incremental, so a page whose chunks are already in the graph costs no extraction.
+    config = Config()
+    db_manager = create_db_manager(config)
+    async with create_fetcher(config) as fetcher:
+        expansion_manager = ExpansionManager(db_manager, fetcher)
+        input_source = await expansion_manager.plan(breadth, ranking)
+        await build_documents(
+            config, input_source, db_manager, stream=stream, incremental=True,
+            max_documents=max_documents, on_built=expansion_manager.record,
+        )
+    await db_manager.close()
+
+
+async def resolve_entities(threshold=0.9, block_size=1000, confirm=False, dry_run=False):
+    # Merge key elements that name the same entity, e.g. "J.K. Rowling" and "Joanne Rowling"
+    config = Config()
+    db_manager = create_db_manager(config)
+    chat, caches = None, ()
+    if confirm:
+        caches = (create_response_cache(config),)
+        model_manager = ModelManager(
+            config.hf_token, response_cache=caches[0], prompt_version=EntityResolutionPrompt.version
+        )
+        chat = model_manager.chat
+    resolver = EntityResolver(threshold, block_size, chat=chat, scheduler=create_scheduler(config))
+    try:
+        clusters = await resolver.resolve(db_manager, dry_run=dry_run)
+        if clusters and not dry_run:
+            await refresh_vector_index(config, db_manager)
+    finally:
+        close_caches(*caches)
+        await db_manager.close()
 
 
 async def reset_graph():
     config = Config()
-    db_manager = GraphDatabaseManager(
-        uri=config.neo4j_uri, user=config.neo4j_user, password=config.neo4j_password, database=config.neo4j_database
-    )
+    db_manager = create_db_manager(config)
     await db_manager.reset()
     await db_manager.close()
 
 
 def main(args):
     if args.command == "read":
-        asyncio.run(read_graph(args.input))
+        asyncio.run(read_graph(args.input, parallel=args.parallel))
     elif args.command == "build":
-        asyncio.run(build_graph(args.input))
+        asyncio.run(build_graph(args.input, args.source, stream=args.stream, incremental=args.incremental))
+    elif args.command == "build-batch":
+        asyncio.run(
+            build_batch(
+                args.input, args.source, stream=args.stream, incremental=args.incremental,
+                checkpoint_path=args.checkpoint, max_documents=args.documents,
+            )
+        )
+    elif args.command == "serve":
+        asyncio.run(
+            serve_reader(
+                args.batch, output=args.output, concurrency=args.concurrency, timeout=args.timeout,
+                parallel=args.parallel,
+            )
+        )
     elif args.command == "expand":
-        asyncio.run(expand_graph(args.breadth))
+        asyncio.run(
+            expand_graph(args.breadth, ranking=args.ranking, stream=args.stream, max_documents=args.documents)
+        )
+    elif args.command == "resolve":
+        asyncio.run(
+            resolve_entities(
+                args.threshold, block_size=args.block_size, confirm=args.confirm, dry_run=args.dry_run
+            )
+        )
     elif args.command == "reset":
         asyncio.run(reset_graph())
     else:
@@ -69,18 +375,100 @@ if __name__ == "__main__":
 
     # Subcommand: build
     build_parser = subparsers.add_parser("build", help="Build a new knowledge graph.")
-    build_parser.add_argument("input", type=str, help="The topic to build the graph around.")
+    build_parser.add_argument("input", type=str, help="The topic to build the graph around, or a path for local sources.")
+    build_parser.add_argument(
+        "--source", choices=INPUT_SOURCES, default="wikipedia", help="Where the input comes from."
+    )
+    build_parser.add_argument(
+        "--stream", action="store_true", help="Embed and import each chunk's facts as soon as they are extracted."
+    )
+    build_parser.add_argument(
+        "--incremental", action="store_true", help="Only extract chunks that are not in the graph yet."
+    )
+
+    # Subcommand: build-batch
+    build_batch_parser = subparsers.add_parser(
+        "build-batch", help="Build the knowledge graph from many documents in one run."
+    )
+    build_batch_parser.add_argument(
+        "input", type=str, help="A topics file, a directory of .txt documents or a JSONL corpus."
+    )
+    build_batch_parser.add_argument(
+        "--source", choices=INPUT_SOURCES, default="auto",
+        help="Where the input comes from; auto picks directory, jsonl or topics from the path.",
+    )
+    build_batch_parser.add_argument(
+        "--stream", action="store_true", help="Embed and import each chunk's facts as soon as they are extracted."
+    )
+    build_batch_parser.add_argument(
+        "--incremental", action="store_true", help="Only extract chunks that are not in the graph yet."
+    )
+    build_batch_parser.add_argument(
+        "--checkpoint", type=str, default=None, help="Progress file used to resume an interrupted batch."
+    )
+    build_batch_parser.add_argument(
+        "--documents", type=int, default=4, help="Number of documents built at the same time."
+    )
     
     # Subcommand: read
     read_parser = subparsers.add_parser("read", help="Read from the knowledge graph.")
-    read_parser.add_argument("input", type=str, help="The question to query the graph.")
+    read_parser.add_argument("input", type=str, nargs="+", help="One or more questions to query the graph.")
+    read_parser.add_argument(
+        "--parallel", action="store_true", help="Explore every initial node in its own concurrent branch."
+    )
     
+    # Subcommand: serve
+    serve_parser = subparsers.add_parser(
+        "serve", help="Answer questions read as JSON lines from stdin, or from a JSONL file with --batch."
+    )
+    serve_parser.add_argument(
+        "--batch", type=str, default=None, help="JSONL file of questions to answer instead of reading stdin."
+    )
+    serve_parser.add_argument(
+        "--output", type=str, default=None, help="Where batch answers are written; defaults to <batch>.answers.jsonl."
+    )
+    serve_parser.add_argument(
+        "--concurrency", type=int, default=None, help="Number of questions answered at the same time."
+    )
+    serve_parser.add_argument(
+        "--timeout", type=float, default=None, help="Seconds before a question is cancelled; 0 disables the timeout."
+    )
+    serve_parser.add_argument(
+        "--parallel", action="store_true", help="Explore every initial node in its own concurrent branch."
+    )
+
     # Subcommand: reset
     reset_parser = subparsers.add_parser("reset", help="Reset the knowledge graph.")
 
     # Subcommand: expand
     expand_parser = subparsers.add_parser("expand", help="Expand the existing knowledge graph.")
     expand_parser.add_argument("breadth", type=int, help="Number of nodes to expand.")
+    expand_parser.add_argument(
+        "--ranking", choices=RANKINGS, default="degree",
+        help="Rank key elements by fact count or by PageRank over shared facts.",
+    )
+    expand_parser.add_argument(
+        "--stream", action="store_true", help="Embed and import each chunk's facts as soon as they are extracted."
+    )
+    expand_parser.add_argument(
+        "--documents", type=int, default=4, help="Number of topics researched and built at the same time."
+    )
+
+    # Subcommand: resolve
+    resolve_parser = subparsers.add_parser("resolve", help="Merge key elements that name the same entity.")
+    resolve_parser.add_argument(
+        "--threshold", type=float, default=0.9, help="Minimum cosine similarity of key elements to merge."
+    )
+    resolve_parser.add_argument(
+        "--block-size", type=int, default=1000,
+        help="Approximate number of key elements compared with each other; 0 compares all pairs.",
+    )
+    resolve_parser.add_argument(
+        "--confirm", action="store_true", help="Ask the LLM to confirm each group of merges."
+    )
+    resolve_parser.add_argument(
+        "--dry-run", action="store_true", help="Log the proposed merges without changing the graph."
+    )
 
     args = parser.parse_args()
     main(args)
@@ -1,11 +1,13 @@
 from langchain_openai import ChatOpenAI
 from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
 from langchain_community.embeddings import HuggingFaceInferenceAPIEmbeddings
+from cache_manager import CachedEmbeddings, CachedChatModel
 
 
 class ModelManager:
     def __init__(
-        self, hf_token, chat_model="meta-llama/Llama-3.3-70B-Instruct", max_new_tokens=4096, embedding_model="sentence-transformers/all-MiniLM-L6-v2"
+        self, hf_token, chat_model="meta-llama/Llama-3.3-70B-Instruct", max_new_tokens=4096, embedding_model="sentence-transformers/all-MiniLM-L6-v2",
+        embedding_cache=None, response_cache=None, prompt_version=None,
     ):
         if chat_model == "gpt-4o":
             self.chat = ChatOpenAI(model="gpt-4o", temperature=0.1)
@@ -22,8 +24,12 @@ class ModelManager:
                 huggingfacehub_api_token=hf_token,
             )
             self.chat = ChatHuggingFace(llm=llm)
+        if response_cache is not None:
+            self.chat = CachedChatModel(self.chat, response_cache, chat_model, prompt_version)
         
         self.embeddings = HuggingFaceInferenceAPIEmbeddings(
             api_key=hf_token, model_name=embedding_model
         )
+        if embedding_cache is not None:
+            self.embeddings = CachedEmbeddings(self.embeddings, embedding_cache, embedding_model)
         
\ No newline at end of file
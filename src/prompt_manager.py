@@ -312,10 +312,28 @@ Please strictly follow the above format. Let’s begin
 """
 
 
+ENTITY_RESOLUTION_PROMPT = """You are an intelligent assistant that merges duplicate entries of a knowledge graph. The graph was extracted from long texts, so the same entity is sometimes named in several ways (e.g. "J. K. Rowling", "JK Rowling" and "Rowling").
+
+You will be given a canonical key element and a numbered list of candidate key elements. Decide which candidates refer to exactly the same real-world entity as the canonical key element.
+
+### **Requirements:**
+
+1. Only select candidates that are the same entity, not ones that are merely related (e.g. "Harry Potter" the character and "Harry Potter and the Goblet of Fire" the book are different entities).
+2. If you are not confident that a candidate is the same entity, do not select it.
+3. Answer only in the described XML format, with the numbers of the selected candidates separated by commas. Leave the tag empty if no candidate is the same entity.
+
+### **Response Format:**
+
+<Duplicates>1, 3</Duplicates>
+"""
+
+
 class Prompt:
     def __init__(self, version, prompt):
         self.version = version
         self.prompt = prompt
 
 ExtractionPrompt = Prompt("1.1", EXTRACTION_PROMPT)
-# TODO: add versioning for all GraphReader agent prompts
\ No newline at end of file
+EntityResolutionPrompt = Prompt("1.0", ENTITY_RESOLUTION_PROMPT)
+# Shared version for the GraphReader agent prompts, bump it to invalidate cached reader responses
+GRAPH_READER_PROMPT_VERSION = "1.0"
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import AsyncIterator, Dict, List, Optional
+import numpy as np
+from pydantic import BaseModel
+from log_manager import log, log_error
+
+
+class ReaderQuestion(BaseModel):
+    id: str
+    question: str
+
+
+class ReaderResult(BaseModel):
+    id: str
+    question: str
+    status: str
+    answer: Optional[str] = None
+    analysis: Optional[str] = None
+    error: Optional[str] = None
+    seconds: float
+
+
+def parse_question(line: str, line_number: int) -> Optional[ReaderQuestion]:
+    # A line is either {"id": ..., "question": ...} or the plain question text
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        record = line
+    if isinstance(record, dict):
+        if "question" not in record:
+            log_error(f"Skipping line {line_number}: no question field")
+            return None
+        return ReaderQuestion(id=str(record.get("id", line_number)), question=record["question"])
+    return ReaderQuestion(id=str(line_number), question=str(record))
+
+
+def latency_summary(results: List[ReaderResult], elapsed: float) -> Dict:
+    seconds = np.array([r.seconds for r in results])
+    counts = {status: sum(r.status == status for r in results) for status in ("answered", "timeout", "failed")}
+    return {
+        "questions": len(results),
+        **counts,
+        "questions_per_minute": round(len(results) / elapsed * 60, 1) if elapsed else 0.0,
+        "p50_seconds": round(float(np.percentile(seconds, 50)), 2) if len(seconds) else 0.0,
+        "p95_seconds": round(float(np.percentile(seconds, 95)), 2) if len(seconds) else 0.0,
+        "max_seconds": round(float(seconds.max()), 2) if len(seconds) else 0.0,
+    }
+
+
+class ReaderService:
+    """Answers a stream of questions with one compiled GraphReaderAgent.
+
+    All questions share the agent's database driver pool, model clients and caches.
+    Up to `concurrency` questions are in flight at a time, and a question that takes
+    longer than `timeout` seconds is cancelled and reported with status "timeout".
+    """
+
+    def __init__(self, agent, concurrency=4, timeout: Optional[float] = 300.0):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.timeout = timeout or None
+
+    async def answer(self, question: ReaderQuestion) -> ReaderResult:
+        start = time.perf_counter()
+        try:
+            output = dict(await asyncio.wait_for(self.agent.ainvoke(question.question, console=False), self.timeout))
+        except asyncio.TimeoutError:
+            log_error(f"Question {question.id} timed out after {self.timeout}s")
+            return ReaderResult(
+                **question.model_dump(), status="timeout", error=f"Timed out after {self.timeout}s",
+                seconds=time.perf_counter() - start,
+            )
+        except Exception as e:
+            log_error(f"Question {question.id} failed: {e}")
+            return ReaderResult(
+                **question.model_dump(), status="failed", error=str(e), seconds=time.perf_counter() - start
+            )
+        return ReaderResult(
+            **question.model_dump(), status="answered", answer=output.get("answer"), analysis=output.get("analysis"),
+            seconds=time.perf_counter() - start,
+        )
+
+    async def answer_all(self, questions: AsyncIterator[ReaderQuestion]) -> AsyncIterator[ReaderResult]:
+        # Results are yielded in completion order; the queues keep at most `concurrency` questions buffered
+        pending_questions = asyncio.Queue(maxsize=self.concurrency)
+        results = asyncio.Queue()
+
+        async def feed():
+            try:
+                async for question in questions:
+                    await pending_questions.put(question)
+            finally:
+                for _ in range(self.concurrency):
+                    await pending_questions.put(None)
+
+        async def worker():
+            while (question := await pending_questions.get()) is not None:
+                await results.put(await self.answer(question))
+            await results.put(None)
+
+        tasks = [asyncio.create_task(feed())] + [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            running = self.concurrency
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_batch(self, input_path: str, output_path: str) -> Dict:
+        async def questions():
+            with open(input_path, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, start=1):
+                    question = parse_question(line, line_number)
+                    if question is not None:
+                        yield question
+
+        start = time.perf_counter()
+        results = []
+        with open(output_path, "w", encoding="utf-8") as f:
+            async for result in self.answer_all(questions()):
+                # Every answer is flushed as it completes, so an interrupted batch keeps its finished answers
+                f.write(result.model_dump_json() + "\n")
+                f.flush()
+                results.append(result)
+                log(f"{result.id}: {result.status} in {result.seconds:.1f}s", console=True)
+        summary = latency_summary(results, time.perf_counter() - start)
+        log(f"Batch complete, answers written to {output_path}: {summary}", console=True)
+        return summary
+
+    async def serve(self, input=sys.stdin, output=sys.stdout):
+        # Answers are the only thing written to `output`; logs and errors that would be printed go to stderr
+        async def questions():
+            line_number = 0
+            while line := await asyncio.to_thread(input.readline):
+                line_number += 1
+                question = parse_question(line, line_number)
+                if question is not None:
+                    yield question
+
+        with redirect_stdout(sys.stderr):
+            log(f"Reader service ready ({self.concurrency} concurrent questions, timeout {self.timeout}s).", console=True)
+            async for result in self.answer_all(questions()):
+                output.write(result.model_dump_json() + "\n")
+                output.flush()
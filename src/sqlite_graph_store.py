@@ -0,0 +1,532 @@
+import json
+import sqlite3
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from cache_manager import connect
+from graph import Graph, RELATIONSHIP_LABELS
+from graph_store import GraphStore, BatchResult, ImportReport, unmatched_edge
+from graph_utils import chunked
+from log_manager import log, log_error
+from vector_index import VectorIndex
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS nodes (
+        label TEXT NOT NULL,
+        id TEXT NOT NULL,
+        properties TEXT NOT NULL,
+        embeddings BLOB,
+        PRIMARY KEY (label, id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS edges (
+        relationship TEXT NOT NULL,
+        source TEXT NOT NULL,
+        target TEXT NOT NULL,
+        PRIMARY KEY (relationship, source, target)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS nodes_id ON nodes (id)",
+    "CREATE INDEX IF NOT EXISTS edges_target ON edges (relationship, target, source)",
+    """
+    CREATE INDEX IF NOT EXISTS documents_topic ON nodes (json_extract(properties, '$.topic'))
+    WHERE label = 'document'
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS key_element_aliases ON nodes (label)
+    WHERE json_extract(properties, '$.alias_ids') IS NOT NULL
+    """,
+]
+
+# Lists are passed as one JSON array parameter and expanded with json_each
+IN_LIST = "(SELECT value FROM json_each(?))"
+
+UPSERT_NODE_QUERY = """
+INSERT INTO nodes (label, id, properties, embeddings) VALUES (?, ?, ?, ?)
+ON CONFLICT (label, id) DO UPDATE SET
+    properties = json_patch(nodes.properties, excluded.properties),
+    embeddings = coalesce(excluded.embeddings, nodes.embeddings)
+"""
+
+# Like the labeled MATCHes of the Neo4j import, an edge is only created between existing nodes
+INSERT_EDGE_QUERY = """
+INSERT OR IGNORE INTO edges (relationship, source, target)
+SELECT ?, ?, ?
+WHERE EXISTS (SELECT 1 FROM nodes WHERE label = ? AND id = ?)
+  AND EXISTS (SELECT 1 FROM nodes WHERE label = ? AND id = ?)
+"""
+
+UNMATCHED_EDGES_QUERY = """
+SELECT source_id, target_id, missing_source, missing_target FROM (
+    SELECT json_extract(value, '$[0]') AS source_id, json_extract(value, '$[1]') AS target_id,
+           NOT EXISTS (SELECT 1 FROM nodes WHERE label = ?1 AND id = json_extract(value, '$[0]')) AS missing_source,
+           NOT EXISTS (SELECT 1 FROM nodes WHERE label = ?2 AND id = json_extract(value, '$[1]')) AS missing_target
+    FROM json_each(?3)
+)
+WHERE missing_source OR missing_target
+"""
+
+# SQLite can't estimate a json_each list, so CROSS JOINs pin the join order to walk the indexes outward from it
+FACTS_OF_KEY_ELEMENTS = """
+(SELECT DISTINCT value AS id FROM json_each(?)) AS key_element
+CROSS JOIN edges k ON k.relationship = 'HAS_KEY_ELEMENT' AND k.target = key_element.id
+"""
+
+ATOMIC_FACTS_QUERY = f"""
+SELECT DISTINCT chunk.source AS chunk_id, json_extract(fact.properties, '$.content') AS text
+FROM {FACTS_OF_KEY_ELEMENTS}
+CROSS JOIN nodes fact ON fact.label = 'atomic_fact' AND fact.id = k.source
+CROSS JOIN edges chunk ON chunk.relationship = 'HAS_ATOMIC_FACT' AND chunk.target = k.source
+"""
+
+NEIGHBORS_QUERY = f"""
+SELECT neighbor.target AS id, COUNT(*) AS count
+FROM {FACTS_OF_KEY_ELEMENTS}
+CROSS JOIN edges neighbor ON neighbor.relationship = 'HAS_KEY_ELEMENT' AND neighbor.source = k.source
+WHERE neighbor.target NOT IN {IN_LIST}
+GROUP BY neighbor.target
+ORDER BY count DESC
+LIMIT 50
+"""
+
+CHUNK_WITH_ADJACENT_QUERY = """
+SELECT c.id, c.properties,
+       (SELECT source FROM edges WHERE relationship = 'NEXT' AND target = c.id) AS previous_id,
+       (SELECT target FROM edges WHERE relationship = 'NEXT' AND source = c.id) AS next_id
+FROM nodes c
+WHERE c.label = 'chunk' AND c.id = ?
+"""
+
+# Key elements not yet expanded and not already a document topic
+EXPANDABLE = """
+json_extract(k.properties, '$.expansion_status') IS NULL
+AND lower(json_extract(k.properties, '$.content')) NOT IN (
+    SELECT lower(json_extract(properties, '$.topic')) FROM nodes
+    WHERE label = 'document' AND json_extract(properties, '$.topic') IS NOT NULL
+)
+"""
+
+DEGREE = "(SELECT COUNT(*) FROM edges WHERE relationship = 'HAS_KEY_ELEMENT' AND target = k.id)"
+
+
+def vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def node_parameters(label: str, row: Dict) -> tuple:
+    properties = dict(row["properties"])
+    embeddings = properties.pop("embeddings", None)
+    blob = np.asarray(embeddings, dtype=np.float32).tobytes() if embeddings else None
+    return label, row["id"], json.dumps(properties), blob
+
+
+def edge_parameters(relationship_type: str, labels: Tuple[str, str], row: Dict) -> tuple:
+    source_id, target_id = row["source_id"], row["target_id"]
+    return relationship_type, source_id, target_id, labels[0], source_id, labels[1], target_id
+
+
+def stored_node(node_id: str, properties: str) -> Dict:
+    # Nodes are returned as their properties with the id, the way the reader prompts render them
+    return {**json.loads(properties), "id": node_id}
+
+
+class SQLiteGraphStore(GraphStore):
+    """Embedded graph store in a single SQLite file.
+
+    Nodes are keyed by label and id with their properties as JSON, key element
+    embeddings as float32 blobs, and edges are indexed in both directions. Lookups
+    run in-process, so the reader's async accessors answer directly instead of
+    waiting on a driver. Similarity search is exact cosine similarity with NumPy
+    over the stored embeddings, or an IVF index with `vector_index_lists` > 0,
+    rebuilt in memory after writes that change them.
+    """
+
+    def __init__(self, path: str, vector_index_lists=0):
+        self.path = path
+        self.vector_index_lists = vector_index_lists
+        self.lock = threading.Lock()
+        self.connection = connect(path)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA mmap_size=1073741824")
+        self._vector_index: Optional[VectorIndex] = None
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock, self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def _query(self, query: str, *parameters) -> List[tuple]:
+        with self.lock:
+            return self.connection.execute(query, parameters).fetchall()
+
+    async def close(self):
+        self.connection.close()
+
+    async def reset(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM edges")
+            self.connection.execute("DELETE FROM nodes")
+        self._vector_index = None
+
+    async def ensure_schema(self):
+        self._create_schema()
+
+    async def import_rows(
+        self,
+        node_groups: Dict[str, List[Dict]],
+        edge_groups: Dict[str, List[Dict]],
+        batch_size=1000,
+        concurrency=1,
+    ) -> ImportReport:
+        # SQLite has a single writer, so batches are written one after another regardless of `concurrency`
+        report = ImportReport()
+        for node_label, rows in node_groups.items():
+            for batch in chunked(rows, batch_size):
+                self._write_batch(
+                    report, "nodes", node_label, UPSERT_NODE_QUERY, batch, partial(node_parameters, node_label)
+                )
+        if node_groups.get("key_element"):
+            self._vector_index = None
+        for relationship_type, rows in edge_groups.items():
+            labels = RELATIONSHIP_LABELS[relationship_type]
+            parameters = partial(edge_parameters, relationship_type, labels)
+            for batch in chunked(rows, batch_size):
+                self._write_batch(
+                    report, "edges", relationship_type, INSERT_EDGE_QUERY, batch, parameters,
+                    partial(self._unmatched_edges, labels),
+                )
+        log(report.summary())
+        return report
+
+    def _write_batch(self, report: ImportReport, kind, label, query, rows, parameters, unmatched=None):
+        start = time.perf_counter()
+        failed = []
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany(query, map(parameters, rows))
+                if unmatched is not None:
+                    failed += unmatched(rows)
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            log_error(f"Error importing batch of {len(rows)} rows, retrying rows individually: {e}")
+            # Isolate the failing rows so a single bad row doesn't drop the whole batch
+            for row in rows:
+                try:
+                    with self.lock, self.connection:
+                        self.connection.execute(query, parameters(row))
+                        if unmatched is not None:
+                            failed += unmatched([row])
+                except (sqlite3.Error, ValueError, TypeError) as e:
+                    row_id = row.get("id") or f"{row.get('source_id')}->{row.get('target_id')}"
+                    log_error(f"Error importing row {row_id}: {e}")
+                    failed.append({"id": row_id, "error": str(e)})
+        result = BatchResult(kind=kind, label=label, size=len(rows), seconds=time.perf_counter() - start, failed=failed)
+        log(f"Imported {kind} batch {label}: {result.size - len(failed)}/{result.size} rows in {result.seconds:.3f}s")
+        report.batches.append(result)
+
+    def _unmatched_edges(self, labels: Tuple[str, str], rows: List[Dict]) -> List[Dict[str, str]]:
+        endpoints = json.dumps([[row["source_id"], row["target_id"]] for row in rows])
+        return [
+            unmatched_edge(source_id, target_id, bool(missing_source), bool(missing_target))
+            for source_id, target_id, missing_source, missing_target in self.connection.execute(
+                UNMATCHED_EDGES_QUERY, (*labels, endpoints)
+            )
+        ]
+
+    def _delete_nodes(self, ids: List[str]):
+        # Callers hold the lock and the transaction; edges go with their nodes, like DETACH DELETE
+        ids = json.dumps(ids)
+        for relationship_type in RELATIONSHIP_LABELS:
+            for column in ("source", "target"):
+                self.connection.execute(
+                    f"DELETE FROM edges WHERE relationship = ? AND {column} IN {IN_LIST}", (relationship_type, ids)
+                )
+        self.connection.execute(f"DELETE FROM nodes WHERE id IN {IN_LIST}", (ids,))
+
+    async def get_embedded_key_element_ids(self, ids: List[str]) -> Set[str]:
+        rows = self._query(
+            f"SELECT id FROM nodes WHERE label = 'key_element' AND id IN {IN_LIST} AND embeddings IS NOT NULL",
+            json.dumps(ids),
+        )
+        return {row[0] for row in rows}
+
+    async def get_extracted_chunk_ids(self, ids: List[str], prompt_version: str) -> Set[str]:
+        rows = self._query(
+            f"""
+            SELECT c.id FROM nodes c
+            WHERE c.label = 'chunk' AND c.id IN {IN_LIST}
+              AND json_extract(c.properties, '$.prompt_version') = ?
+            """,
+            json.dumps(ids),
+            prompt_version,
+        )
+        return {row[0] for row in rows}
+
+    async def get_key_element_aliases(self, ids: List[str]) -> Dict[str, str]:
+        # Only key elements that absorbed a merge have alias ids, and the partial index holds just those
+        rows = self._query(
+            f"""
+            SELECT alias.value, k.id
+            FROM nodes k INDEXED BY key_element_aliases, json_each(k.properties, '$.alias_ids') alias
+            WHERE k.label = 'key_element' AND json_extract(k.properties, '$.alias_ids') IS NOT NULL
+              AND alias.value IN {IN_LIST}
+            """,
+            json.dumps(ids),
+        )
+        return {row[0]: row[1] for row in rows}
+
+    async def mark_chunks_extracted(self, ids: List[str], prompt_version: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"""
+                UPDATE nodes SET properties = json_set(properties, '$.prompt_version', ?)
+                WHERE label = 'chunk' AND id IN {IN_LIST}
+                """,
+                (prompt_version, json.dumps(ids)),
+            )
+
+    async def reconcile_document(self, graph: Graph):
+        documents = graph.nodes_of_type("document")
+        chunk_ids = [n.id for n in sorted(graph.nodes_of_type("chunk"), key=lambda n: n.index)]
+        with self.lock, self.connection:
+            # Drop NEXT links that don't match the new chunk ordering. A reused chunk keeps its facts,
+            # but its neighbors from an older version of the document no longer apply.
+            for i, chunk_id in enumerate(chunk_ids):
+                next_id = chunk_ids[i + 1] if i + 1 < len(chunk_ids) else None
+                previous_id = chunk_ids[i - 1] if i > 0 else None
+                self.connection.execute(
+                    "DELETE FROM edges WHERE relationship = 'NEXT' AND source = ? AND target IS NOT ?",
+                    (chunk_id, next_id),
+                )
+                self.connection.execute(
+                    "DELETE FROM edges WHERE relationship = 'NEXT' AND target = ? AND source IS NOT ?",
+                    (chunk_id, previous_id),
+                )
+            # Remove older documents of the same topic, together with the chunks and facts only they reference
+            for document in documents:
+                if document.topic is None:
+                    continue
+                old_ids = [
+                    row[0] for row in self.connection.execute(
+                        """
+                        SELECT id FROM nodes
+                        WHERE label = 'document' AND json_extract(properties, '$.topic') = ? AND id <> ?
+                        """,
+                        (document.topic, document.id),
+                    )
+                ]
+                for old_id in old_ids:
+                    chunks = [
+                        row[0] for row in self.connection.execute(
+                            f"""
+                            SELECT c.target FROM edges c
+                            WHERE c.relationship = 'HAS_CHUNK' AND c.source = ? AND c.target NOT IN {IN_LIST}
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM edges other
+                                  WHERE other.relationship = 'HAS_CHUNK' AND other.target = c.target AND other.source <> ?
+                              )
+                            """,
+                            (old_id, json.dumps(chunk_ids), old_id),
+                        )
+                    ]
+                    facts = [
+                        row[0] for row in self.connection.execute(
+                            f"""
+                            SELECT f.target FROM edges f
+                            WHERE f.relationship = 'HAS_ATOMIC_FACT' AND f.source IN {IN_LIST}
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM edges other
+                                  WHERE other.relationship = 'HAS_ATOMIC_FACT' AND other.target = f.target
+                                    AND other.source <> f.source
+                              )
+                            """,
+                            (json.dumps(chunks),),
+                        )
+                    ]
+                    self._delete_nodes(facts + chunks + [old_id])
+
+    async def delete_orphan_key_elements(self):
+        with self.lock, self.connection:
+            removed = self.connection.execute(
+                """
+                DELETE FROM nodes
+                WHERE label = 'key_element' AND NOT EXISTS (
+                    SELECT 1 FROM edges WHERE relationship = 'HAS_KEY_ELEMENT' AND target = nodes.id
+                )
+                """
+            ).rowcount
+        if removed:
+            self._vector_index = None
+
+    async def get_key_element_embeddings(self) -> Tuple[List[str], List[np.ndarray]]:
+        rows = self._query("SELECT id, embeddings FROM nodes WHERE label = 'key_element' AND embeddings IS NOT NULL")
+        return [row[0] for row in rows], [vector(row[1]) for row in rows]
+
+    async def get_key_element_degrees(self, limit: int) -> List[Dict]:
+        # Key elements not yet expanded and not already a document topic, ranked by the facts mentioning them
+        rows = self._query(
+            f"""
+            SELECT k.id, json_extract(k.properties, '$.content'), {DEGREE} AS degree
+            FROM nodes k
+            WHERE k.label = 'key_element' AND {EXPANDABLE}
+            ORDER BY degree DESC
+            LIMIT ?
+            """,
+            limit,
+        )
+        return [{"id": row[0], "content": row[1], "score": row[2]} for row in rows]
+
+    async def get_key_element_cooccurrence(self) -> Tuple[List[Dict], List[Dict]]:
+        # Key elements with an expandable flag, and how many facts each pair of them shares
+        rows = self._query(
+            f"""
+            SELECT k.id, json_extract(k.properties, '$.content'), coalesce({EXPANDABLE}, 0)
+            FROM nodes k
+            WHERE k.label = 'key_element'
+            """
+        )
+        nodes = [{"id": row[0], "content": row[1], "expandable": bool(row[2])} for row in rows]
+        return nodes, await self.get_key_element_pairs()
+
+    async def get_key_element_pairs(self) -> List[Dict]:
+        # Pairs of key elements mentioned by the same facts, with the number of facts they share
+        rows = self._query(
+            """
+            SELECT a.target, b.target, COUNT(*)
+            FROM edges a
+            JOIN edges b ON b.relationship = 'HAS_KEY_ELEMENT' AND b.source = a.source AND a.target < b.target
+            WHERE a.relationship = 'HAS_KEY_ELEMENT'
+            GROUP BY a.target, b.target
+            """
+        )
+        return [{"source": row[0], "target": row[1], "weight": row[2]} for row in rows]
+
+    async def get_key_elements(self) -> List[Dict]:
+        rows = self._query(
+            f"""
+            SELECT k.id, json_extract(k.properties, '$.content'), k.embeddings, {DEGREE}
+            FROM nodes k
+            WHERE k.label = 'key_element' AND k.embeddings IS NOT NULL
+            """
+        )
+        return [
+            {"id": row[0], "content": row[1], "embeddings": vector(row[2]), "degree": row[3]} for row in rows
+        ]
+
+    async def merge_key_elements(self, merges: List[Dict], batch_size=500):
+        # Moves the facts of each duplicate onto its canonical key element, which keeps the duplicate's name as an alias
+        for batch in chunked(merges, batch_size):
+            with self.lock, self.connection:
+                for merge in batch:
+                    canonical, duplicate = (
+                        self.connection.execute(
+                            "SELECT properties FROM nodes WHERE label = 'key_element' AND id = ?", (node_id,)
+                        ).fetchone()
+                        for node_id in (merge["canonical"], merge["duplicate"])
+                    )
+                    if canonical is None or duplicate is None:
+                        continue
+                    canonical, duplicate = json.loads(canonical[0]), json.loads(duplicate[0])
+                    self.connection.execute(
+                        """
+                        INSERT OR IGNORE INTO edges (relationship, source, target)
+                        SELECT relationship, source, ? FROM edges
+                        WHERE relationship = 'HAS_KEY_ELEMENT' AND target = ?
+                        """,
+                        (merge["canonical"], merge["duplicate"]),
+                    )
+                    canonical["aliases"] = (
+                        canonical.get("aliases", []) + [duplicate.get("content")] + duplicate.get("aliases", [])
+                    )
+                    canonical["alias_ids"] = (
+                        canonical.get("alias_ids", []) + [merge["duplicate"]] + duplicate.get("alias_ids", [])
+                    )
+                    if canonical.get("expansion_status") is None and duplicate.get("expansion_status") is not None:
+                        canonical["expansion_status"] = duplicate["expansion_status"]
+                    self.connection.execute(
+                        "UPDATE nodes SET properties = ? WHERE label = 'key_element' AND id = ?",
+                        (json.dumps(canonical), merge["canonical"]),
+                    )
+                    self._delete_nodes([merge["duplicate"]])
+        self._vector_index = None
+
+    async def mark_key_elements_expanded(self, ids: List[str], status: str):
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"""
+                UPDATE nodes
+                SET properties = json_set(properties, '$.expansion_status', ?, '$.expanded_at', ?)
+                WHERE label = 'key_element' AND id IN {IN_LIST}
+                """,
+                (status, int(time.time() * 1000), json.dumps(ids)),
+            )
+
+    def s_get_node_by_id(self, node_id: str):
+        rows = self._query("SELECT id, properties FROM nodes WHERE id = ? LIMIT 1", node_id)
+        return stored_node(*rows[0]) if rows else None
+
+    def get_atomic_facts(self, key_elements: List[str]) -> List[Dict[str, str]]:
+        rows = self._query(ATOMIC_FACTS_QUERY, json.dumps(key_elements))
+        return [{"chunk_id": row[0], "text": row[1]} for row in rows]
+
+    def get_neighbors_by_key_element(self, key_elements) -> List[str]:
+        key_elements = json.dumps(list(key_elements))
+        return [row[0] for row in self._query(NEIGHBORS_QUERY, key_elements, key_elements)]
+
+    def get_subsequent_chunk_id(self, chunk_id: str) -> str:
+        rows = self._query("SELECT target FROM edges WHERE relationship = 'NEXT' AND source = ? LIMIT 1", chunk_id)
+        return rows[0][0] if rows else None
+
+    def get_previous_chunk_id(self, chunk_id: str) -> str:
+        rows = self._query("SELECT source FROM edges WHERE relationship = 'NEXT' AND target = ? LIMIT 1", chunk_id)
+        return rows[0][0] if rows else None
+
+    def get_key_element_context(self, key_elements: List[str]) -> Dict[str, List]:
+        # Facts about the key elements and their ranked neighbor candidates
+        return {
+            "atomic_facts": self.get_atomic_facts(key_elements),
+            "neighbors": self.get_neighbors_by_key_element(key_elements),
+        }
+
+    def get_chunk_with_adjacent(self, chunk_id: str) -> Dict:
+        # A chunk node together with the ids of the chunks before and after it
+        rows = self._query(CHUNK_WITH_ADJACENT_QUERY, chunk_id)
+        if not rows:
+            return {"node": None, "previous_id": None, "next_id": None}
+        node_id, properties, previous_id, next_id = rows[0]
+        return {"node": stored_node(node_id, properties), "previous_id": previous_id, "next_id": next_id}
+
+    async def get_adjacent_chunks(self, chunk_id: str) -> List[Dict]:
+        # The chunks before and after a chunk, in the shape of get_chunk_with_adjacent
+        chunk = self.get_chunk_with_adjacent(chunk_id)
+        return [
+            self.get_chunk_with_adjacent(adjacent_id)
+            for adjacent_id in (chunk["previous_id"], chunk["next_id"])
+            if adjacent_id is not None
+        ]
+
+    def get_chunk(self, chunk_id: str) -> Dict[str, str]:
+        rows = self._query(
+            "SELECT id, json_extract(properties, '$.content') FROM nodes WHERE label = 'chunk' AND id = ?", chunk_id
+        )
+        return {"chunk_id": rows[0][0], "text": rows[0][1]} if rows else None
+
+    def vector_index(self) -> VectorIndex:
+        # Loaded from the stored embeddings on first use and dropped by writes that change them
+        vector_index = self._vector_index
+        if vector_index is None:
+            rows = self._query(
+                "SELECT id, embeddings FROM nodes WHERE label = 'key_element' AND embeddings IS NOT NULL"
+            )
+            vector_index = VectorIndex.build(
+                [row[0] for row in rows], [vector(row[1]) for row in rows], n_lists=self.vector_index_lists
+            )
+            self._vector_index = vector_index
+        return vector_index
+
+    def get_similar_nodes(self, target_embeddings: list, k: int = 50) -> List[Dict]:
+        return self.vector_index().get_similar_nodes(target_embeddings, k)
@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+from typing import Dict, Iterable, Optional
+from pydantic import BaseModel
+from log_manager import log, log_error
+
+TRANSIENT_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    # ValueError covers parse failures of the LLM output; the rest are transient endpoint errors
+    if isinstance(error, (ValueError, TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if status_code(error) in TRANSIENT_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return any(text in message for text in ("429", "rate limit", "timed out", "overloaded", "503"))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TaskStats(BaseModel):
+    attempts: int = 0
+    seconds: float = 0.0
+    status: str = "pending"
+    error: Optional[str] = None
+
+
+class TaskScheduler:
+    """Runs LLM-bound tasks with a bounded number in flight, an optional request
+    rate limit and exponential-backoff retries for transient and parse failures.
+
+    One scheduler can be shared by several builds so they draw on the same budget.
+    """
+
+    def __init__(
+        self,
+        max_in_flight=8,
+        requests_per_second=0.0,
+        max_retries=3,
+        base_delay=1.0,
+        max_delay=60.0,
+    ):
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.bucket = TokenBucket(requests_per_second, capacity=max_in_flight)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats: Dict[str, TaskStats] = {}
+
+    async def run(self, key: str, fn, *args, **kwargs):
+        stats = self.stats[key] = TaskStats()
+        while True:
+            stats.attempts += 1
+            async with self.semaphore:
+                await self.bucket.acquire()
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                    stats.seconds = time.perf_counter() - start
+                    stats.status = "retried" if stats.attempts > 1 else "succeeded"
+                    return result
+                except Exception as e:
+                    stats.seconds = time.perf_counter() - start
+                    error = e
+
+            stats.error = str(error)
+            if stats.attempts > self.max_retries or not is_retryable(error):
+                stats.status = "failed"
+                log_error(f"Task {key} failed after {stats.attempts} attempts: {error}")
+                raise error
+
+            # Back off outside the semaphore so waiting tasks don't hold a slot
+            delay = retry_after(error) or min(
+                self.max_delay, self.base_delay * 2 ** (stats.attempts - 1)
+            ) * random.uniform(0.5, 1.5)
+            log(f"Retrying task {key} in {delay:.1f}s (attempt {stats.attempts}): {error}")
+            await asyncio.sleep(delay)
+
+    def summary(self, keys: Iterable[str] = None) -> str:
+        stats = [self.stats[key] for key in keys if key in self.stats] if keys is not None else list(self.stats.values())
+        counts = {status: sum(1 for s in stats if s.status == status) for status in ("succeeded", "retried", "failed")}
+        latencies = sorted(s.seconds for s in stats if s.status != "failed")
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            latency = f"latency p50={p50:.1f}s p95={p95:.1f}s max={latencies[-1]:.1f}s"
+        else:
+            latency = "no completed tasks"
+        return (
+            f"{len(stats)} tasks: {counts['succeeded']} succeeded, {counts['retried']} succeeded after retry, "
+            f"{counts['failed']} failed; {latency}."
+        )
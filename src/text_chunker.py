@@ -0,0 +1,70 @@
+import asyncio
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str):
+    # Loading an encoding parses its BPE ranks, so every process does it once
+    return tiktoken.get_encoding(encoding_name)
+
+
+def token_windows(token_count: int, chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[int, int]]:
+    # The same windows TokenTextSplitter cuts, so chunk ids match graphs built with it
+    start = 0
+    while start < token_count:
+        end = min(start + chunk_size, token_count)
+        yield start, end
+        if end == token_count:
+            return
+        start += chunk_size - chunk_overlap
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int, encoding_name: str) -> List[str]:
+    # Module-level so process pool workers can run it
+    return list(TokenChunker(chunk_size, chunk_overlap, encoding_name).iter_chunks(text))
+
+
+class TokenChunker:
+    """Token-window splitter equivalent to `TokenTextSplitter`.
+
+    A document is encoded once and each chunk is decoded from its token offsets
+    only when it is consumed, so callers can start on the first chunk while the
+    rest of the document is still being cut.
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int = 0, encoding_name: str = "gpt2"):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding_name = encoding_name
+
+    @property
+    def encoding(self):
+        return get_encoding(self.encoding_name)
+
+    def encode(self, text: str) -> List[int]:
+        # Special tokens are encoded as plain text rather than rejected
+        return self.encoding.encode_ordinary(text)
+
+    def decode_windows(self, tokens: List[int]) -> Iterator[str]:
+        for start, end in token_windows(len(tokens), self.chunk_size, self.chunk_overlap):
+            yield self.encoding.decode(tokens[start:end])
+
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        return self.decode_windows(self.encode(text))
+
+    async def astream(self, text: str):
+        # Encoding a large document is the expensive part, so it runs off the event loop thread
+        tokens = await asyncio.to_thread(self.encode, text)
+        for chunk in self.decode_windows(tokens):
+            yield chunk
+
+    async def asplit(self, text: str, executor=None) -> List[str]:
+        # Splits on `executor`, e.g. a process pool shared by a batch build, without blocking the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, split_text, text, self.chunk_size, self.chunk_overlap, self.encoding_name
+        )
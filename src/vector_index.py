@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from typing import List, Dict, Optional
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def kmeans(vectors: np.ndarray, n_lists: int, iterations=10, seed=0) -> np.ndarray:
+    # Spherical k-means: vectors are unit length, so assignment is a max dot product
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for list_id in range(n_lists):
+            members = vectors[assignments == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+
+class VectorIndex:
+    """In-process cosine similarity index over key element embeddings.
+
+    Without partitioning a query is a single matrix-vector product over all
+    vectors. With `n_lists` > 0 vectors are grouped into IVF lists by k-means and
+    a query only scores the `n_probe` lists closest to it.
+    """
+
+    def __init__(self, ids, vectors, centroids=None, list_offsets=None, n_probe=8):
+        self.ids = ids
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.n_probe = n_probe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids: List[str], embeddings: List[list], n_lists=0, n_probe=8, seed=0):
+        if not len(ids):
+            return cls(np.asarray([], dtype=str), np.zeros((0, 0), dtype=np.float32), n_probe=n_probe)
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        ids = np.asarray(ids, dtype=str)
+        n_lists = min(n_lists, len(ids))
+        if n_lists <= 1:
+            return cls(ids, vectors, n_probe=n_probe)
+
+        centroids = kmeans(vectors, n_lists, seed=seed)
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        # Store each list contiguously so a probe reads a slice instead of gathering rows
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignments, minlength=n_lists))
+        return cls(ids[order], vectors[order], centroids, list_offsets, n_probe)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        for name in ("centroids", "list_offsets"):
+            file_path = os.path.join(path, f"{name}.npy")
+            if getattr(self, name) is not None:
+                np.save(file_path, getattr(self, name))
+            elif os.path.exists(file_path):
+                os.remove(file_path)
+
+    @classmethod
+    def load(cls, path: str, n_probe=8, mmap=True) -> Optional["VectorIndex"]:
+        # None when no index has been saved at `path` yet
+        if not all(os.path.exists(os.path.join(path, f"{name}.npy")) for name in ("ids", "vectors")):
+            return None
+        mmap_mode = "r" if mmap else None
+
+        def load_array(name):
+            file_path = os.path.join(path, f"{name}.npy")
+            if not os.path.exists(file_path):
+                return None
+            return np.load(file_path, mmap_mode=mmap_mode)
+
+        return cls(
+            load_array("ids"),
+            load_array("vectors"),
+            load_array("centroids"),
+            load_array("list_offsets"),
+            n_probe,
+        )
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return None
+        n_probe = min(self.n_probe, len(self.centroids))
+        probed = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate(
+            [np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in probed]
+        )
+
+    def get_similar_nodes(self, target_embeddings: list, k: int = 50) -> List[Dict]:
+        if not len(self):
+            return []
+        query = normalize_rows(np.asarray(target_embeddings, dtype=np.float32).reshape(1, -1))[0]
+        rows = self._candidate_rows(query)
+        scores = (self.vectors if rows is None else self.vectors[rows]) @ query
+        if not len(scores):
+            return []
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top_rows = top if rows is None else rows[top]
+        return [
+            {"id": str(self.ids[row]), "similarity": float(score)}
+            for row, score in zip(top_rows, scores[top])
+        ]
@@ -0,0 +1,9 @@
+import logging
+import os
+import sys
+
+# The modules import each other by name, the way `python src/main.py` runs them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# log_manager configures a file under ./logs/ on import; a handler set first turns that into a no-op
+logging.basicConfig(handlers=[logging.NullHandler()])
@@ -0,0 +1,31 @@
+import os
+from batch_manager import BatchCheckpoint
+
+
+def test_checkpoint_resumes_from_disk(tmp_path):
+    path = str(tmp_path / "batches" / "corpus.json")
+    checkpoint = BatchCheckpoint(path)
+    assert checkpoint.counts() == {"started": 0, "done": 0, "failed": 0}
+    checkpoint.mark("a", "done", chunks=3)
+    checkpoint.mark("b", "started")
+    checkpoint.mark("c", "started")
+    checkpoint.mark("c", "failed", error="timeout")
+
+    resumed = BatchCheckpoint(path)
+    assert resumed.is_done("a") and not resumed.is_done("b") and not resumed.is_done("c")
+    assert resumed.status("b") == "started"
+    assert resumed.status("missing") is None
+    assert resumed.documents["a"]["chunks"] == 3
+    assert resumed.documents["c"]["error"] == "timeout"
+    assert resumed.counts() == {"started": 1, "done": 1, "failed": 1}
+    assert os.listdir(tmp_path / "batches") == ["corpus.json"]
+
+
+def test_rebuilt_document_is_marked_done(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    BatchCheckpoint(path).mark("a", "failed", error="timeout")
+    checkpoint = BatchCheckpoint(path)
+    checkpoint.mark("a", "started")
+    checkpoint.mark("a", "done")
+    assert "error" not in BatchCheckpoint(path).documents["a"]
+    assert BatchCheckpoint(path).counts() == {"started": 0, "done": 1, "failed": 0}
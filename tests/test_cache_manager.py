@@ -0,0 +1,203 @@
+import asyncio
+import pytest
+import cache_manager
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+from cache_manager import (
+    CacheMissError,
+    CachedChatModel,
+    CachedEmbeddings,
+    EmbeddingCache,
+    MemoryCache,
+    ResponseCache,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_manager, "time", clock)
+    return clock
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+class FakeChat:
+    def __init__(self, content="response"):
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        return AIMessage(content=self.content)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return self.invoke(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        self.calls += 1
+        for word in self.content.split(" "):
+            yield AIMessage(content=word + " ")
+
+    def with_structured_output(self, schema, **kwargs):
+        chat = self
+
+        class Structured:
+            def invoke(self, input):
+                chat.calls += 1
+                return schema(answer=chat.content)
+
+        return Structured()
+
+
+class Answer(BaseModel):
+    answer: str
+
+
+def test_embedding_cache_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), memory_entries=1)
+    assert cache.get_many("model", ["Harry"]) == {}
+    cache.put_many("model", {"Harry": [1.0, 2.0], "Ron": [3.0, 4.0]})
+    # Keys are normalized, and "Harry" was pushed out of the one-entry memory LRU so it is read from SQLite
+    assert cache.get_many("model", ["  harry ", "Ron", "Hermione"]) == {"  harry ": [1.0, 2.0], "Ron": [3.0, 4.0]}
+    assert cache.get_many("other-model", ["Harry"]) == {}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 2)
+    cache.close()
+
+    reopened = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    assert reopened.get_many("model", ["Ron"]) == {"Ron": [3.0, 4.0]}
+    reopened.close()
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"), max_entries=2, memory_entries=0)
+    cache.put_many("model", {"a": [1.0]})
+    clock.now += 1
+    cache.put_many("model", {"b": [2.0]})
+    clock.now += 1
+    cache.get_many("model", ["a"])
+    clock.now += 1
+    cache.put_many("model", {"c": [3.0]})
+    assert set(cache.get_many("model", ["a", "b", "c"])) == {"a", "c"}
+    cache.close()
+
+
+def test_cached_embeddings_embed_each_key_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    embeddings = FakeEmbeddings()
+    cached = CachedEmbeddings(embeddings, cache, "model")
+    assert cached.embed_documents(["Harry", "harry", "Ron"]) == [[5.0, 1.0], [5.0, 1.0], [3.0, 1.0]]
+    assert asyncio.run(cached.aembed_documents(["Ron", "Hermione"])) == [[3.0, 1.0], [8.0, 1.0]]
+    assert cached.embed_query("HARRY") == [5.0, 1.0]
+    assert embeddings.calls == [["Harry", "Ron"], ["Hermione"]]
+    cache.close()
+
+
+def test_response_cache_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"), ttl=60)
+    assert cache.get("key") is None
+    cache.put("key", "model", "1.0", "response")
+    clock.now += 59
+    assert cache.get("key") == "response"
+    clock.now += 2
+    assert cache.get("key") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    cache.close()
+
+
+def test_response_cache_read_only_does_not_write(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    ResponseCache(path).put("key", "model", None, "response")
+    cache = ResponseCache(path, read_only=True)
+    cache.put("other", "model", None, "response")
+    cache.delete("key")
+    assert cache.get("key") == "response"
+    assert cache.get("other") is None
+    cache.close()
+
+
+def test_memory_cache_ttl_and_lru(clock):
+    cache = MemoryCache(max_entries=2, ttl=10)
+    cache.put("a", None)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, None)
+    cache.put("c", 3)
+    # "b" was the least recently used entry
+    assert cache.get("b") == (False, None)
+    clock.now += 11
+    assert cache.get("a") == (False, None)
+    assert "c" not in cache
+    assert cache.stats()["hits"] == 1
+
+
+def test_cached_chat_model_replays_responses(tmp_path):
+    chat = FakeChat("a cached answer")
+    cached = CachedChatModel(chat, ResponseCache(str(tmp_path / "responses.sqlite")), "model", "1.0")
+    messages = [HumanMessage(content="question")]
+    assert cached.invoke(messages).content == "a cached answer"
+    assert asyncio.run(cached.ainvoke(messages)).content == "a cached answer"
+
+    async def stream(messages):
+        return "".join([chunk.content async for chunk in cached.astream(messages)])
+
+    other = [HumanMessage(content="another question")]
+    assert asyncio.run(stream(other)) == "a cached answer "
+    assert asyncio.run(stream(other)) == "a cached answer "
+    structured = cached.with_structured_output(Answer)
+    assert structured.invoke(messages) == Answer(answer="a cached answer")
+    assert asyncio.run(structured.ainvoke(messages)) == Answer(answer="a cached answer")
+    # One call each for plain, streamed and structured output
+    assert chat.calls == 3
+
+
+def test_cached_chat_model_keys_on_prompt_version(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    messages = [HumanMessage(content="question")]
+    assert CachedChatModel(FakeChat(), cache, "model", "1.0").cache_key(messages) != CachedChatModel(
+        FakeChat(), cache, "model", "2.0"
+    ).cache_key(messages)
+
+
+def test_read_only_miss_does_not_call_the_model(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    CachedChatModel(FakeChat(), ResponseCache(path), "model").invoke([HumanMessage(content="recorded")])
+    chat = FakeChat()
+    cached = CachedChatModel(chat, ResponseCache(path, read_only=True), "model")
+    assert cached.invoke([HumanMessage(content="recorded")]).content == "response"
+    missing = [HumanMessage(content="not recorded")]
+    with pytest.raises(CacheMissError):
+        cached.invoke(missing)
+    with pytest.raises(CacheMissError):
+        asyncio.run(cached.ainvoke(missing))
+    with pytest.raises(CacheMissError):
+        cached.with_structured_output(Answer).invoke(missing)
+
+    async def stream():
+        return [chunk async for chunk in cached.astream(missing)]
+
+    with pytest.raises(CacheMissError):
+        asyncio.run(stream())
+    assert chat.calls == 0
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from entity_resolution import EntityResolver, candidate_pairs, center_clusters, parse_duplicates
+from task_scheduler import TaskScheduler
+from test_sqlite_graph_store import build, document_graph, store  # noqa: F401
+from vector_index import normalize_rows
+
+
+def pairs(left, right, similarity):
+    return {(i, j): round(score, 4) for i, j, score in zip(left.tolist(), right.tolist(), similarity.tolist())}
+
+
+def clustered_vectors(n_clusters=8, size=25, dimensions=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dimensions))
+    vectors = np.repeat(centers, size, axis=0) + rng.normal(scale=0.05, size=(n_clusters * size, dimensions))
+    return normalize_rows(vectors.astype(np.float32))
+
+
+def test_blocked_pairs_match_all_pairs():
+    vectors = clustered_vectors()
+    brute_force = pairs(*candidate_pairs(vectors, 0.95, block_size=None))
+    blocked = pairs(*candidate_pairs(vectors, 0.95, block_size=40, n_probe=2, tile_size=16))
+    assert brute_force and blocked == brute_force
+    assert all(i < j for i, j in blocked)
+
+
+def test_no_pairs_above_threshold():
+    left, right, similarity = candidate_pairs(np.eye(3, dtype=np.float32), 0.5)
+    assert len(left) == len(right) == len(similarity) == 0
+
+
+def test_chains_are_not_merged():
+    # 0 ~ 1 and 1 ~ 2, but 0 and 2 are not similar
+    left, right, similarity = np.array([0, 1]), np.array([1, 2]), np.array([0.95, 0.92])
+    assert center_clusters(left, right, similarity, [0, 1, 2]) == {0: [(1, 0.95)]}
+    assert center_clusters(left, right, similarity, [1, 0, 2]) == {1: [(0, 0.95), (2, 0.92)]}
+
+
+def key_element(id, embeddings, degree):
+    return {"id": id, "content": id.title(), "embeddings": embeddings, "degree": degree}
+
+
+def test_propose_skips_key_elements_of_one_fact():
+    key_elements = [
+        key_element("harry", [1.0, 0.0], 1),
+        key_element("harry potter", [1.0, 0.01], 5),
+        key_element("potter", [1.0, 0.02], 2),
+        key_element("ron", [0.0, 1.0], 3),
+    ]
+    resolver = EntityResolver(threshold=0.99)
+    clusters = resolver.propose(key_elements, [{"source": "harry potter", "target": "potter"}])
+    assert [(c.canonical_id, [d.id for d in c.duplicates]) for c in clusters] == [("harry potter", ["harry"])]
+
+
+class FakeChat:
+    def __init__(self, content):
+        self.content = content
+
+    async def ainvoke(self, messages):
+        if isinstance(self.content, Exception):
+            raise self.content
+        return SimpleNamespace(content=self.content)
+
+
+@pytest.mark.parametrize(
+    "content, merged",
+    [("<Duplicates>1</Duplicates>", True), ("<Duplicates></Duplicates>", False), (ValueError("failed"), False)],
+)
+def test_resolve_merges_confirmed_clusters(store, content, merged):
+    # Harry and Dobby get the same embedding in document_graph and never share a fact
+    build(store, document_graph(["a", "b", "d"]))
+    resolver = EntityResolver(threshold=0.9999, chat=FakeChat(content), scheduler=TaskScheduler(max_retries=0))
+    clusters = asyncio.run(resolver.resolve(store))
+    assert [(c.canonical_id, [d.id for d in c.duplicates]) for c in clusters] == ([("harry", ["dobby"])] if merged else [])
+    assert (store.s_get_node_by_id("dobby") is None) == merged
+
+
+def test_dry_run_does_not_merge(store):
+    build(store, document_graph(["a", "b", "d"]))
+    clusters = asyncio.run(EntityResolver(threshold=0.9999).resolve(store, dry_run=True))
+    assert [c.canonical_id for c in clusters] == ["harry"]
+    assert store.s_get_node_by_id("dobby") is not None
+
+
+def test_parse_duplicates():
+    assert parse_duplicates("Sure.\n<Duplicates>1, 3</Duplicates>") == {1, 3}
+    with pytest.raises(ValueError):
+        parse_duplicates("1, 3")
@@ -0,0 +1,58 @@
+import asyncio
+import numpy as np
+import pytest
+from expansion_manager import DuplicatePageError, ExpansionManager, pagerank
+from input_manager import PageNotFoundError, SourceDocument
+from test_sqlite_graph_store import build, document_graph, store  # noqa: F401
+
+
+@pytest.fixture
+def manager(store):
+    # Wizard and Hermione are document topics, so they are never expansion candidates
+    build(store, document_graph(["a", "b"], topic="Wizard"))
+    build(store, document_graph(["d", "c"], topic="Hermione"))
+    return ExpansionManager(store, fetcher=None)
+
+
+def document(key):
+    return SourceDocument(key=key, topic=key.title(), source="wikipedia")
+
+
+def ranked(manager, breadth, ranking):
+    return [candidate.id for candidate in asyncio.run(manager.rank(breadth, ranking))]
+
+
+def test_pagerank_favours_the_hub():
+    # A star around node 0, and node 4 on its own
+    scores = pagerank(np.array([0, 0, 0]), np.array([1, 2, 3]), np.array([1.0, 1.0, 2.0]), 5)
+    assert scores.sum() == pytest.approx(1.0)
+    assert np.argmax(scores) == 0
+    assert scores[3] > scores[1] == pytest.approx(scores[2])
+    assert scores[4] == scores.min()
+
+
+def test_degree_ranking(manager):
+    assert set(ranked(manager, 2, "degree")) == {"harry", "ron"}
+    assert ranked(manager, 10, "degree")[2:] == ["dobby"]
+
+
+def test_pagerank_ranking(manager):
+    # Harry and Ron share facts with each other and with Wizard; Dobby shares none
+    assert set(ranked(manager, 2, "pagerank")) == {"harry", "ron"}
+    assert ranked(manager, 10, "pagerank")[2:] == ["dobby"]
+    with pytest.raises(ValueError):
+        ranked(manager, 2, "alphabetical")
+
+
+def test_expanded_key_elements_are_not_ranked_again(manager, store):
+    asyncio.run(manager.record(document("harry")))
+    asyncio.run(manager.record(document("dobby"), PageNotFoundError("Dobby")))
+    asyncio.run(manager.record(document("ron"), TimeoutError()))
+    assert store.s_get_node_by_id("harry")["expansion_status"] == "expanded"
+    assert store.s_get_node_by_id("dobby")["expansion_status"] == "not_found"
+    # A transient error leaves the key element a candidate
+    for ranking in ("degree", "pagerank"):
+        assert ranked(manager, 10, ranking) == ["ron"]
+
+    asyncio.run(manager.record(document("ron"), DuplicatePageError("Ron")))
+    assert ranked(manager, 10, "degree") == []
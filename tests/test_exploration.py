@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from langgraph.graph import END, START, StateGraph
+from graph_reader_agent.exploration import Exploration
+from graph_reader_agent.state import OverallState
+
+
+def atomic_fact_check(state):
+    # Stands in for the exploration loop: writes one note about the branch's key element
+    key_element = state["check_atomic_facts_queue"][0]
+    if key_element == "broken":
+        raise ValueError("no facts")
+    return {
+        "notebook": "" if key_element == "nothing" else f"{key_element} is a wizard.",
+        "previous_actions": [f"atomic_fact_check({key_element})"],
+    }
+
+
+def reader_graph(key_elements):
+    exploration_graph = StateGraph(OverallState)
+    exploration_graph.add_node("atomic_fact_check", atomic_fact_check)
+    exploration_graph.add_edge(START, "atomic_fact_check")
+    exploration_graph.add_edge("atomic_fact_check", END)
+    exploration = Exploration(exploration_graph.compile())
+
+    graph = StateGraph(OverallState)
+    graph.add_node(
+        "initial_node_selection",
+        lambda state: {"check_atomic_facts_queue": key_elements, "previous_actions": ["initial_node_selection"]},
+    )
+    graph.add_node("exploration", exploration)
+    graph.add_node("merge_notebooks", exploration.merge_notebooks)
+    graph.add_edge(START, "initial_node_selection")
+    graph.add_conditional_edges(
+        "initial_node_selection",
+        lambda state: exploration.branches(state) or "merge_notebooks",
+        ["exploration", "merge_notebooks"],
+    )
+    graph.add_edge("exploration", "merge_notebooks")
+    graph.add_edge("merge_notebooks", END)
+    return graph.compile()
+
+
+def run(key_elements, use_async):
+    graph = reader_graph(key_elements)
+    state = {"question": "Who is a wizard?", "rational_plan": "Find wizards.", "previous_actions": []}
+    return asyncio.run(graph.ainvoke(state)) if use_async else graph.invoke(state)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_branch_notebooks_are_merged(use_async):
+    state = run(["harry", "broken", "nothing", "ron"], use_async)
+    assert sorted(state["notebook"].split("\n\n")) == [
+        "Exploration from harry:\nharry is a wizard.",
+        "Exploration from ron:\nron is a wizard.",
+    ]
+    # Each branch reports only its own actions, including the failed one
+    assert sorted(state["previous_actions"][1:-1]) == [
+        "exploration(broken): []",
+        "exploration(harry): ['atomic_fact_check(harry)']",
+        "exploration(nothing): ['atomic_fact_check(nothing)']",
+        "exploration(ron): ['atomic_fact_check(ron)']",
+    ]
+    assert state["previous_actions"][-1] == "merge_notebooks"
+
+
+def test_no_initial_nodes():
+    state = run([], use_async=False)
+    assert state["notebook"] == ""
+    assert state["previous_actions"] == ["initial_node_selection", "merge_notebooks"]
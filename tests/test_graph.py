@@ -0,0 +1,51 @@
+from graph import AtomicFactNode, Edge, Graph, KeyElementNode
+
+
+def fact_graph():
+    graph = Graph()
+    graph.add_nodes(
+        [
+            AtomicFactNode(id="fact", content="Harry knows Ron"),
+            KeyElementNode(id="harry", content="Harry", embeddings=[]),
+            KeyElementNode(id="ron", content="Ron", embeddings=[]),
+        ]
+    )
+    graph.add_edges(
+        [
+            Edge(relationship="HAS_KEY_ELEMENT", source="fact", target="harry"),
+            Edge(relationship="HAS_KEY_ELEMENT", source="fact", target="ron"),
+            Edge(relationship="HAS_KEY_ELEMENT", source="fact", target="ron"),
+        ]
+    )
+    return graph
+
+
+def test_neighbors():
+    graph = fact_graph()
+    assert sorted(graph.neighbors("fact")) == ["harry", "ron"]
+    assert sorted(graph.neighbors("fact", "HAS_KEY_ELEMENT")) == ["harry", "ron"]
+    assert graph.neighbors("ron", direction="in") == ["fact"]
+    assert graph.neighbors("fact", "NEXT") == []
+    assert len(graph.edges) == 2
+
+
+def test_lookups_do_not_grow_the_indexes():
+    graph = fact_graph()
+    outgoing = {relationship: dict(adjacency) for relationship, adjacency in graph._outgoing.items()}
+    incoming = {relationship: dict(adjacency) for relationship, adjacency in graph._incoming.items()}
+    node_types = set(graph._nodes_by_type)
+
+    assert graph.neighbors("missing") == []
+    assert graph.neighbors("missing", "NEXT", direction="in") == []
+    assert graph.nodes_of_type("chunk") == []
+    assert graph.get_node("missing") is None
+
+    assert {relationship: dict(adjacency) for relationship, adjacency in graph._outgoing.items()} == outgoing
+    assert {relationship: dict(adjacency) for relationship, adjacency in graph._incoming.items()} == incoming
+    assert set(graph._nodes_by_type) == node_types
+
+
+def test_nodes_of_type():
+    graph = fact_graph()
+    assert sorted(node.id for node in graph.nodes_of_type("key_element")) == ["harry", "ron"]
+    assert graph.get_node("fact").content == "Harry knows Ron"
@@ -0,0 +1,123 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from graph_manager import GraphManager
+from prompt_manager import ExtractionPrompt
+from sqlite_graph_store import SQLiteGraphStore
+from task_scheduler import TaskScheduler
+
+CHUNKS = ["Harry is a wizard.", "Ron is a wizard."]
+
+
+def response(chunk_content):
+    fact = chunk_content.rstrip(".")
+    return (
+        f'<Facts><AtomicFact fact="{fact}"><KeyElement element="{fact.split()[0]}"/></AtomicFact>'
+        f'<AtomicFact fact="{fact} indeed"><KeyElement element="Wizard"/></AtomicFact></Facts>'
+    )
+
+
+def chunk_content(messages):
+    # The extraction prompt ends with the chunk text followed by "..."
+    return messages[-1].content.split("\n\n", 1)[1][:-3]
+
+
+class FakeChat:
+    # Streams a fixed response per chunk; chunks listed in `fail` raise after their first fact
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    async def astream(self, messages):
+        content = chunk_content(messages)
+        self.calls.append(content)
+        first, rest = response(content).split("</AtomicFact>", 1)
+        yield SimpleNamespace(content=first + "</AtomicFact>")
+        if content in self.fail:
+            raise ConnectionError("stream interrupted")
+        yield SimpleNamespace(content=rest)
+
+    async def ainvoke(self, messages):
+        content = chunk_content(messages)
+        self.calls.append(content)
+        if content in self.fail:
+            raise ConnectionError("request failed")
+        return SimpleNamespace(content=response(content))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteGraphStore(str(tmp_path / "graph.sqlite"))
+    yield store
+    asyncio.run(store.close())
+
+
+async def embed_documents(texts):
+    return [[1.0, float(len(text)), 0.5] for text in texts]
+
+
+def stream_build(store, chat, texts=CHUNKS, import_graph=None, **kwargs):
+    graph_manager = GraphManager(chat, "Harry Potter", scheduler=TaskScheduler(max_retries=0))
+    build = graph_manager.stream_build(
+        " ".join(texts),
+        store.get_embedded_key_element_ids,
+        embed_documents,
+        import_graph or store.import_graph,
+        store.mark_chunks_extracted,
+        get_extracted_chunk_ids=store.get_extracted_chunk_ids,
+        chunk_texts=texts,
+        **kwargs,
+    )
+    # A stage that never sees the end of its queue would hang the build
+    return asyncio.run(asyncio.wait_for(build, timeout=10))
+
+
+def extracted_contents(store, graph):
+    ids = [chunk.id for chunk in graph.nodes_of_type("chunk")]
+    extracted = asyncio.run(store.get_extracted_chunk_ids(ids, ExtractionPrompt.version))
+    return {chunk.content for chunk in graph.nodes_of_type("chunk") if chunk.id in extracted}
+
+
+def test_stream_build_failing_partway_leaves_chunk_pending(store):
+    graph = stream_build(store, FakeChat(fail=[CHUNKS[1]]))
+    # The first fact of the failed chunk was imported, but the chunk is not marked extracted
+    assert store.get_atomic_facts(["ron"])
+    assert extracted_contents(store, graph) == {CHUNKS[0]}
+
+    chat = FakeChat()
+    graph = stream_build(store, chat)
+    assert chat.calls == [CHUNKS[1]]
+    assert extracted_contents(store, graph) == set(CHUNKS)
+
+
+def test_build_graph_marks_only_successful_chunks(store):
+    graph_manager = GraphManager(FakeChat(fail=[CHUNKS[0]]), "Harry Potter", scheduler=TaskScheduler(max_retries=0))
+    graph = asyncio.run(graph_manager.build_graph(" ".join(CHUNKS), chunk_texts=CHUNKS))
+    assert {chunk.content for chunk in graph.nodes_of_type("chunk") if chunk.prompt_version} == {CHUNKS[1]}
+
+
+def test_stream_build_imports_chunks_before_their_facts(store):
+    texts = [f"Student{index} is brave." for index in range(12)]
+    reports = []
+
+    async def import_graph(graph):
+        report = await store.import_graph(graph)
+        reports.append(report)
+        return report
+
+    # Tiny queues and batches keep every stage waiting on its neighbours
+    graph = stream_build(
+        store, FakeChat(), texts, import_graph, extract_workers=3, queue_size=1, import_batch_size=2
+    )
+    assert len(reports) > 1
+    assert all(report.failed == [] for report in reports)
+    assert extracted_contents(store, graph) == set(texts)
+    assert store.get_atomic_facts(["student11"])
+
+
+def test_stream_build_finishes_when_every_extraction_fails(store):
+    chat = FakeChat(fail=CHUNKS)
+    graph = stream_build(store, chat, extract_workers=4, queue_size=1)
+    assert sorted(chat.calls) == sorted(CHUNKS)
+    assert extracted_contents(store, graph) == set()
+    assert len(store._query("SELECT id FROM nodes WHERE label = 'chunk'")) == len(CHUNKS)
@@ -0,0 +1,101 @@
+import asyncio
+from collections import Counter
+from cache_manager import MemoryCache
+from graph_read_cache import CachedGraphReader, question_scope
+
+
+class Store:
+    """A chunk sequence a -> b -> c, counting the lookups that reach it."""
+
+    def __init__(self, chunk_ids=("a", "b", "c")):
+        self.chunk_ids = list(chunk_ids)
+        self.calls = Counter()
+
+    def get_chunk_with_adjacent(self, chunk_id):
+        self.calls["chunk", chunk_id] += 1
+        if chunk_id not in self.chunk_ids:
+            return {"node": None, "previous_id": None, "next_id": None}
+        index = self.chunk_ids.index(chunk_id)
+        return {
+            "node": {"id": chunk_id, "content": chunk_id.upper()},
+            "previous_id": self.chunk_ids[index - 1] if index > 0 else None,
+            "next_id": self.chunk_ids[index + 1] if index + 1 < len(self.chunk_ids) else None,
+        }
+
+    async def aget_chunk_with_adjacent(self, chunk_id):
+        return self.get_chunk_with_adjacent(chunk_id)
+
+    async def get_adjacent_chunks(self, chunk_id):
+        self.calls["adjacent", chunk_id] += 1
+        chunk = self.get_chunk_with_adjacent(chunk_id)
+        return [
+            self.get_chunk_with_adjacent(adjacent_id)
+            for adjacent_id in (chunk["previous_id"], chunk["next_id"])
+            if adjacent_id is not None
+        ]
+
+    def get_subsequent_chunk_id(self, chunk_id):
+        self.calls["next", chunk_id] += 1
+        return self.get_chunk_with_adjacent(chunk_id)["next_id"]
+
+    def get_atomic_facts(self, key_elements):
+        self.calls["facts", tuple(key_elements)] += 1
+        return [{"chunk_id": "a", "text": f"about {key}"} for key in key_elements]
+
+
+def test_chunks_are_cached_across_questions():
+    store = Store()
+    reader = CachedGraphReader(store, MemoryCache())
+    assert reader.get_chunk_with_adjacent("b")["next_id"] == "c"
+    assert reader.get_chunk_with_adjacent("b")["node"]["content"] == "B"
+    assert reader.get_subsequent_chunk_id("b") == reader.get_subsequent_chunk_id("b") == "c"
+    assert store.calls["chunk", "b"] == 2
+
+
+def test_lookups_that_find_nothing_are_not_cached():
+    store = Store(["a", "b"])
+    reader = CachedGraphReader(store, MemoryCache())
+    assert reader.get_chunk_with_adjacent("c")["node"] is None
+    assert reader.get_subsequent_chunk_id("b") is None
+
+    # A later build adds the chunk and links b to it
+    store.chunk_ids.append("c")
+    assert reader.get_chunk_with_adjacent("c")["node"] == {"id": "c", "content": "C"}
+    assert reader.get_subsequent_chunk_id("b") == "c"
+    assert asyncio.run(reader.aget_chunk_with_adjacent("c"))["previous_id"] == "b"
+
+
+def test_facts_are_memoized_per_question():
+    store = Store()
+    reader = CachedGraphReader(store, MemoryCache())
+    with question_scope():
+        reader.get_atomic_facts(["harry"])
+        reader.get_atomic_facts(["harry"])
+    with question_scope():
+        reader.get_atomic_facts(["harry"])
+    reader.get_atomic_facts(["harry"])
+    assert store.calls["facts", ("harry",)] == 3
+
+
+def test_async_read_prefetches_adjacent_chunks():
+    store = Store()
+    reader = CachedGraphReader(store, MemoryCache())
+
+    async def run():
+        await reader.aget_chunk_with_adjacent("b")
+        await reader.aget_chunk_with_adjacent("a")
+        await reader.aget_chunk_with_adjacent("c")
+
+    asyncio.run(run())
+    assert store.calls["adjacent", "b"] == 1
+    # a and c came from the prefetch, which also looks b up once more to find them
+    assert store.calls["chunk", "a"] == store.calls["chunk", "c"] == 1
+    assert not reader.prefetches
+
+
+def test_sync_read_does_not_prefetch():
+    store = Store()
+    reader = CachedGraphReader(store, MemoryCache())
+    reader.get_chunk_with_adjacent("b")
+    assert ("chunk", "a") not in reader.chunk_cache
+    assert store.calls["adjacent", "b"] == 0
@@ -0,0 +1,11 @@
+import pytest
+from graph_database_manager import GraphDatabaseManager
+from graph_store import GraphStore
+from sqlite_graph_store import SQLiteGraphStore
+
+
+def test_stores_implement_every_method():
+    assert GraphDatabaseManager.__abstractmethods__ == frozenset()
+    assert SQLiteGraphStore.__abstractmethods__ == frozenset()
+    with pytest.raises(TypeError):
+        GraphStore()
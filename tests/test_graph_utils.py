@@ -0,0 +1,112 @@
+import random
+import pytest
+from graph_utils import FactStreamParser, create_chunk_node, parse_facts_xml
+
+RESPONSE = """Here are the facts:
+<Facts>
+  <AtomicFact fact="Harry Potter is a wizard.">
+    <KeyElement element="Harry Potter"/>
+    <KeyElement element="Wizard"/>
+  </AtomicFact>
+  <AtomicFact fact="">
+    <KeyElement element="Ignored"/>
+  </AtomicFact>
+  <AtomicFact fact="Ron Weasley is friends with Harry Potter.">
+    <KeyElement element="Ron  Weasley"/>
+    <KeyElement element=""/>
+    <KeyElement element="harry potter"/>
+  </AtomicFact>
+</Facts>
+Let me know if you need more."""
+
+
+@pytest.fixture
+def chunk():
+    return create_chunk_node("Harry Potter is a wizard. Ron Weasley is his friend.", 0)
+
+
+def rows(nodes, edges):
+    return (
+        [(node.type, node.id, node.content) for node in nodes],
+        [(edge.relationship, edge.source, edge.target) for edge in edges],
+    )
+
+
+def stream(chunk, pieces):
+    parser = FactStreamParser(chunk)
+    nodes, edges = [], []
+    for piece in pieces:
+        more_nodes, more_edges = parser.feed(piece)
+        nodes.extend(more_nodes)
+        edges.extend(more_edges)
+    more_nodes, more_edges = parser.close()
+    return rows(nodes + more_nodes, edges + more_edges)
+
+
+def random_pieces(text, seed):
+    rng = random.Random(seed)
+    pieces = []
+    while text:
+        size = rng.randint(1, 12)
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+def test_parse_facts_xml(chunk):
+    nodes, edges = rows(*parse_facts_xml(RESPONSE, chunk))
+    assert [(node_type, content) for node_type, _, content in nodes] == [
+        ("atomic_fact", "Harry Potter is a wizard."),
+        ("key_element", "Harry Potter"),
+        ("key_element", "Wizard"),
+        ("atomic_fact", "Ron Weasley is friends with Harry Potter."),
+        ("key_element", "Ron  Weasley"),
+        ("key_element", "harry potter"),
+    ]
+    assert [node_id for node_type, node_id, _ in nodes if node_type == "key_element"] == [
+        "harry potter",
+        "wizard",
+        "ron weasley",
+        "harry potter",
+    ]
+    assert sum(1 for relationship, _, _ in edges if relationship == "HAS_ATOMIC_FACT") == 2
+    assert sum(1 for relationship, _, _ in edges if relationship == "HAS_KEY_ELEMENT") == 4
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_matches_full_parse(chunk, seed):
+    assert stream(chunk, random_pieces(RESPONSE, seed)) == rows(*parse_facts_xml(RESPONSE, chunk))
+
+
+def test_stream_one_character_at_a_time(chunk):
+    assert stream(chunk, RESPONSE) == rows(*parse_facts_xml(RESPONSE, chunk))
+
+
+def test_facts_are_emitted_as_they_close(chunk):
+    parser = FactStreamParser(chunk)
+    first_fact_end = RESPONSE.index("</AtomicFact>") + len("</AtomicFact>")
+    nodes, _ = parser.feed(RESPONSE[:first_fact_end])
+    assert [node.content for node in nodes] == ["Harry Potter is a wizard.", "Harry Potter", "Wizard"]
+    assert not parser.finished
+    parser.feed(RESPONSE[first_fact_end:])
+    assert parser.finished
+
+
+def test_truncated_response_is_recovered(chunk):
+    truncated = RESPONSE[: RESPONSE.index("<KeyElement element=\"\"/>")]
+    expected = rows(*parse_facts_xml(truncated, chunk))
+    assert [content for _, _, content in expected[0]] == [
+        "Harry Potter is a wizard.",
+        "Harry Potter",
+        "Wizard",
+        "Ron Weasley is friends with Harry Potter.",
+        "Ron  Weasley",
+    ]
+    assert stream(chunk, random_pieces(truncated, 0)) == expected
+
+
+def test_missing_facts_tag_raises(chunk):
+    with pytest.raises(ValueError):
+        parse_facts_xml("I could not find any facts.", chunk)
+    with pytest.raises(ValueError):
+        stream(chunk, ["<Fa", "cts are missing"])
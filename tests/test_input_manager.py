@@ -0,0 +1,101 @@
+import asyncio
+import httpx
+import pytest
+import input_manager
+from input_manager import PageNotFoundError, SavedResponseTransport, WikipediaFetcher
+
+PAGES = {"Harry Potter": {"pageid": 1, "title": "Harry Potter", "extract": "Harry Potter is a wizard."}}
+
+
+class FakeWikipedia:
+    # Answers the two queries WikipediaFetcher sends; `statuses` are returned first, one per request
+    def __init__(self, statuses=(), revid=10):
+        self.statuses = list(statuses)
+        self.revid = revid
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.statuses:
+            return httpx.Response(self.statuses.pop(0), headers={"retry-after": "0.5"})
+        params = request.url.params
+        if "gsrsearch" in params:
+            pages = [{**self._page(title), "index": 1} for title in PAGES if title == params["gsrsearch"]]
+        else:
+            pages = [self._page(title) for title, page in PAGES.items() if str(page["pageid"]) == params["pageids"]]
+        return httpx.Response(200, json={"query": {"pages": pages}} if pages else {"batchcomplete": True})
+
+    def _page(self, title):
+        page = PAGES[title]
+        return {"pageid": page["pageid"], "title": title, "lastrevid": self.revid, "extract": page["extract"]}
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    recorded = []
+
+    async def sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(input_manager.asyncio, "sleep", sleep)
+    return recorded
+
+
+def fetch(fetcher, query):
+    async def run():
+        async with fetcher:
+            return await fetcher.fetch_page(query)
+
+    return asyncio.run(run())
+
+
+def test_transient_errors_are_retried(delays):
+    api = FakeWikipedia(statuses=[429, 503])
+    fetcher = WikipediaFetcher(cache_path=None, transport=httpx.MockTransport(api))
+    assert fetch(fetcher, "Harry Potter")["content"] == "Harry Potter is a wizard."
+    assert len(api.requests) == 4
+    # The first delay is the server's retry-after
+    assert delays[0] == 0.5 and len(delays) == 2
+
+
+def test_retries_give_up(delays):
+    api = FakeWikipedia(statuses=[429] * 3)
+    fetcher = WikipediaFetcher(cache_path=None, max_retries=2, transport=httpx.MockTransport(api))
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(fetcher, "Harry Potter")
+    assert len(api.requests) == 3
+
+
+def test_missing_page():
+    fetcher = WikipediaFetcher(cache_path=None, transport=httpx.MockTransport(FakeWikipedia()))
+    with pytest.raises(PageNotFoundError):
+        fetch(fetcher, "Nobody")
+
+
+def test_page_cache_is_keyed_by_revision(tmp_path):
+    api = FakeWikipedia()
+    cache_path = str(tmp_path / "pages")
+    fetch(WikipediaFetcher(cache_path=cache_path, transport=httpx.MockTransport(api)), "Harry Potter")
+    page = fetch(WikipediaFetcher(cache_path=cache_path, transport=httpx.MockTransport(api)), "Harry Potter")
+    assert page["content"] == "Harry Potter is a wizard."
+    # The cached revision only needs the search request
+    assert len(api.requests) == 3
+
+    api.revid = 11
+    assert fetch(WikipediaFetcher(cache_path=cache_path, transport=httpx.MockTransport(api)), "Harry Potter")["revid"] == 11
+    assert len(api.requests) == 5
+
+
+def test_saved_responses_are_replayed(tmp_path):
+    api = FakeWikipedia()
+    responses_path = str(tmp_path / "responses")
+    recorder = SavedResponseTransport(responses_path, record=True)
+    recorder.transport = httpx.MockTransport(api)
+    recorded = fetch(WikipediaFetcher(cache_path=None, transport=recorder), "Harry Potter")
+
+    replayed = fetch(WikipediaFetcher(cache_path=None, responses_path=responses_path), "Harry Potter")
+    assert replayed == recorded
+    assert len(api.requests) == 2
+    # Queries that were never recorded are not sent anywhere
+    with pytest.raises(httpx.HTTPStatusError):
+        fetch(WikipediaFetcher(cache_path=None, responses_path=responses_path), "Hermione")
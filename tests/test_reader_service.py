@@ -0,0 +1,80 @@
+import asyncio
+import io
+import json
+from reader_service import ReaderQuestion, ReaderService, parse_question
+
+
+def test_parse_question():
+    assert parse_question('{"id": "q1", "question": "Who is Harry?"}\n', 1) == ReaderQuestion(
+        id="q1", question="Who is Harry?"
+    )
+    assert parse_question('{"question": "Who is Ron?"}', 2) == ReaderQuestion(id="2", question="Who is Ron?")
+    assert parse_question("Who is Hermione?\n", 3) == ReaderQuestion(id="3", question="Who is Hermione?")
+    assert parse_question("  \n", 4) is None
+    assert parse_question('{"id": "q5"}', 5) is None
+
+
+class FakeAgent:
+    # Questions name how long to take; "fail" raises
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, question, console=True):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if question == "fail":
+                raise RuntimeError("no answer")
+            await asyncio.sleep(float(question))
+            return {"answer": f"slept {question}", "analysis": "because"}
+        finally:
+            self.in_flight -= 1
+
+
+async def questions(texts):
+    for index, text in enumerate(texts):
+        yield ReaderQuestion(id=str(index), question=text)
+
+
+def answer_all(service, texts):
+    async def run():
+        return [result async for result in service.answer_all(questions(texts))]
+
+    return asyncio.run(run())
+
+
+def test_answer_all_reports_timeouts_and_failures():
+    agent = FakeAgent()
+    service = ReaderService(agent, concurrency=2, timeout=0.2)
+    results = {result.id: result for result in answer_all(service, ["0.01", "5", "fail", "0", "0.02"])}
+    assert {id: result.status for id, result in results.items()} == {
+        "0": "answered", "1": "timeout", "2": "failed", "3": "answered", "4": "answered",
+    }
+    assert results["0"].answer == "slept 0.01"
+    assert results["1"].error == "Timed out after 0.2s"
+    assert results["1"].seconds < 1
+    assert results["2"].error == "no answer"
+    # The timed out question was cancelled rather than left running
+    assert agent.max_in_flight == 2 and agent.in_flight == 0
+
+
+def test_answers_come_in_completion_order():
+    service = ReaderService(FakeAgent(), concurrency=3, timeout=None)
+    assert [result.id for result in answer_all(service, ["0.1", "0", "0.05"])] == ["1", "2", "0"]
+
+
+def test_run_batch(tmp_path):
+    input_path, output_path = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    input_path.write_text('{"id": "a", "question": "0"}\n\nfail\n')
+    summary = asyncio.run(ReaderService(FakeAgent(), concurrency=2).run_batch(str(input_path), str(output_path)))
+    assert (summary["questions"], summary["answered"], summary["failed"], summary["timeout"]) == (2, 1, 1, 0)
+    answers = {row["id"]: row for row in map(json.loads, output_path.read_text().splitlines())}
+    assert answers["a"]["answer"] == "slept 0" and answers["3"]["status"] == "failed"
+
+
+def test_serve_writes_only_answers(capsys):
+    output = io.StringIO()
+    asyncio.run(ReaderService(FakeAgent(), concurrency=1).serve(io.StringIO("0\n"), output))
+    assert json.loads(output.getvalue())["answer"] == "slept 0"
+    assert capsys.readouterr().out == ""
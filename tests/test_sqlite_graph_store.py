@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from graph import AtomicFactNode, Edge, Graph, KeyElementNode
+from graph_utils import create_chunk_edges, create_chunk_node, create_document_node, md5
+from sqlite_graph_store import SQLiteGraphStore
+
+FACTS = {
+    "a": [("Harry is a wizard", ["Harry", "Wizard"]), ("Harry knows Ron", ["Harry", "Ron"])],
+    "b": [("Ron is a wizard", ["Ron", "Wizard"])],
+    "c": [("Hermione reads", ["Hermione"])],
+    "d": [("Dobby is free", ["Dobby"])],
+}
+
+
+def document_graph(texts, topic="Harry Potter"):
+    graph = Graph()
+    document = create_document_node(" ".join(texts), "test", topic)
+    graph.add_node(document)
+    previous = None
+    for index, text in enumerate(texts):
+        chunk = create_chunk_node(text, index)
+        graph.add_node(chunk)
+        graph.add_edges(create_chunk_edges(document, chunk, previous))
+        previous = chunk
+        for fact, key_elements in FACTS[text]:
+            fact_node = AtomicFactNode(id=md5(fact), content=fact)
+            graph.add_node(fact_node)
+            graph.add_edge(Edge(relationship="HAS_ATOMIC_FACT", source=chunk.id, target=fact_node.id))
+            for key_element in key_elements:
+                embeddings = [1.0, float(len(key_element)), 0.5]
+                graph.add_node(KeyElementNode(id=key_element.lower(), content=key_element, embeddings=embeddings))
+                graph.add_edge(Edge(relationship="HAS_KEY_ELEMENT", source=fact_node.id, target=key_element.lower()))
+    return graph
+
+
+def chunk_ids(graph):
+    return [node.id for node in sorted(graph.nodes_of_type("chunk"), key=lambda node: node.index)]
+
+
+def count(store, label):
+    return store._query("SELECT COUNT(*) FROM nodes WHERE label = ?", label)[0][0]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteGraphStore(str(tmp_path / "graph.sqlite"))
+    yield store
+    asyncio.run(store.close())
+
+
+def build(store, graph):
+    # What a document build does after extraction, with small batches to cross batch boundaries
+    async def run():
+        report = await store.import_graph(graph, batch_size=3)
+        await store.reconcile_document(graph)
+        await store.delete_orphan_key_elements()
+        return report
+
+    return asyncio.run(run())
+
+
+def test_import_round_trip(store):
+    graph = document_graph(["a", "b", "c"])
+    report = build(store, graph)
+    assert report.failed == []
+    assert sum(batch.size for batch in report.batches) == len(graph.nodes) + len(graph.edges)
+    assert {fact["text"] for fact in store.get_atomic_facts(["harry"])} == {"Harry is a wizard", "Harry knows Ron"}
+    assert set(store.get_neighbors_by_key_element(["harry"])) == {"ron", "wizard"}
+
+    first, second, third = chunk_ids(graph)
+    chunk = store.get_chunk_with_adjacent(second)
+    assert (chunk["node"]["content"], chunk["previous_id"], chunk["next_id"]) == ("b", first, third)
+    assert store.get_chunk_with_adjacent("missing") == {"node": None, "previous_id": None, "next_id": None}
+    assert [chunk["node"]["content"] for chunk in asyncio.run(store.get_adjacent_chunks(second))] == ["a", "c"]
+    assert asyncio.run(store.get_extracted_chunk_ids([first, second, third], "1.0")) == set()
+    asyncio.run(store.mark_chunks_extracted([first, second], "1.0"))
+    assert asyncio.run(store.get_extracted_chunk_ids([first, second, third], "1.0")) == {first, second}
+    assert asyncio.run(store.get_extracted_chunk_ids([first], "2.0")) == set()
+    assert asyncio.run(store.get_embedded_key_element_ids(["harry", "nobody"])) == {"harry"}
+    assert store.get_similar_nodes([1.0, 5.0, 0.5], k=1)[0]["id"] == "harry"
+
+
+def test_reimport_is_idempotent(store):
+    graph = document_graph(["a", "b", "c"])
+    build(store, graph)
+    nodes = store._query("SELECT COUNT(*) FROM nodes")[0][0]
+    edges = store._query("SELECT COUNT(*) FROM edges")[0][0]
+    assert build(store, graph).failed == []
+    assert store._query("SELECT COUNT(*) FROM nodes")[0][0] == nodes
+    assert store._query("SELECT COUNT(*) FROM edges")[0][0] == edges
+
+
+def test_reconcile_replaces_older_document_version(store):
+    build(store, document_graph(["a", "b", "c"]))
+    old_chunks = chunk_ids(document_graph(["a", "b", "c"]))
+    graph = document_graph(["a", "c", "d"])
+    build(store, graph)
+
+    first, second, third = chunk_ids(graph)
+    assert count(store, "document") == 1
+    assert store.s_get_node_by_id(old_chunks[1]) is None
+    assert store.s_get_node_by_id(md5("Ron is a wizard")) is None
+    assert store.get_subsequent_chunk_id(first) == second
+    assert store.get_previous_chunk_id(second) == first
+    assert store.get_subsequent_chunk_id(third) is None
+    # Ron and Wizard are still mentioned by the facts of chunk "a"; the new key element was added
+    key_elements = {row[0] for row in store._query("SELECT id FROM nodes WHERE label = 'key_element'")}
+    assert {"ron", "wizard", "dobby"} <= key_elements
+
+
+def test_orphan_key_elements_are_removed(store):
+    build(store, document_graph(["a", "b"], topic="Harry"))
+    build(store, document_graph(["d", "c"], topic="Hermione"))
+    assert store.s_get_node_by_id("ron") is not None
+    build(store, document_graph(["c", "d"], topic="Harry"))
+    # Both facts about Ron and the wizard belonged to the replaced Harry document
+    assert store.s_get_node_by_id("ron") is None
+    assert store.s_get_node_by_id("wizard") is None
+    assert store.s_get_node_by_id("hermione") is not None
+    assert all(row["id"] != "ron" for row in store.get_similar_nodes([1.0, 3.0, 0.5], k=10))
+
+
+def test_merge_key_elements(store):
+    build(store, document_graph(["a", "b", "c"]))
+    asyncio.run(store.mark_key_elements_expanded(["ron"], "done"))
+    merges = [{"canonical": "harry", "duplicate": "ron"}, {"canonical": "harry", "duplicate": "nobody"}]
+    asyncio.run(store.merge_key_elements(merges))
+    harry = store.s_get_node_by_id("harry")
+    assert harry["aliases"] == ["Ron"]
+    assert harry["expansion_status"] == "done"
+    assert store.s_get_node_by_id("ron") is None
+    assert {fact["text"] for fact in store.get_atomic_facts(["harry"])} == {
+        "Harry is a wizard",
+        "Harry knows Ron",
+        "Ron is a wizard",
+    }
+    degrees = {row["id"]: row["degree"] for row in asyncio.run(store.get_key_elements())}
+    assert degrees["harry"] == 3
+    assert "ron" not in degrees
+
+
+def test_merged_key_elements_stay_merged(store):
+    build(store, document_graph(["a", "b", "c"]))
+    asyncio.run(store.merge_key_elements([{"canonical": "harry", "duplicate": "ron"}]))
+    asyncio.run(store.merge_key_elements([{"canonical": "wizard", "duplicate": "harry"}]))
+    assert asyncio.run(store.get_key_element_aliases(["ron", "harry", "hermione"])) == {
+        "ron": "wizard",
+        "harry": "wizard",
+    }
+    # Rebuilding a document that still names Ron and Harry attaches their facts to the surviving key element
+    assert build(store, document_graph(["a", "b", "d"])).failed == []
+    assert store.s_get_node_by_id("ron") is None
+    assert store.s_get_node_by_id("harry") is None
+    assert {fact["text"] for fact in store.get_atomic_facts(["wizard"])} >= {"Harry knows Ron", "Ron is a wizard"}
+    assert store.s_get_node_by_id("dobby") is not None
+
+
+def test_unmatched_edges_are_reported(store):
+    graph = document_graph(["a", "b"])
+    fact = md5("Harry is a wizard")
+    report = asyncio.run(
+        store.import_rows(
+            {"atomic_fact": [{"id": fact, "properties": {"content": "Harry is a wizard"}}]},
+            {
+                "HAS_KEY_ELEMENT": [
+                    {"source_id": fact, "target_id": "nobody"},
+                    {"source_id": "missing", "target_id": "nobody"},
+                ]
+            },
+        )
+    )
+    assert report.failed == [
+        {"id": f"{fact}->nobody", "error": "target node not found"},
+        {"id": "missing->nobody", "error": "source and target nodes not found"},
+    ]
+    assert store._query("SELECT COUNT(*) FROM edges")[0][0] == 0
+    assert build(store, graph).failed == []
+
+
+def test_reset(store):
+    build(store, document_graph(["a", "b"]))
+    asyncio.run(store.reset())
+    assert store._query("SELECT COUNT(*) FROM nodes")[0][0] == 0
+    assert store.get_similar_nodes([1.0, 2.0, 3.0]) == []
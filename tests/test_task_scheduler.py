@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+import task_scheduler
+from task_scheduler import TaskScheduler, is_retryable
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("Error code: 429 - rate limit reached")
+        self.status_code = 429
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after} if retry_after else {}})()
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    # Records backoff delays instead of sleeping; jitter is pinned to its midpoint
+    recorded = []
+
+    async def sleep(delay):
+        recorded.append(delay)
+
+    monkeypatch.setattr(task_scheduler.asyncio, "sleep", sleep)
+    monkeypatch.setattr(task_scheduler.random, "uniform", lambda low, high: 1.0)
+    return recorded
+
+
+def failing(errors, result="done"):
+    calls = []
+
+    async def fn(*args):
+        calls.append(args)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def test_retries_with_exponential_backoff(delays):
+    scheduler = TaskScheduler(max_retries=3, base_delay=1.0, max_delay=60.0)
+    fn, calls = failing([TimeoutError("timed out"), ConnectionError("reset"), RateLimitError()])
+    assert asyncio.run(scheduler.run("chunk", fn, "arg")) == "done"
+    assert calls == [("arg",)] * 4
+    assert delays == [1.0, 2.0, 4.0]
+    assert scheduler.stats["chunk"].status == "retried"
+    assert scheduler.stats["chunk"].attempts == 4
+
+
+def test_backoff_is_capped_and_honours_retry_after(delays):
+    scheduler = TaskScheduler(max_retries=3, base_delay=10.0, max_delay=15.0)
+    fn, _ = failing([ValueError("bad xml"), ValueError("bad xml"), RateLimitError(retry_after="7")])
+    asyncio.run(scheduler.run("chunk", fn))
+    assert delays == [10.0, 15.0, 7.0]
+
+
+def test_gives_up_after_max_retries(delays):
+    scheduler = TaskScheduler(max_retries=2, base_delay=1.0)
+    fn, calls = failing([TimeoutError("timed out")] * 5)
+    with pytest.raises(TimeoutError):
+        asyncio.run(scheduler.run("chunk", fn))
+    assert len(calls) == 3
+    assert scheduler.stats["chunk"].status == "failed"
+    assert "1 failed" in scheduler.summary()
+
+
+def test_does_not_retry_permanent_errors(delays):
+    scheduler = TaskScheduler(max_retries=3)
+    fn, calls = failing([KeyError("missing")])
+    with pytest.raises(KeyError):
+        asyncio.run(scheduler.run("chunk", fn))
+    assert len(calls) == 1
+    assert delays == []
+
+
+def test_is_retryable():
+    assert is_retryable(RateLimitError())
+    assert is_retryable(ValueError("Invalid XML"))
+    assert is_retryable(RuntimeError("The server is overloaded"))
+    assert not is_retryable(LookupError("No cached response"))
+    assert not is_retryable(RuntimeError("Invalid API key"))
+
+
+def test_limits_tasks_in_flight():
+    scheduler = TaskScheduler(max_in_flight=2)
+    running = []
+    peak = []
+
+    async def fn():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def run():
+        await asyncio.gather(*(scheduler.run(f"task-{i}", fn) for i in range(6)))
+
+    asyncio.run(run())
+    assert max(peak) == 2
+    assert scheduler.summary().startswith("6 tasks: 6 succeeded")
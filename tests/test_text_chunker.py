@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+import tiktoken
+from langchain_text_splitters import TokenTextSplitter
+from text_chunker import TokenChunker, token_windows
+
+ENCODING_NAME = "test_bytes"
+MERGES = ["th", "he", "the", " t", " the", "in", "ing", "an", "and", " a", " an", " and", "er", "on", "ou"]
+TEXT = (
+    "The wizard and the giant walked on through the forest, talking about nothing in particular. "
+    "Ünïcödé and emoji 🦉 survive the trip, even when a window ends inside a character. "
+) * 7
+
+
+@pytest.fixture(autouse=True)
+def encoding(monkeypatch):
+    # A byte-level BPE with a few merges, so the tests need no downloaded encoding
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in MERGES:
+        ranks[merge.encode()] = len(ranks)
+    encoding = tiktoken.Encoding(
+        name=ENCODING_NAME,
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks,
+        special_tokens={},
+    )
+    monkeypatch.setitem(tiktoken.registry.ENCODINGS, ENCODING_NAME, encoding)
+    return encoding
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(16, 0), (16, 3), (7, 6), (1, 0), (50, 5), (10_000, 10)])
+@pytest.mark.parametrize("length", [0, 1, 64, len(TEXT)])
+def test_matches_token_text_splitter(chunk_size, chunk_overlap, length):
+    text = TEXT[:length]
+    splitter = TokenTextSplitter(encoding_name=ENCODING_NAME, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunker = TokenChunker(chunk_size, chunk_overlap, ENCODING_NAME)
+    assert list(chunker.iter_chunks(text)) == splitter.split_text(text)
+
+
+def test_windows_end_on_the_last_token():
+    assert list(token_windows(10, 4, 1)) == [(0, 4), (3, 7), (6, 10)]
+    assert list(token_windows(8, 4, 0)) == [(0, 4), (4, 8)]
+    assert list(token_windows(0, 4, 1)) == []
+
+
+def test_astream_and_asplit_match_iter_chunks():
+    chunker = TokenChunker(20, 2, ENCODING_NAME)
+
+    async def run():
+        streamed = [chunk async for chunk in chunker.astream(TEXT)]
+        # Without an executor asplit runs on the default thread pool, which sees the registered encoding
+        return streamed, await chunker.asplit(TEXT)
+
+    streamed, split = asyncio.run(run())
+    assert streamed == split == list(chunker.iter_chunks(TEXT))
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        TokenChunker(10, 10)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from vector_index import VectorIndex
+
+
+@pytest.fixture
+def clustered():
+    # 20 well separated clusters of 50 vectors each
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32))
+    vectors = np.repeat(centers, 50, axis=0) + rng.normal(scale=0.05, size=(1000, 32))
+    ids = [f"key-{i}" for i in range(len(vectors))]
+    return ids, vectors.astype(np.float32)
+
+
+def exact_top(ids, vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def test_flat_search_is_exact(clustered):
+    ids, vectors = clustered
+    index = VectorIndex.build(ids, vectors)
+    query = vectors[123] + 0.01
+    results = index.get_similar_nodes(query.tolist(), k=10)
+    assert [row["id"] for row in results] == exact_top(ids, vectors, query, 10)
+    assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-3)
+    assert [row["similarity"] for row in results] == sorted((row["similarity"] for row in results), reverse=True)
+
+
+def test_ivf_probing_every_list_is_exact(clustered):
+    ids, vectors = clustered
+    index = VectorIndex.build(ids, vectors, n_lists=16, n_probe=16)
+    for row in (0, 499, 999):
+        results = index.get_similar_nodes(vectors[row].tolist(), k=20)
+        assert [result["id"] for result in results] == exact_top(ids, vectors, vectors[row], 20)
+
+
+def test_ivf_recall_with_few_probes(clustered):
+    ids, vectors = clustered
+    index = VectorIndex.build(ids, vectors, n_lists=16, n_probe=2)
+    assert len(index.centroids) == 16
+    assert index.list_offsets[-1] == len(ids)
+    recall = []
+    for row in range(0, 1000, 37):
+        found = {result["id"] for result in index.get_similar_nodes(vectors[row].tolist(), k=10)}
+        recall.append(len(found & set(exact_top(ids, vectors, vectors[row], 10))) / 10)
+    assert np.mean(recall) >= 0.9
+
+
+def test_save_and_load(tmp_path, clustered):
+    ids, vectors = clustered
+    index = VectorIndex.build(ids, vectors, n_lists=8)
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path), n_probe=8)
+    query = vectors[42].tolist()
+    assert loaded.get_similar_nodes(query, k=5) == index.get_similar_nodes(query, k=5)
+
+    # Saving a flat index over a partitioned one drops the IVF lists
+    VectorIndex.build(ids[:10], vectors[:10]).save(str(tmp_path))
+    flat = VectorIndex.load(str(tmp_path), mmap=False)
+    assert flat.centroids is None
+    assert len(flat) == 10
+
+
+def test_load_without_saved_index_returns_none(tmp_path):
+    assert VectorIndex.load(str(tmp_path / "missing")) is None
+    assert VectorIndex.load(str(tmp_path)) is None
+
+
+def test_empty_index():
+    index = VectorIndex.build([], [])
+    assert len(index) == 0
+    assert index.get_similar_nodes([1.0, 0.0]) == []
+
+
+def test_lists_are_capped_at_the_number_of_vectors():
+    index = VectorIndex.build(["a", "b"], [[1.0, 0.0], [0.0, 1.0]], n_lists=8, n_probe=1)
+    assert len(index.centroids) == 2
+    assert index.get_similar_nodes([1.0, 0.1], k=2) == [{"id": "a", "similarity": pytest.approx(0.995, abs=1e-3)}]
+    assert VectorIndex.build(["a"], [[1.0, 0.0]], n_lists=8).centroids is None